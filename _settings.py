@@ -61,6 +61,16 @@ INTERVAL = 0.005
 # may end up with unexpected delta. Be careful.
 MARKET_ONLY = False
 
+# Fee of every trade, as a fraction (example: 0.001 for 0.1%).
+# Rebalancing trades are routed through markets with the lowest fee and spread,
+# with transit assets when there is no direct market.
+TRADE_FEE = 0.001
+
+# Open orders are kept between cycles while a new quote of the same market and side
+# is within these relative price and amount changes, others are canceled and replaced.
+ORDER_PRICE_TOLERANCE = 0.001
+ORDER_AMOUNT_TOLERANCE = 0.05
+
 ########################################################################################################################
 # Connection/Auth
 ########################################################################################################################
@@ -90,11 +100,58 @@ DRY_RUN = True
 TIME_FRAMES = ['1h', ]
 # TIME_FRAMES = ['1h', '1m']
 
+# Directory for on-disk ohlcv candles, used to warm up on start and reload. None to disable.
+CANDLES_PATH = 'data/candles'
+
 # How often to re-check and replace orders.
 # Generally, it's safe to make this short if we're fetching
 # from web sockets.
 LOOP_INTERVAL = (40, 60)
 
+# How many REST requests can be in flight at the same time, 1 to send them one by one.
+# Requests are still spaced by the exchange rate limit.
+API_WORKERS = 4
+
+# Exchange request weight limit per minute shared by all REST requests
+API_WEIGHT_LIMIT = 1200
+
+# Directory to cache exchange markets metadata in, None to cache in memory only.
+# Cache expires after TTL seconds or with ccxt upgrade.
+MARKETS_CACHE_PATH = 'data/markets'
+MARKETS_CACHE_TTL = 86400
+
+# How many optimizer results to keep for repeated inputs, 0 to solve every cycle.
+# Results are kept in the file between restarts, None to keep them in memory only.
+# The file is written at most every OPTIMIZER_CACHE_INTERVAL seconds and on exit.
+OPTIMIZER_CACHE_SIZE = 16
+OPTIMIZER_CACHE_PATH = 'data/optimizer.pickle'
+OPTIMIZER_CACHE_INTERVAL = 600
+
+# Efficient frontier points traced once per new candle, target solves start from the frontier.
+# 0 to solve targets only, tracing is much slower with the scipy engine.
+FRONTIER_POINTS = 0
+# FRONTIER_POINTS = 20
+# What-if targets answered from the frontier in the report, ('return', target) or ('risk', target)
+FRONTIER_WHAT_IF = []
+# FRONTIER_WHAT_IF = [('return', 0.05), ('risk', 0.3)]
+
+# Optimizer engine: 'scipy' for PyPortfolioOpt general purpose solver,
+# 'qp' for the dedicated mean-variance solver, faster and deterministic on large portfolios,
+# 'hrp' for hierarchical risk parity of 100+ assets, ignores TARGET_RETURN and TARGET_RISK.
+OPTIMIZER_ENGINE = 'scipy'
+
+# Objectives solved on every time frame of TIME_FRAMES in parallel, recommended weights are their blend.
+# (objective, target) or (objective, target, blend weight), objectives are
+# 'min_volatility', 'max_sharpe', 'efficient_return' and 'efficient_risk'.
+# Empty to solve TARGET_RETURN or TARGET_RISK on the first time frame only.
+OPTIMIZER_OBJECTIVES = []
+# OPTIMIZER_OBJECTIVES = [('min_volatility', None), ('max_sharpe', None), ('efficient_return', 0.05, 2)]
+# Worker processes for OPTIMIZER_OBJECTIVES, None for all cores
+OPTIMIZER_WORKERS = None
+
+# Missing candles forward filled in pricing data of a report before a warning is logged
+PRICING_GAPS_LIMIT = 10
+
 # Wait times between orders / errors
 API_REST_INTERVAL = 1
 API_ERROR_INTERVAL = 10
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Exchange markets metadata cache
+
+Markets and limits change a few times a month, but loading them is one of
+the heaviest requests and ccxt parsing of the response takes seconds.
+Parsed markets state of a ccxt exchange is kept in a process wide cache shared
+by all clients of the exchange and optionally in a pickle file on disk,
+both expire after ttl seconds. Disk cache written by other ccxt version
+or for other exchange is ignored.
+
+ """
+import os
+import pickle
+from threading import Lock
+from time import time
+
+import ccxt
+
+# Bump on changes of the cached entry structure
+CACHE_VERSION = 1
+
+# ccxt exchange attributes filled by load_markets
+MARKET_ATTRIBUTES = ('markets', 'markets_by_id', 'symbols', 'ids', 'currencies', 'currencies_by_id', 'codes',
+                     'baseCurrencies', 'quoteCurrencies')
+
+_entries = dict()
+_entries_lock = Lock()
+
+
+def _version(exchange: ccxt.Exchange) -> tuple:
+    return CACHE_VERSION, ccxt.__version__, exchange.id
+
+
+def _snapshot(exchange: ccxt.Exchange, markets: dict) -> dict:
+    return {'version':    _version(exchange),
+            'timestamp':  time(),
+            'markets':    markets,
+            'attributes': {a: getattr(exchange, a, None) for a in MARKET_ATTRIBUTES},
+            'time_difference': exchange.options.get('timeDifference', 0)}
+
+
+def _restore(exchange: ccxt.Exchange, entry: dict) -> dict:
+    for a, v in entry['attributes'].items():
+        setattr(exchange, a, v)
+    return entry['markets']
+
+
+def _is_valid(exchange: ccxt.Exchange, entry: dict, ttl: float) -> bool:
+    return (isinstance(entry, dict) and entry.get('version') == _version(exchange)
+            and time() - entry.get('timestamp', 0) < ttl)
+
+
+def filename(exchange: ccxt.Exchange, path: str) -> str:
+    """
+    Disk cache file of exchange, i.e. path/binance_markets.pickle
+    """
+    return os.path.join(path, '{}_markets.pickle'.format(exchange.id))
+
+
+def _read(fn: str, logger: object = None):
+    try:
+        with open(fn, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        if logger is not None:
+            logger.warning(f"Markets cache {fn} is not readable: {type(e).__name__}")
+        return None
+
+
+def _write(fn: str, entry: dict) -> None:
+    os.makedirs(os.path.dirname(fn) or '.', exist_ok=True)
+    tmp = fn + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, fn)
+
+
+def load_markets(exchange: ccxt.Exchange, fetch, path: str = None, ttl: float = 86400,
+                 logger: object = None) -> tuple:
+    """
+    Fill exchange with markets from the process cache, the disk cache or the exchange.
+    Markets taken from the exchange are put to both caches.
+
+    :param exchange: ccxt exchange
+    :param fetch: callable loading markets from the exchange, i.e. lambda: exchange.load_markets()
+    :param path: directory for disk cache, None to keep process cache only
+    :param ttl: cache time to live in seconds
+    :param logger: logger
+    :return: markets dict and its source: 'memory', 'disk' or 'exchange'
+    :rtype: tuple
+    """
+    with _entries_lock:
+        entry = _entries.get(exchange.id)
+    if _is_valid(exchange, entry, ttl):
+        # Time difference was measured by the process already
+        exchange.options['timeDifference'] = entry['time_difference']
+        return _restore(exchange, entry), 'memory'
+    fn = filename(exchange, path) if path is not None else None
+    if fn is not None:
+        entry = _read(fn, logger)
+        if _is_valid(exchange, entry, ttl):
+            with _entries_lock:
+                _entries[exchange.id] = entry
+            return _restore(exchange, entry), 'disk'
+    markets = fetch()
+    entry = _snapshot(exchange, markets)
+    with _entries_lock:
+        _entries[exchange.id] = entry
+    if fn is not None:
+        try:
+            _write(fn, entry)
+        except Exception as e:
+            if logger is not None:
+                logger.warning(f"Markets cache {fn} is not written: {type(e).__name__}")
+    return markets, 'exchange'
+
+
+def clear(exchange_id: str = None) -> None:
+    """
+    Drop process cache of exchange or of all exchanges
+    """
+    with _entries_lock:
+        if exchange_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(exchange_id, None)
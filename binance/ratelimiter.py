@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Request weight rate limiter
+
+Binance limits REST calls by request weight per minute, where every endpoint
+has its own weight, and by orders count per second.
+RateLimiter is a thread safe token bucket of that weight. Its state is corrected
+by used weight headers from exchange responses and paused on 429/418 bans.
+Limiters are shared by name between all clients of the process, see get_rate_limiter.
+
+ """
+from threading import Lock
+from time import sleep
+from timeit import default_timer as timer
+
+# Request weight of Binance spot endpoints by ccxt method name
+ENDPOINT_WEIGHTS = {
+    'load_markets':      20,
+    'fetch_time':        1,
+    'fetch_bids_asks':   4,
+    'fetch_ticker':      2,
+    'fetch_ohlcv':       2,
+    'fetch_order_book':  5,
+    'fetch_balance':     20,
+    'fetch_order':       4,
+    'fetch_orders':      20,
+    'fetch_open_orders': 6,
+    'create_order':      1,
+    'edit_order':        1,
+    'cancel_order':      1, }
+
+# Open orders request without symbol weights as many symbol requests
+ALL_OPEN_ORDERS_WEIGHT = 80
+
+# Endpoints counted by the orders limit too
+ORDER_ENDPOINTS = ('create_order', 'edit_order')
+
+# Response headers with used weight of the current minute
+USED_WEIGHT_HEADERS = ('x-mbx-used-weight-1m', 'x-mbx-used-weight')
+
+
+class RateLimiter:
+
+    def __init__(self, capacity: int = 1200, interval: float = 60, safety: float = 0.9):
+        """
+        :param capacity: weight allowed by the exchange per interval
+        :param interval: interval in seconds
+        :param safety: part of capacity the limiter lets to use
+        """
+        self.safety = safety
+        self.interval = interval
+        self.capacity = capacity * safety
+        self.rate = self.capacity / interval
+        self._tokens = self.capacity
+        self._updated = timer()
+        self._paused_until = 0.0
+        self._lock = Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, weight: float = 1) -> float:
+        """
+        Block until weight is available and take it
+
+        :param weight: request weight
+        :return: seconds spent waiting
+        :rtype: float
+        """
+        weight = min(weight, self.capacity)
+        start = timer()
+        while True:
+            with self._lock:
+                now = timer()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= weight:
+                    self._tokens -= weight
+                    return now - start
+                wait = max(self._paused_until - now, (weight - self._tokens) / self.rate)
+            sleep(wait)
+
+    def update_from_headers(self, headers) -> None:
+        """
+        Correct available weight with used weight reported by the exchange
+
+        :param headers: response headers dict
+        """
+        if not headers:
+            return
+        headers = {str(k).lower(): v for k, v in headers.items()}
+        for h in USED_WEIGHT_HEADERS:
+            if h in headers:
+                try:
+                    used = float(headers[h])
+                except (TypeError, ValueError):
+                    return
+                with self._lock:
+                    self._refill(timer())
+                    self._tokens = min(self._tokens, self.capacity - used)
+                return
+
+    def resize(self, capacity: int, interval: float = None) -> None:
+        """
+        Change weight allowed per interval, weight already used in the interval stays used
+
+        :param capacity: weight allowed by the exchange per interval
+        :param interval: interval in seconds, None to keep the current one
+        """
+        with self._lock:
+            self._refill(timer())
+            used = self.capacity - self._tokens
+            self.interval = interval or self.interval
+            self.capacity = capacity * self.safety
+            self.rate = self.capacity / self.interval
+            self._tokens = max(0.0, self.capacity - used)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop giving weight for seconds, used on 429/418 responses
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, timer() + seconds)
+            self._tokens = 0
+
+
+_limiters = dict()
+_limiters_lock = Lock()
+
+
+def get_rate_limiter(name: str, **kwargs) -> RateLimiter:
+    """
+    Get process wide limiter by name, create it with kwargs on the first call,
+    later calls with capacity resize the existing limiter
+
+    :param name: limiter name, i.e. 'binance' or 'binance_orders'
+    :rtype: RateLimiter
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(**kwargs)
+        elif 'capacity' in kwargs:
+            _limiters[name].resize(kwargs['capacity'], kwargs.get('interval'))
+        return _limiters[name]
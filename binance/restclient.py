@@ -2,19 +2,36 @@
 # encoding: utf-8
 import ccxt
 import sys
+import threading
 from time import time_ns, ctime
 from random import randint, seed
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
 
-from yat.calcus import rounded_to_precision
+from yat.tickertable import TickerTable
+from binance.marketcache import load_markets
+from binance.ratelimiter import get_rate_limiter, ENDPOINT_WEIGHTS, ORDER_ENDPOINTS, ALL_OPEN_ORDERS_WEIGHT
 from payload.orderbook import Orderbook
 
+# ccxt order statuses after which the order is not on the exchange anymore
+TERMINAL_STATUSES = ('closed', 'canceled', 'expired', 'rejected')
+
 
 class RestClient:
 
     def __init__(self, window: int = 100, api_key: str = None, secret: str = None,
-                 verbose: bool = False, logger: object = None, marketonly: bool = False):
+                 verbose: bool = False, logger: object = None, marketonly: bool = False,
+                 workers: int = 1, candle_store: object = None, weight_limit: int = 1200,
+                 orders_limit: int = 10, markets_cache_path: str = None, markets_ttl: float = 86400):
         '''
         Exchange initialising
+
+        workers controls how many REST requests can be in flight at the same time,
+        1 keeps the old sequential behaviour.
+        candle_store is an optional CandleStore to warm up and persist the ohlcv cache.
+        weight_limit (per minute) and orders_limit (per second) define rate limiters
+        shared by all clients of the exchange in the process.
+        Markets are cached for markets_ttl seconds in the process and in markets_cache_path dir if set.
         '''
         self.logger = logger
         self.dry_run = False
@@ -26,9 +43,17 @@ class RestClient:
                                                     "secret": self._secret,
                                                     'verbose': verbose,
                                                     'options': {'adjustForTimeDifference': True,
+                                                                'warnOnFetchOpenOrdersWithoutSymbol': False,
                                                                 'defaultTimeInForce': 'GTC', },  # 'GTC', 'IOC'
-                                                    'enableRateLimit': True})
+                                                    # Requests are limited by weight in _request
+                                                    'enableRateLimit': False})
         self.exchange_name = self.exchange.describe()['id']
+        # Response headers are kept per thread, last_response_headers of the shared instance
+        # may belong to a request of another thread
+        self._responses = threading.local()
+        self.exchange.on_rest_response = self._on_rest_response
+        self.rate_limiter = get_rate_limiter(self.exchange_name, capacity=weight_limit, interval=60)
+        self.orders_limiter = get_rate_limiter(f'{self.exchange_name}_orders', capacity=orders_limit, interval=1)
         self.possible_timeframes = {
             '1m':  '1m',
             '3m':  '3m',
@@ -48,21 +73,137 @@ class RestClient:
         self.orderbook = Orderbook(window, logger)
         # Load markets on initialization
         try:
-            self.markets = self.exchange.load_markets()
+            self.markets, source = load_markets(self.exchange, lambda: self._request('load_markets'),
+                                                path=markets_cache_path, ttl=markets_ttl, logger=self.logger)
         except:
             self.logger.error('Exchange connection problem!')
             sys.exit(56)
+        if source == 'disk' and self.exchange.options.get('adjustForTimeDifference'):
+            try:
+                self._request('load_time_difference', weight=ENDPOINT_WEIGHTS['fetch_time'])
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.warning('Time difference is not loaded: {}'.format(type(e).__name__))
+        if self.logger is not None:
+            self.logger.debug(f'Markets loaded from {source}')
         # Sort only active markets
         self.markets = {x: y for x, y in self.markets.items() if y['active']}
-        self.all_tickers: dict = None
+        # Columnar tickers table, read as a dict of tickers
+        self.all_tickers: TickerTable = None
+        # Tickers refreshed by process_tickers, None for all of them
+        self.watched_tickers: list = None
+        self.watched_tickers_limit = 100
         # Order and trade sets
         self.confirm_trade_collector = list()
         self._order_index = 0
         self._ex_index = 0
         self.order_history = dict()
+        # Cached candles as {(market, timeframe): ccxt ohlcv list}
         self._candlesticks = dict()
+        self.candle_store = candle_store
         self._trades = dict()
         self.balances = list()
+        # Concurrent requests are limited by shared rate limiters in _request
+        self.workers = max(1, int(workers))
+        # Last measured latency of ohlcv requests as {market: {timeframe: seconds}}
+        self.ohlcv_latency = dict()
+        # Last placed orders latency as {order_history key: {symbol: seconds}}
+        self.order_latency = dict()
+
+    def set_credentials(self, api_key: str = None, secret: str = None) -> None:
+        """
+        Replace API credentials keeping markets, caches and limiters
+
+        :param api_key: API key
+        :param secret: API secret
+        """
+        self._api_key = api_key
+        self._secret = secret
+        self.exchange.apiKey = api_key
+        self.exchange.secret = secret
+
+    # region Requests
+
+    def _on_rest_response(self, code, reason, url, method, response_headers, response_body, request_headers,
+                          request_body):
+        """
+        ccxt response hook, runs in the thread of the request before errors are handled
+        """
+        self._responses.headers = response_headers
+        return response_body.strip()
+
+    def _request(self, endpoint: str, *args, weight: float = None, **kwargs):
+        """
+        Call ccxt exchange method through the shared rate limiters.
+        Weight of the call is taken from ENDPOINT_WEIGHTS unless passed,
+        order endpoints take a slot of the orders limiter too.
+        Used weight headers of the response of this thread correct the limiter,
+        429/418 responses pause it for Retry-After seconds.
+
+        :param endpoint: ccxt method name, i.e. 'fetch_ohlcv'
+        :param weight: request weight
+        :return: ccxt method response
+        """
+        self.rate_limiter.acquire(weight if weight is not None else ENDPOINT_WEIGHTS.get(endpoint, 1))
+        if endpoint in ORDER_ENDPOINTS:
+            self.orders_limiter.acquire(1)
+        self._responses.headers = None
+        try:
+            return getattr(self.exchange, endpoint)(*args, **kwargs)
+        except (ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+            headers = {str(k).lower(): v for k, v in (self._responses.headers or {}).items()}
+            try:
+                retry_after = float(headers.get('retry-after', 60))
+            except (TypeError, ValueError):
+                retry_after = 60
+            if self.logger is not None:
+                self.logger.error(f"Rate limit exceeded on {endpoint}, pause requests for {retry_after} sec")
+            self.rate_limiter.pause(retry_after)
+            raise
+        finally:
+            self.rate_limiter.update_from_headers(self._responses.headers)
+
+    def _timed_call(self, func, *args, **kwargs):
+        """
+        Call func and measure the latency of the call
+
+        :return: func result and latency in seconds
+        :rtype: tuple
+        """
+        start = timer()
+        result = func(*args, **kwargs)
+        return result, timer() - start
+
+    def _map_concurrent(self, func, jobs: list) -> list:
+        """
+        Run func for every args tuple in jobs with at most self.workers threads.
+        Results keep the order of jobs.
+
+        :param func: callable
+        :param jobs: list of args tuples
+        :return: list of func results
+        """
+        if self.workers < 2 or len(jobs) < 2:
+            return [func(*j) for j in jobs]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            return list(executor.map(lambda j: func(*j), jobs))
+
+    def _report_latency(self, latency: dict, name: str, top: int = 3):
+        """
+        Log the slowest requests from {key: {sub_key: seconds}} latency dict
+
+        :param latency: latency dict
+        :param name: requests name used in the log message
+        :param top: how many slowest requests to report
+        """
+        if self.logger is None or len(latency) == 0:
+            return
+        flat = [(f'{x} {y}', v) for x, d in latency.items() for y, v in d.items()]
+        slowest = sorted(flat, key=lambda kv: -kv[1])[:top]
+        self.logger.debug("{} {} requests, slowest: {}".format(
+            len(flat), name, ', '.join("{} {:.3f}s".format(k, v) for k, v in slowest)))
+
+    # endregion
 
     # region Order
 
@@ -74,9 +215,10 @@ class RestClient:
         :rtype: bool
         """
         symbol = order['symbol']
-        order['cost'] = order['price'] * order['amount']
+        # Keep order itself untouched, it is passed to the exchange as is
+        values = dict(order, cost=order['price'] * order['amount'])
         limits = self.markets[symbol]['limits']
-        for p, v in order.items():
+        for p, v in values.items():
             if p in limits.keys():
                 min_v = limits[p]['min'] if limits[p]['min'] is not None else -float('Inf')
                 max_v = limits[p]['max'] if limits[p]['max'] is not None else float('Inf')
@@ -101,7 +243,9 @@ class RestClient:
     def place_multiple_orders(self, quotes: list):
         """
         Place multiple quotes and update order_history
-        with response indexing by id or client_order_id
+        with response indexing by id or client_order_id.
+        Quotes are sent concurrently when the client has more than one worker,
+        placement latency of every order is saved to self.order_latency with the same keys.
 
         :param quotes: Feed with quotes
         :type quotes: list
@@ -110,16 +254,41 @@ class RestClient:
             return False
         if len(quotes) < 1:
             return False
-        for q in quotes:
-            response = self.create_order(**q)
+        # Define client ids before sending, random seed is shared between threads
+        quotes = [dict(q, client_order_id=q.get('client_order_id') or self._new_client_order_id()) for q in quotes]
+        responses = self._map_concurrent(self._place_quote, [(q, ) for q in quotes])
+        self.order_latency.clear()
+        for response, latency in responses:
             if isinstance(response, dict):
                 if 'id' in response:
                     if response['id'] is not None:
-                        self.order_history[response['id']] = response
+                        key = response['id']
                     elif response['id'] is None:
-                        self.order_history[response['client_order_id']] = response
+                        key = response['client_order_id']
                 else:
-                    self.order_history[response['client_order_id']] = response
+                    key = response['client_order_id']
+                self.order_history[key] = response
+                self.order_latency[key] = {response['symbol']: latency}
+        self._report_latency(self.order_latency, 'order')
+
+    def _place_quote(self, quote: dict):
+        """
+        Create order from quote and measure placement latency
+
+        :return: create_order response and latency in seconds
+        :rtype: tuple
+        """
+        start = timer()
+        response = self.create_order(**quote)
+        return response, timer() - start
+
+    @staticmethod
+    def _new_client_order_id() -> str:
+        """
+        Create random 9 digits client order id
+        """
+        seed(time_ns())
+        return ''.join(["%s" % randint(0, 9) for _ in range(0, 9)])
 
     def create_order(self, symbol: str, side: str, order_type: str, amount,
                      price=None, client_order_id=None):
@@ -139,10 +308,7 @@ class RestClient:
         """
         # Create random number
         if client_order_id is None:
-            seed(time_ns())
-            client_order_id = ''.join(["%s" % randint(0, 9) for _ in range(0, 9)])
-        else:
-            client_order_id = client_order_id
+            client_order_id = self._new_client_order_id()
         if self.marketonly:
             order_type = 'MARKET'
         # Build order dict
@@ -163,7 +329,7 @@ class RestClient:
             return order_dict
 
         try:
-            order_c = self.exchange.create_order(**order_dict)
+            order_c = self._request('create_order', **order_dict)
             order_c['client_order_id'] = client_order_id
             return order_c
         except Exception as e:
@@ -181,9 +347,9 @@ class RestClient:
         :return:
         """
         if symbol and orderId is not None:
-            order_dict = dict(orderId=orderId, symbol=symbol, params={})
+            order_dict = dict(id=orderId, symbol=symbol, params={})
             try:
-                response = self.exchange.cancel_order(**order_dict)
+                response = self._request('cancel_order', **order_dict)
                 return response
             except Exception as e:
                 order_dict['status'] = type(e).__name__
@@ -198,38 +364,131 @@ class RestClient:
             return 0
         for m in markets:
             try:
-                resp = self.exchange.fetch_open_orders(m)
-                self.order_history[resp['orderId']] = resp
+                for o in self._request('fetch_open_orders', m):
+                    self.order_history[o['id']] = o
             except Exception as e:
-                self.logger.error('While fetching orders next error occur: ', type(e).__name__, "!!!", e.args)
+                self.logger.error('While fetching orders next error occur: {} {}'.format(type(e).__name__, e.args))
 
-    def fetch_processed_orders(self):
+    def open_orders(self) -> dict:
         """
-        Update status or orders in order_history,
-        on exception feed status with exception name
+        Orders from order_history placed on the exchange and not finished yet,
+        orders with exception name status may still be open and are included
+
+        :return: {order_history key: order}
+        :rtype: dict
         """
-        if len(self.order_history) == 0:
-            return False
+        return {x: y for orders in self._tracked_open_orders().values() for x, y in orders.items()}
+
+    def _tracked_open_orders(self) -> dict:
+        """
+        Orders from order_history placed on the exchange without terminal status
+        grouped by symbol, orders which last request failed are tracked until it succeeds
+
+        :return: {symbol: {order_history key: order}}
+        :rtype: dict
+        """
+        tracked = dict()
         for x, y in self.order_history.items():
-            try:
-                resp = self.exchange.fetch_order(y['id'], y['symbol'])
-                self.order_history[x] = resp
-            except Exception as e:
-                self.order_history[x]['status'] = type(e).__name__
+            if y.get('id') is not None and y.get('status') not in TERMINAL_STATUSES:
+                tracked.setdefault(y['symbol'], dict())[x] = y
+        return tracked
 
-    def cancel_processed_orders(self):
+    def _fetch_symbol_orders(self, symbol: str, orders: dict) -> dict:
         """
-        Cancel all orders from order_history which status are 'open'
+        Fetch state of finished orders of symbol with the cheapest requests:
+        one all orders request since the oldest order or one request per order.
+
+        :param orders: {order_history key: order}
+        :return: {order_history key: fetched order or exception name}
+        :rtype: dict
         """
-        if len(self.order_history) == 0:
+        result = dict()
+        try:
+            if len(orders) * ENDPOINT_WEIGHTS['fetch_order'] > ENDPOINT_WEIGHTS['fetch_orders']:
+                since = min(y['timestamp'] for y in orders.values())
+                fetched = {o['id']: o for o in self._request('fetch_orders', symbol, since=since)}
+                for x, y in orders.items():
+                    result[x] = fetched.get(y['id'], 'NotFound')
+            else:
+                for x, y in orders.items():
+                    result[x] = self._request('fetch_order', y['id'], symbol)
+        except Exception as e:
+            for x in orders.keys():
+                result.setdefault(x, type(e).__name__)
+        return result
+
+    def fetch_processed_orders(self):
+        """
+        Update status of open orders in order_history with bulk requests.
+        Open orders are taken with one open orders request per symbol
+        or with one account wide request, whichever weights less.
+        Only orders which are not open anymore are fetched one more time
+        to get their final state, grouped by symbol.
+        On exception feed status with exception name.
+        """
+        tracked = self._tracked_open_orders()
+        if len(tracked) == 0:
             return False
-        for x, y in self.order_history.items():
-            if y['status'] == 'open':
-                try:
-                    resp = self.exchange.fetch_order(y['id'], y['symbol'])
-                    self.order_history[x] = resp
-                except Exception as e:
+        symbols = list(tracked.keys())
+        try:
+            if len(symbols) * ENDPOINT_WEIGHTS['fetch_open_orders'] > ALL_OPEN_ORDERS_WEIGHT:
+                open_orders = self._request('fetch_open_orders', weight=ALL_OPEN_ORDERS_WEIGHT)
+            else:
+                responses = self._map_concurrent(self._request, [('fetch_open_orders', m) for m in symbols])
+                open_orders = [o for r in responses for o in r]
+        except Exception as e:
+            for orders in tracked.values():
+                for x in orders.keys():
                     self.order_history[x]['status'] = type(e).__name__
+            return False
+        open_orders = {o['id']: o for o in open_orders}
+        finished = dict()
+        for symbol, orders in tracked.items():
+            for x, y in orders.items():
+                if y['id'] in open_orders:
+                    self.order_history[x] = open_orders[y['id']]
+                else:
+                    finished.setdefault(symbol, dict())[x] = y
+        responses = self._map_concurrent(self._fetch_symbol_orders, list(finished.items()))
+        for response in responses:
+            for x, y in response.items():
+                if isinstance(y, dict):
+                    self.order_history[x] = y
+                else:
+                    self.order_history[x]['status'] = y
+        return True
+
+    def _cancel_tracked_order(self, key, order: dict):
+        """
+        Cancel order from order_history
+
+        :return: order_history key and cancel response or exception name
+        :rtype: tuple
+        """
+        try:
+            return key, self._request('cancel_order', order['id'], order['symbol'])
+        except Exception as e:
+            return key, type(e).__name__
+
+    def cancel_processed_orders(self, keys: list = None):
+        """
+        Cancel concurrently all orders from order_history which status are not terminal
+        and update order_history with responses,
+        on exception feed status with exception name
+
+        :param keys: order_history keys to cancel only these of open orders, None for all
+        """
+        jobs = [(x, y) for orders in self._tracked_open_orders().values() for x, y in orders.items()
+                if keys is None or x in keys]
+        if len(jobs) == 0:
+            return False
+        for x, response in self._map_concurrent(self._cancel_tracked_order, jobs):
+            if isinstance(response, dict):
+                self.order_history[x] = dict(self.order_history[x], **{k: v for k, v in response.items()
+                                                                      if v is not None})
+            else:
+                self.order_history[x]['status'] = response
+        return True
 
     def cancel_all_orders(self, symbol: str = None, orders: dict = None):
         if symbol is None and orders is None:
@@ -237,12 +496,11 @@ class RestClient:
             return 0
         if orders is not None:
             for o in orders.values():
-                self.exchange.cancel_order(o['id'])
+                self._request('cancel_order', o['id'], o['symbol'])
         if symbol is not None:
-            open_orders = self.exchange.fetch_open_orders(symbol=symbol)
-            for o in open_orders.values():
-                self.exchange.cancel_order(o['id'])
-
+            open_orders = self._request('fetch_open_orders', symbol=symbol)
+            for o in open_orders:
+                self._request('cancel_order', o['id'], symbol)
 
     # endregion
 
@@ -263,7 +521,7 @@ class RestClient:
         Fetch and filter not null balances
         """
         try:
-            result = self.exchange.fetch_balance()
+            result = self._request('fetch_balance')
             self.balances = self._filter_not_null(result)
         except Exception as e:
             # print(type(e).__name__, e.args, str(e))
@@ -286,7 +544,7 @@ class RestClient:
         :return:
         """
         try:
-            resp = self.exchange.fetch_order_book(symbol, limit=limit)
+            resp = self._request('fetch_order_book', symbol, limit=limit)
             self.orderbook.update_ob(resp, run_step, spread_lag_size)
             # self.update_ob(resp, run_step, spread_lag_size)
         except Exception as e:
@@ -297,25 +555,72 @@ class RestClient:
 
     # region OHLCV Candles
 
-    def get_ohlcv(self, symbol, timeframe: str = '1h', limit: int = 200):
+    def get_ohlcv(self, symbol, timeframe: str = '1h', limit: int = 200, since: int = None):
         """Fetch exchanges ticker for necessary pair, timeframe and length
 
         :param symbol: Symbol (i.e. BNB/BTC)
         :param timeframe: 1m, 5m...
         :param limit: default == max == 500
+        :param since: timestamp in ms of the earliest candle to fetch
         :return: ccxt ohlcv dict
         :rtype: dict
         """
         try:
-            response = self.exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+            response = self._request('fetch_ohlcv', symbol, timeframe=timeframe, since=since, limit=limit)
         except Exception as e:
             self.logger.error("While fetching ohlcv next error occur: {}\n{}\n".format(type(e).__name__, e.args))
             self.logger.error("Exiting")
             sys.exit(56)
         return response
 
+    def update_ohlcv(self, symbol, timeframe: str = '1h', limit: int = 200):
+        """Refresh cached candles of symbol and timeframe and return last limit of them.
+
+        Only candles since the last cached one are requested, the last cached candle
+        is still forming, so it is replaced by the fresh one. Empty cache is filled
+        from the candle store first, if any. Gap longer than limit or cache shorter than limit
+        falls back to the full fetch.
+        Fetched candles are appended to the candle store.
+
+        :param symbol: Symbol (i.e. BNB/BTC)
+        :param timeframe: 1m, 5m...
+        :param limit: candles window to keep
+        :return: ccxt ohlcv list
+        :rtype: list
+        """
+        key = (symbol, timeframe)
+        cached = self._candlesticks.get(key)
+        if not cached and self.candle_store is not None:
+            cached = self.candle_store.tail(symbol, timeframe, limit)
+        # Short cached or stored history can not fill the window, i.e. after limit increase, fetch it all
+        if cached and len(cached) < limit:
+            cached = None
+        if cached:
+            tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+            missed = (self.exchange.milliseconds() - cached[-1][0]) // tf_ms + 1
+            if missed > limit:
+                cached = None
+        if cached:
+            response = self.get_ohlcv(symbol, timeframe, limit=missed + 1, since=cached[-1][0])
+            if len(response) > 0:
+                # Drop the forming candle and anything the fresh response overlaps
+                while cached and cached[-1][0] >= response[0][0]:
+                    cached.pop()
+                cached.extend(response)
+        else:
+            response = self.get_ohlcv(symbol, timeframe, limit)
+            cached = list(response)
+        if self.candle_store is not None:
+            self.candle_store.append(symbol, timeframe, response)
+        del cached[:-limit]
+        self._candlesticks[key] = cached
+        return list(cached)
+
     def process_ohlcv(self, markets: list, time_frames: list = None, limit: int = 100):
-        """Process multiple timeframes ohlcv data for markets in a list
+        """Process multiple timeframes ohlcv data for markets in a list.
+        Candles are cached between calls and only the tail is requested, see update_ohlcv.
+        Requests run concurrently when the client has more than one worker,
+        latency of every request is saved to self.ohlcv_latency.
 
         :type markets: list
         :type time_frames: list or None
@@ -340,74 +645,76 @@ class RestClient:
             time_frames = intersection
         else:
             return {}
+        jobs = [(m, tf) for m in markets for tf in time_frames]
+        responses = self._map_concurrent(self._timed_call, [(self.update_ohlcv, m, tf, limit) for m, tf in jobs])
         portfolio_ohlcv = dict()
-        for m in markets:
-            portfolio_ohlcv[m] = {ptf[tf]: self.get_ohlcv(m, tf, limit) for tf in time_frames}
+        self.ohlcv_latency.clear()
+        for (m, tf), (candles, latency) in zip(jobs, responses):
+            portfolio_ohlcv.setdefault(m, dict())[ptf[tf]] = candles
+            self.ohlcv_latency.setdefault(m, dict())[ptf[tf]] = latency
+        self._report_latency(self.ohlcv_latency, 'ohlcv')
         return portfolio_ohlcv
 
     # endregion
 
     # region Ticker
 
-    def calc_tickers(self, tickers: list = None):
-        """
-        Check for tickers list or iterate throw all tickers to add spread, mid_price data.
-        Add data to self.all_tickers container
-
-        :param tickers: list of valid tickers
-        :return:
+    def watch_tickers(self, symbols: list = None, limit: int = 100) -> None:
         """
-        if tickers is not None:
-            m = tickers
-        else:
-            m = self.all_tickers.keys()
-        for s in m:
-            tob_ask = self.all_tickers[s]['ask']
-            tob_bid = self.all_tickers[s]['bid']
-            # Calculate some digits
-            mid_price = rounded_to_precision((tob_bid + tob_ask) / 2, 8)
-            spread = rounded_to_precision((tob_ask - tob_bid), 8)
-            if mid_price > 0:
-                spread_p = rounded_to_precision(100 * spread / mid_price, 4)
-            else:
-                spread_p = 0
-            # Update all_tickers with new data
-            self.all_tickers[s]['mid_price'] = mid_price
-            self.all_tickers[s]['spread'] = spread
-            self.all_tickers[s]['spread_p'] = spread_p
-            self.all_tickers[s]['timestamp'] = time_ns()
+        Define tickers the client has to keep fresh. process_tickers then refreshes
+        only them instead of all exchange tickers.
 
-    def clear_empty_tickers(self):
+        :param symbols: watched symbols, None to refresh all tickers
+        :param limit: biggest watched set fetched by symbols, bigger sets use the bulk call
         """
-        Check for non empty tickers and clear tickers without any quotes
-        Building new dict with non zero quote prices
-        """
-        if self.all_tickers is not None:
-            self.all_tickers = {x: y for x, y in self.all_tickers.items() if y['bid'] > 0 and y['ask'] > 0}
+        self.watched_tickers = [x for x in symbols if x in self.markets] if symbols is not None else None
+        self.watched_tickers_limit = limit
 
     def process_tickers(self, tickers: list = None):
         """
-        Call http api for all tickers data.
-        Delete empty responses from all_tickers dict.
-        Calculate inplace data for tickers and add timestamp of calculation.
+        Call http api for tickers data, only for watched or passed tickers if they are defined.
+        Fall back to all tickers call when there are more symbols than watched_tickers_limit
+        or more than half of the markets, where the bulk call is cheaper.
+        Tickers without quotes are skipped and spread, mid_price data
+        are calculated with calculation timestamp in the TickerTable.
 
         :param tickers: pass tickers list to process only that tickers
         :type tickers: list
         """
-        self.get_all_tickers()
-        self.clear_empty_tickers()
-        self.calc_tickers(tickers)
+        symbols = tickers if tickers is not None else self.watched_tickers
+        if symbols is not None and 0 < len(symbols) <= min(self.watched_tickers_limit, len(self.markets) // 2):
+            self.get_tickers(symbols)
+        else:
+            self.get_all_tickers()
+
+    def get_tickers(self, symbols: list):
+        """
+        Fetch exchanges tickers for symbols only
+        Save response to all_tickers table, replace previous state
+
+        :param symbols: list of symbols
+        """
+        try:
+            # Single symbol book ticker weights half of the multiple symbols one
+            weight = ENDPOINT_WEIGHTS['fetch_bids_asks'] / 2 if len(symbols) == 1 else None
+            response = self._request('fetch_bids_asks', symbols, weight=weight)
+            if self.all_tickers is None:
+                self.all_tickers = TickerTable()
+            self.all_tickers.update(response)
+        except Exception as e:
+            self.logger.error("While fetching tickers next error occur: {}\n{}\n".format(type(e).__name__, e.args))
+            self.all_tickers = None
 
     def get_all_tickers(self):
         """
         Fetch exchanges tickers for all pairs
-        Save response to all_tickers, clear previous state
+        Save response to all_tickers table, replace previous state
         """
         try:
-            response = self.exchange.fetch_bids_asks()
-            if self.all_tickers is not None:
-                self.all_tickers.clear()
-            self.all_tickers = response
+            response = self._request('fetch_bids_asks')
+            if self.all_tickers is None:
+                self.all_tickers = TickerTable()
+            self.all_tickers.update(response)
         except Exception as e:
             self.logger.error("While fetching ohlcv next error occur: {}\n{}\n".format(type(e).__name__, e.args))
             self.all_tickers = None
@@ -416,13 +723,15 @@ class RestClient:
 
     def _fetch_ticker(self, symbol):
         """
-        Fetch symbol ticker and update all_tickers dict
+        Fetch symbol ticker and update all_tickers table
 
         :param symbol: market symbol
         """
         try:
-            response = self.exchange.fetch_ticker(symbol)
-            self.all_tickers[symbol] = response
+            response = self._request('fetch_ticker', symbol)
+            if self.all_tickers is None:
+                self.all_tickers = TickerTable()
+            self.all_tickers.set({symbol: response})
         except Exception as e:
             self.logger.error("While fetching ohlcv next error occur: {}\n{}\n".format(type(e).__name__, e.args))
             self.logger.error("Exiting")
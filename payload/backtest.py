@@ -0,0 +1,330 @@
+"""
+Walk-forward backtesting
+
+Replays stored ohlcv candles of portfolio markets on a simulated clock through the live
+rebalancing logic: BacktestRunner is a Runner with a simulated exchange, so portfolio
+valuation, PortfolioOpt reports, weights comparison, quote generation and order
+reconciliation are the real ones. Every cycle optimizes the window of candles known at
+its close and reconciles quotes with open orders, which fill at their price when candles
+after the cycle trade through it.
+Only cycles are replayed one by one, portfolio value of every candle, turnover and fees
+are counted at once over time from balances after cycles and fills.
+
+ """
+import logging
+import types
+import numpy
+import pandas as pd
+
+from payload.portfolioOpt import PortfolioOpt
+from payload.runner import Runner
+
+# Runner warnings of thousands of backtest cycles are not printed by default
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+def align_candles(ohlcv_data: dict, markets: list, time_frame: str) -> tuple:
+    """
+    Low, high and close prices of markets on the union of candle timestamps,
+    missing candles are forward filled with the last close
+
+    :param ohlcv_data: candles in ccxt format or CandleStore arrays, {market: {time_frame: candles}}
+    :param markets: markets to align
+    :param time_frame: time frame to choose from ohlcv_data
+    :return: int64 timestamps and (timestamps, markets) lows, highs and closes arrays,
+             NaN before the first candle of market
+    :rtype: tuple
+    """
+    candles = [numpy.asarray(ohlcv_data[m][time_frame], dtype=numpy.float64).reshape(-1, 6) for m in markets]
+    timestamps = numpy.unique(numpy.concatenate([x[:, 0] for x in candles])).astype(numpy.int64) \
+        if len(candles) > 0 else numpy.empty(0, dtype=numpy.int64)
+    # Same regular grid as PortfolioOpt.build_pricing_panel
+    step = PortfolioOpt.timeframe_ms(time_frame)
+    if step is not None and len(timestamps) > 1:
+        timestamps = numpy.union1d(timestamps, numpy.arange(timestamps[0], timestamps[-1] + 1, step))
+    lows, highs, closes = (numpy.full((len(timestamps), len(markets)), numpy.nan) for _ in range(3))
+    for j, x in enumerate(candles):
+        rows = numpy.searchsorted(timestamps, x[:, 0].astype(numpy.int64))
+        lows[rows, j], highs[rows, j], closes[rows, j] = x[:, 3], x[:, 2], x[:, 4]
+    # Gaps trade at the last close
+    last = numpy.where(numpy.isnan(closes), 0, numpy.arange(len(timestamps))[:, None])
+    numpy.maximum.accumulate(last, axis=0, out=last)
+    filled = closes[last, numpy.arange(len(markets))]
+    gaps = numpy.isnan(closes)
+    lows[gaps], highs[gaps], closes = filled[gaps], filled[gaps], filled
+    return timestamps, lows, highs, closes
+
+
+class SimulatedExchange:
+    """
+    Exchange client stand-in: tickers come from replayed closes with a fixed spread,
+    orders rest in order_history until they are filled or canceled like live ones
+    """
+    exchange_name = 'backtest'
+
+    def __init__(self, markets: list, balances: dict, spread: float = 0.001, fee: float = 0.001) -> None:
+        """
+        :param markets: tradable markets, i.e. ['ETH/BTC', 'BTC/USDT']
+        :param balances: initial amounts {asset: amount}
+        :param spread: relative bid-ask spread around close
+        :param fee: relative fee taken from the received asset
+        """
+        self.exchange = types.SimpleNamespace(id=self.exchange_name)
+        self.markets = {m: {'symbol': m, 'base': m.split('/')[0], 'quote': m.split('/')[1], 'active': True}
+                        for m in markets}
+        self.symbols = list(markets)
+        self.spread = spread
+        self.fee = fee
+        self.balances = {x: {'free': y, 'locked': 0.0, 'all': y} for x, y in balances.items()}
+        self.all_tickers = dict()
+        self.watched_tickers = None
+        self.order_history = dict()
+        self._order_index = 0
+        self.dry_run = False
+
+    def watch_tickers(self, symbols: list = None, limit: int = 100) -> None:
+        self.watched_tickers = symbols
+
+    def process_tickers(self, tickers: list = None) -> None:
+        pass
+
+    def fetch_balances(self) -> None:
+        pass
+
+    def set_prices(self, closes: numpy.ndarray) -> None:
+        """
+        Tickers of all markets around closes aligned with self.symbols
+        """
+        self.all_tickers = {m: {'bid': c * (1 - self.spread / 2), 'ask': c * (1 + self.spread / 2), 'mid_price': c,
+                                'spread': c * self.spread, 'spread_p': 100 * self.spread}
+                            for m, c in zip(self.symbols, closes.tolist()) if c == c}
+
+    def place_multiple_orders(self, quotes: list) -> None:
+        for q in quotes:
+            self._order_index += 1
+            key = str(self._order_index)
+            self.order_history[key] = dict(q, id=key, remaining=q['amount'], filled=0.0, status='open')
+
+    def open_orders(self) -> dict:
+        return {x: y for x, y in self.order_history.items() if y['status'] == 'open'}
+
+    def cancel_processed_orders(self, keys: list = None) -> None:
+        for x, y in self.open_orders().items():
+            if keys is None or x in keys:
+                y['status'] = 'canceled'
+
+    def _add(self, asset: str, amount: float) -> None:
+        balance = self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0, 'all': 0.0})
+        balance['free'] += amount
+        balance['all'] += amount
+
+    def fill(self, lows: numpy.ndarray, highs: numpy.ndarray) -> list:
+        """
+        Fill open orders which prices were reached, buys are limited by free quote
+        and sells by free base balance, the rest of partially filled orders stays open
+
+        :param lows: lowest prices since orders were placed aligned with self.symbols
+        :param highs: highest prices since orders were placed aligned with self.symbols
+        :return: fills as (symbol, side, base amount, price)
+        :rtype: list
+        """
+        index = {m: i for i, m in enumerate(self.symbols)}
+        fills = list()
+        for x in self.open_orders().values():
+            base, quote = x['symbol'].split('/')
+            i = index[x['symbol']]
+            if x['side'] == 'BUY' and lows[i] <= x['price']:
+                amount = min(x['remaining'], self.balances.get(quote, {'free': 0.0})['free'] / x['price'])
+                if amount > 0:
+                    self._add(quote, -amount * x['price'])
+                    self._add(base, amount * (1 - self.fee))
+            elif x['side'] == 'SELL' and highs[i] >= x['price']:
+                amount = min(x['remaining'], self.balances.get(base, {'free': 0.0})['free'])
+                if amount > 0:
+                    self._add(base, -amount)
+                    self._add(quote, amount * x['price'] * (1 - self.fee))
+            else:
+                continue
+            if amount > 0:
+                x['filled'] += amount
+                x['remaining'] -= amount
+                fills.append((x['symbol'], x['side'], amount, x['price']))
+            if x['remaining'] <= 1e-12 * x['amount']:
+                x['status'] = 'closed'
+        return fills
+
+
+class BacktestRunner(Runner):
+    """
+    Runner without ui, database and main loop over a simulated exchange
+    """
+
+    def __init__(self, exchange: SimulatedExchange, logger: object = None, **kwargs):
+        self.logger = logger or logging.getLogger(__name__)
+        self.file_watcher = None
+        self._init_state(kwargs)
+        self.db = None
+        self.candle_store = None
+        self.exchange = exchange
+        self.data_provider_list = [exchange.exchange_name]
+        # Report cache is useless for never repeated windows
+        self._init_optimizers(dict(kwargs, OPTIMIZER_CACHE_SIZE=0, OPTIMIZER_CACHE_PATH=None, OPTIMIZER_WORKERS=1))
+        self._market_prices = None
+        self._init_portfolio(kwargs)
+
+    def _ohlcv_close_prices(self) -> numpy.ndarray:
+        return self._market_prices
+
+    def cycle(self, pricing_data: pd.DataFrame, market_prices: numpy.ndarray) -> list:
+        """
+        One rebalancing cycle at the close of the last pricing data row
+
+        :param pricing_data: window of pricing data known at the cycle
+        :param market_prices: closes of valuation markets
+        :return: placed quotes, open orders matching other quotes are kept
+        :rtype: list
+        """
+        self.run_step += 1
+        # Forget finished orders like the live loop
+        for x in [x for x, y in self.exchange.order_history.items() if y['status'] != 'open']:
+            del self.exchange.order_history[x]
+        self._market_prices = market_prices
+        self.balances = {x: y for x, y in self.exchange.balances.items() if x in self.portfolio_assets}
+        self._update_valuation()
+        self.portfolio_recommended_weights, _ = self.portfolio_opt.generate_report_from_pricing_data(
+                pricing_data, self.portfolio_time_frames[0],
+                weight_bounds=self.portfolio_weight_bounds,
+                base_asset=self.portfolio_base_asset,
+                exp_return_periods=len(pricing_data),
+                risk_model_periods=len(pricing_data),
+                target_return=self.portfolio_target_return,
+                target_risk=self.portfolio_target_risk)
+        self._compare_weights(self.portfolio_current_weights, self.portfolio_recommended_weights)
+        self.quote_collector.clear()
+        self._generate_quotes()
+        self._reconcile_orders()
+        quotes = list(self.quote_collector)
+        self.exchange.place_multiple_orders(quotes)
+        self.quote_collector.clear()
+        return quotes
+
+
+class Backtest:
+    """
+    Cycles are replayed one by one, every one solves the optimizer and routes its trades. The qp
+    engine takes about 10 to 15 ms per cycle on 8 assets, so a year of hourly cycles runs in one to
+    two minutes and longer with more assets, scipy with FRONTIER_POINTS traces the frontier on every
+    new window and is an order of magnitude slower. Backtests use the qp engine unless
+    OPTIMIZER_ENGINE is set.
+    """
+
+    def __init__(self, ohlcv_data: dict, balances: dict, settings: dict, spread: float = 0.001,
+                 fee: float = 0.001, window: int = 200, logger: object = None) -> None:
+        """
+        :param ohlcv_data: stored candles of tradable markets {market: {time_frame: candles}},
+                           CandleStore.read arrays or ccxt lists
+        :param balances: initial amounts {asset: amount}
+        :param settings: Runner settings, TIME_FRAMES[0] candles are replayed
+                         and LOOP_INTERVAL is rounded to whole candles,
+                         OPTIMIZER_ENGINE defaults to 'qp'
+        :param spread: relative bid-ask spread of simulated tickers
+        :param fee: relative trading fee
+        :param window: candles known to the optimizer at every cycle, like ohlcv limit of Runner
+        :param logger: logger
+        """
+        self.settings = dict({'OPTIMIZER_ENGINE': 'qp'}, **settings)
+        self.time_frame = self.settings['TIME_FRAMES'][0]
+        self.window = window
+        self.exchange = SimulatedExchange(sorted(ohlcv_data), balances, spread=spread, fee=fee)
+        self.runner = BacktestRunner(self.exchange, logger=logger, **self.settings)
+        self.timestamps, self.lows, self.highs, self.closes = align_candles(ohlcv_data, self.exchange.symbols,
+                                                                            self.time_frame)
+        # Pricing data of all stored candles, cycles read windows of it
+        self.pricing_data = self.runner.portfolio_opt.build_pricing_data_from_ohlcv(
+                {m: ohlcv_data[m] for m in sorted(self.runner.portfolio_base_markets)},
+                self.runner.portfolio_base_asset, self.time_frame)
+        candle_ms = PortfolioOpt.timeframe_ms(self.time_frame) or 3600000
+        self.interval = max(1, int(round(1000 * numpy.mean(self.settings['LOOP_INTERVAL']) / candle_ms)))
+        self.quotes = list()
+        self.fills = list()
+
+    def _asset_prices(self) -> numpy.ndarray:
+        """
+        (timestamps, assets) prices of portfolio assets in base asset along valuation routes
+        """
+        valuation = self.runner.valuation
+        market_index = {m: i for i, m in enumerate(self.exchange.symbols)}
+        closes = self.closes[:, [market_index[m] for m in valuation.markets]]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.exp(numpy.where(numpy.isfinite(closes), numpy.log(closes), numpy.nan) @ valuation.exponents.T)
+
+    def run(self) -> pd.DataFrame:
+        """
+        Replay cycles every interval candles after the first window
+
+        :return: value, turnover and fees in base asset for every candle with DatetimeIndex
+        :rtype: pd.DataFrame
+        """
+        valuation = self.runner.valuation
+        assets = valuation.assets
+        market_index = {m: i for i, m in enumerate(self.exchange.symbols)}
+        valuation_columns = [market_index[m] for m in valuation.markets]
+        rows = numpy.searchsorted(self.timestamps, self.pricing_data.index.values.astype('datetime64[ms]')
+                                  .astype(numpy.int64))
+        cycles = numpy.arange(self.window - 1, len(self.pricing_data), self.interval)
+        holdings = numpy.zeros((len(cycles) + 1, len(assets)))
+        holdings[0] = [self.exchange.balances.get(a, {'all': 0.0})['all'] for a in assets]
+        self.quotes, self.fills = list(), list()
+        previous = None
+        for k, i in enumerate(cycles):
+            row = rows[i]
+            if previous is not None and len(self.exchange.open_orders()) > 0:
+                # Open orders fill against candles after the previous cycle
+                for fill in self.exchange.fill(numpy.nanmin(self.lows[previous + 1:row + 1], axis=0),
+                                               numpy.nanmax(self.highs[previous + 1:row + 1], axis=0)):
+                    self.fills.append((row, ) + fill)
+            self.exchange.set_prices(self.closes[row])
+            quotes = self.runner.cycle(self.pricing_data.iloc[i - self.window + 1:i + 1],
+                                       self.closes[row, valuation_columns])
+            self.quotes += [(row, x) for x in quotes]
+            holdings[k + 1] = [self.exchange.balances.get(a, {'all': 0.0})['all'] for a in assets]
+            previous = row
+        return self._history(rows[cycles] if len(cycles) > 0 else numpy.empty(0, dtype=numpy.int64), holdings)
+
+    def _history(self, cycle_rows: numpy.ndarray, holdings: numpy.ndarray) -> pd.DataFrame:
+        """
+        Portfolio value of every candle from balances held since the last cycle,
+        turnover and fees from fills valued at fill candle prices
+        """
+        prices = numpy.nan_to_num(self._asset_prices())
+        # Balances after fills of a cycle are known at that cycle only, fills happen in between
+        held = numpy.searchsorted(cycle_rows, numpy.arange(len(self.timestamps)), side='left')
+        fill_rows = numpy.array([x[0] for x in self.fills], dtype=numpy.int64)
+        value = (holdings[held] * prices).sum(axis=1)
+        turnover = numpy.zeros(len(self.timestamps))
+        fees = numpy.zeros(len(self.timestamps))
+        if len(self.fills) > 0:
+            asset_index = {a: j for j, a in enumerate(self.runner.valuation.assets)}
+            bases = numpy.array([asset_index.get(x[1].split('/')[0], -1) for x in self.fills])
+            amounts = numpy.array([x[3] for x in self.fills])
+            traded = numpy.where(bases >= 0, amounts * prices[fill_rows, numpy.maximum(bases, 0)], 0)
+            turnover = numpy.bincount(fill_rows, weights=traded, minlength=len(self.timestamps))
+            fees = turnover * self.exchange.fee
+        history = pd.DataFrame({'value': value, 'turnover': turnover, 'fees': fees},
+                               index=pd.DatetimeIndex(self.timestamps.astype('datetime64[ms]'), name='date'))
+        start = cycle_rows[0] if len(cycle_rows) > 0 else len(history)
+        return history.iloc[start:]
+
+    @ staticmethod
+    def summary(history: pd.DataFrame) -> dict:
+        """
+        Total return, maximum drawdown, turnover relative to mean value and fees of backtest history
+
+        :rtype: dict
+        """
+        value = history['value'].values
+        if len(value) == 0 or value[0] <= 0:
+            return {'return': 0.0, 'max_drawdown': 0.0, 'turnover': 0.0, 'fees': 0.0}
+        return {'return':       float(value[-1] / value[0] - 1),
+                'max_drawdown': float((1 - value / numpy.maximum.accumulate(value)).max()),
+                'turnover':     float(history['turnover'].sum() / value.mean()),
+                'fees':         float(history['fees'].sum())}
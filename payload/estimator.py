@@ -0,0 +1,127 @@
+"""
+Streaming expected returns and covariance estimator
+
+Keeps sums and cross-products of returns of closed bars over the rolling window,
+so a new closed bar costs O(n^2) instead of recounting the whole window.
+The last bar of pricing data is still forming and changes every cycle,
+its return is added to the stored state on read only.
+Results match PyPortfolioOpt mean_historical_return and sample_cov of the same data.
+Windows with missing prices are counted by PyPortfolioOpt directly.
+
+ """
+from collections import deque
+import numpy
+import pandas as pd
+from pypfopt import risk_models
+from pypfopt import expected_returns
+
+
+class RollingEstimator:
+
+    def __init__(self) -> None:
+        self.columns = None
+        # Timestamps of the first and the last closed bars of the window, None to rebuild
+        self._first = None
+        self._last = None
+        # Last closed prices and forming bar prices
+        self._last_prices = None
+        self._forming_prices = None
+        # Shifted closed returns of the window, their sums and cross-products
+        self._returns = deque()
+        self._shift = None
+        self._sums = None
+        self._products = None
+        self._slides = 0
+        # Pricing data counted by PyPortfolioOpt when window has missing prices
+        self._batch = None
+        self.rebuilds = 0
+
+    def _rebuild(self, pricing_data: pd.DataFrame) -> None:
+        self.rebuilds += 1
+        self._slides = 0
+        self.columns = list(pricing_data.columns)
+        values = pricing_data.values
+        if len(values) < 3 or numpy.isnan(values).any():
+            self._batch = pricing_data
+            self._first = None
+            return
+        self._batch = None
+        returns = values[1:-1] / values[:-2] - 1
+        self._shift = returns.mean(axis=0)
+        shifted = returns - self._shift
+        self._returns = deque(shifted)
+        self._sums = shifted.sum(axis=0)
+        self._products = shifted.T @ shifted
+        self._first = pricing_data.index[0]
+        self._last = pricing_data.index[-2]
+        self._last_prices = values[-2]
+        self._forming_prices = values[-1]
+
+    def update(self, pricing_data: pd.DataFrame) -> bool:
+        """
+        Move the window to the pricing data of the next cycle.
+        New closed bars are added and the oldest ones removed,
+        the state is recounted when data does not continue the window.
+
+        :param pricing_data: pricing data frame with DatetimeIndex, last row is the forming bar
+        :return: True if state was updated incrementally
+        :rtype: bool
+        """
+        index = pricing_data.index
+        values = pricing_data.values
+        if self._first is None or list(pricing_data.columns) != self.columns or len(values) < 3:
+            self._rebuild(pricing_data)
+            return False
+        p = index.searchsorted(self._last)
+        # Window of the same length must contain the last stored closed bar with the same prices,
+        # state is recounted once per window length to drop rounding errors
+        if len(values) != len(self._returns) + 2 or p >= len(index) - 1 or index[p] != self._last \
+                or not numpy.array_equal(values[p], self._last_prices) \
+                or self._slides + len(index) - 2 - p > len(self._returns):
+            self._rebuild(pricing_data)
+            return False
+        new = values[p:-1]
+        if numpy.isnan(new).any() or numpy.isnan(values[-1]).any():
+            self._rebuild(pricing_data)
+            return False
+        for r in new[1:] / new[:-1] - 1 - self._shift:
+            old = self._returns.popleft()
+            self._returns.append(r)
+            self._sums += r - old
+            self._products += numpy.outer(r, r) - numpy.outer(old, old)
+            self._slides += 1
+        self._first = index[0]
+        self._last = index[-2]
+        self._last_prices = values[-2]
+        self._forming_prices = values[-1]
+        return True
+
+    def _window(self):
+        """
+        Count, sums and cross-products of shifted returns including the forming bar
+        """
+        forming = self._forming_prices / self._last_prices - 1 - self._shift
+        return len(self._returns) + 1, self._sums + forming, self._products + numpy.outer(forming, forming)
+
+    def mean_returns(self, frequency: int) -> pd.Series:
+        """
+        Annualised mean returns, same as expected_returns.mean_historical_return
+
+        :param frequency: number of time periods
+        """
+        if self._batch is not None:
+            return expected_returns.mean_historical_return(self._batch, frequency=frequency)
+        count, sums, _ = self._window()
+        return pd.Series((sums / count + self._shift) * frequency, index=self.columns)
+
+    def covariance(self, frequency: int) -> pd.DataFrame:
+        """
+        Annualised sample covariance of returns, same as risk_models.sample_cov
+
+        :param frequency: number of time periods
+        """
+        if self._batch is not None:
+            return risk_models.sample_cov(self._batch, frequency=frequency)
+        count, sums, products = self._window()
+        cov = (products - numpy.outer(sums, sums) / count) / (count - 1)
+        return pd.DataFrame(cov * frequency, index=self.columns, columns=self.columns)
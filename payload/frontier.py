@@ -0,0 +1,87 @@
+"""
+Efficient frontier grid
+
+Keeps efficient portfolios traced on a grid of target returns as
+(return, risk, weights) points ordered by return from the minimum volatility
+portfolio to the maximum return one. Target return and target risk queries
+are answered by linear interpolation between neighbour points. Weights
+interpolated between two feasible portfolios stay feasible for linear
+constraints, and the interpolated risk is an upper bound of the real one.
+
+ """
+import numpy
+
+
+class Frontier:
+
+    def __init__(self, tickers: list, returns, risks, weights, risk_free_rate: float = 0.02) -> None:
+        """
+        :param tickers: assets of weights columns
+        :param returns: expected returns of grid points
+        :param risks: volatility of grid points
+        :param weights: (points, assets) weights array
+        :param risk_free_rate: risk free rate to count Sharpe ratio with
+        """
+        order = numpy.argsort(returns, kind='stable')
+        self.tickers = list(tickers)
+        self.returns = numpy.asarray(returns, dtype=numpy.float64)[order]
+        self.risks = numpy.asarray(risks, dtype=numpy.float64)[order]
+        self.weights = numpy.asarray(weights, dtype=numpy.float64)[order]
+        self.risk_free_rate = risk_free_rate
+        self.sharpe = self._sharpe(self.returns, self.risks)
+
+    def _sharpe(self, returns, risks) -> numpy.ndarray:
+        """
+        Sharpe ratio, riskless points, i.e. all in base asset, get +-inf by sign of excess return
+        """
+        excess = numpy.asarray(returns, dtype=numpy.float64) - self.risk_free_rate
+        risks = numpy.asarray(risks, dtype=numpy.float64)
+        return numpy.divide(excess, risks, out=numpy.where(excess > 0, numpy.inf, -numpy.inf), where=risks > 0)
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def _between(self, i: int, t: float) -> tuple:
+        ret = (1 - t) * self.returns[i - 1] + t * self.returns[i]
+        risk = (1 - t) * self.risks[i - 1] + t * self.risks[i]
+        return ret, risk, (1 - t) * self.weights[i - 1] + t * self.weights[i]
+
+    def for_return(self, target_return: float):
+        """
+        Minimum risk portfolio with target return
+
+        :return: return, risk and weights array or None if target is out of the grid
+        :rtype: tuple or None
+        """
+        if len(self) == 0 or not self.returns[0] <= target_return <= self.returns[-1]:
+            return None
+        i = int(numpy.searchsorted(self.returns, target_return))
+        if i == 0 or self.returns[i] == target_return:
+            return self.returns[i], self.risks[i], self.weights[i].copy()
+        return self._between(i, (target_return - self.returns[i - 1]) / (self.returns[i] - self.returns[i - 1]))
+
+    def for_risk(self, target_risk: float):
+        """
+        Maximum Sharpe ratio portfolio with risk not above target risk,
+        like EfficientFrontier.efficient_risk
+
+        :return: return, risk and weights array or None if no grid portfolio is that safe
+        :rtype: tuple or None
+        """
+        feasible = numpy.flatnonzero(self.risks <= target_risk)
+        if len(feasible) == 0:
+            return None
+        best = feasible[numpy.argmax(self.sharpe[feasible])]
+        result = (self.returns[best], self.risks[best], self.weights[best].copy())
+        # Points of segments where risk reaches target, solver tolerance can make risks not monotonic
+        for i in numpy.flatnonzero((self.risks[:-1] <= target_risk) & (self.risks[1:] > target_risk)) + 1:
+            point = self._between(i, (target_risk - self.risks[i - 1]) / (self.risks[i] - self.risks[i - 1]))
+            if self._sharpe(point[0], point[1]) > self._sharpe(result[0], result[1]):
+                result = point
+        return result
+
+    def weights_dict(self, weights) -> dict:
+        """
+        Weights array as {asset: weight}
+        """
+        return dict(zip(self.tickers, numpy.asarray(weights).tolist()))
@@ -0,0 +1,218 @@
+"""
+Parallel multi-objective and multi-timeframe optimization
+
+Solves every (time frame, objective) combination of one report in a process pool and
+blends their weights into one portfolio. Pricing panels are built once in the parent
+and written to shared memory blocks, workers map them by block name, so only names,
+shapes and columns are pickled to workers and only weights come back.
+Blend of portfolios within the same weight bounds stays within them and sums to 1.
+Workers are spawned, not forked, so they never inherit locks or threads of the parent.
+HRP engine has no objectives, every time frame is solved once.
+
+ """
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy
+import pandas as pd
+
+from payload.portfolioOpt import PortfolioOpt
+
+OBJECTIVES = ('min_volatility', 'max_sharpe', 'efficient_return', 'efficient_risk')
+
+
+class SharedPanel:
+    """
+    Pricing panel in a shared memory block: int64 timestamps of rows followed by float64 prices
+    """
+
+    def __init__(self, index: numpy.ndarray, columns: list, values: numpy.ndarray) -> None:
+        rows = len(index)
+        self.columns = list(columns)
+        self.shape = (rows, len(self.columns))
+        self.block = shared_memory.SharedMemory(create=True, size=max(8 * rows * (1 + len(self.columns)), 1))
+        numpy.ndarray(rows, dtype=numpy.int64, buffer=self.block.buf)[:] = \
+            numpy.asarray(index, dtype='datetime64[ms]').astype(numpy.int64)
+        numpy.ndarray(self.shape, dtype=numpy.float64, buffer=self.block.buf, offset=8 * rows)[:] = values
+
+    @property
+    def spec(self) -> tuple:
+        """
+        Block name, shape and columns to map the panel in another process
+        """
+        return self.block.name, self.shape, self.columns
+
+    @ staticmethod
+    def read(spec: tuple) -> pd.DataFrame:
+        """
+        Pricing data frame of shared panel, prices are copied out of the block before it is closed
+
+        :param spec: SharedPanel.spec
+        :rtype: pd.DataFrame
+        """
+        name, shape, columns = spec
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            index = numpy.ndarray(shape[0], dtype=numpy.int64, buffer=block.buf).astype('datetime64[ms]')
+            values = numpy.ndarray(shape, dtype=numpy.float64, buffer=block.buf, offset=8 * shape[0]).copy()
+        finally:
+            block.close()
+        return pd.DataFrame(values, index=pd.DatetimeIndex(index, name='date'), columns=columns)
+
+    def close(self) -> None:
+        self.block.close()
+        self.block.unlink()
+
+
+def solve_combination(spec: tuple, time_frame: str, objective: str, target, weight_bounds: tuple,
+                      exp_return_periods: int, risk_model_periods: int, engine: str) -> dict:
+    """
+    Solve one objective on one shared pricing panel, runs in a pool worker
+
+    :return: combination, weights, performance and solver stats
+    :rtype: dict
+    """
+    pricing_data = SharedPanel.read(spec)
+    po = PortfolioOpt(cache_size=0, engine=engine)
+    begin, end, ef = po.generate_analysis_model(pricing_data, weight_bounds, exp_return_periods, risk_model_periods)
+    if engine == 'hrp':
+        po.hrp(ef, weight_bounds)
+    elif objective in ('efficient_return', 'efficient_risk'):
+        po.solve(ef, objective, float(target), weight_bounds, remember=False)
+    elif objective == 'min_volatility':
+        ef.min_volatility()
+    else:
+        ef.max_sharpe()
+    mu, sigma, sharpe = ef.portfolio_performance()
+    return {'time_frame':  time_frame,
+            'objective':   objective,
+            'target':      target,
+            'weights':     dict(zip(ef.tickers, numpy.asarray(ef.weights, dtype=numpy.float64).tolist())),
+            'performance': (float(mu), float(sigma), float(sharpe)),
+            'period':      (begin, end),
+            'stats':       dict(po.solver_stats)}
+
+
+class ParallelOpt:
+
+    def __init__(self, workers: int = None, engine: str = 'scipy') -> None:
+        """
+        :param workers: worker processes, None for all cores, 1 to solve in this process
+        :param engine: optimizer engine of workers, see portfolioOpt.ENGINES
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        # Builds pricing panels, its solver is not used
+        self.portfolio_opt = PortfolioOpt(cache_size=0, engine=engine)
+        self._executor = None
+        # Solved combinations of the last report
+        self.results = list()
+        self.errors = list()
+        # Forward filled grid rows of pricing panels of the last report by time frame
+        self.pricing_gaps = dict()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers import __main__ of the parent again, so entry scripts keep settings watcher,
+            # logger setup and other startup code under if __name__ == '__main__'
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def close(self) -> None:
+        """
+        Stop worker processes
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @ staticmethod
+    def blend(results: list, tickers: list) -> dict:
+        """
+        Weighted average of solved portfolios, assets missing in a time frame count as 0
+
+        :param results: solve_combination results with 'blend' weight
+        :param tickers: assets of blended portfolio
+        :rtype: dict
+        """
+        total = sum(x['blend'] for x in results)
+        weights = numpy.zeros(len(tickers))
+        index = {x: i for i, x in enumerate(tickers)}
+        for x in results:
+            for asset, weight in x['weights'].items():
+                weights[index[asset]] += x['blend'] * weight / total
+        return dict(zip(tickers, weights.tolist()))
+
+    def generate_report(self, ohlcv_data: dict = None, time_frames: list = None,
+                        weight_bounds: tuple = None, base_asset: str = None,
+                        exp_return_periods: int = None, risk_model_periods: int = None,
+                        objectives: list = None):
+        """
+        Solve all objectives on all time frames in parallel and blend the weights.
+
+        :param ohlcv_data: Pricing data
+        :param time_frames: Time frames to build pricing panels of
+        :param weight_bounds: Minimum and maximum weight of an asset
+        :param base_asset: Base asset
+        :param exp_return_periods: Number of time periods for expected returns
+        :param risk_model_periods: Number of time periods for covariance of returns
+        :param objectives: (objective, target) or (objective, target, blend weight) tuples,
+                           objective is one of OBJECTIVES, target is None for min_volatility and max_sharpe,
+                           with hrp engine they are collapsed into one 'hrp' job per time frame
+        :return: blended weights and report lines like PortfolioOpt.generate_report
+        :rtype: tuple
+        """
+        objectives = [tuple(x) + (1.0, ) if len(x) == 2 else tuple(x) for x in objectives]
+        for objective, target, _ in objectives:
+            if objective not in OBJECTIVES:
+                raise ValueError(f"Unknown objective {objective}")
+        if self.engine == 'hrp':
+            # Every objective would give the same hrp portfolio
+            objectives = [('hrp', None, sum(x[2] for x in objectives))]
+        panels = dict()
+        self.pricing_gaps = dict()
+        try:
+            for tf in time_frames:
+                index, columns, values = self.portfolio_opt.build_pricing_panel(ohlcv_data, base_asset, tf)
+                self.pricing_gaps[tf] = self.portfolio_opt.pricing_gaps
+                if len(index) > 2:
+                    panels[tf] = SharedPanel(index, columns, values)
+            jobs = [(panels[tf].spec, tf, objective, target, weight_bounds, exp_return_periods, risk_model_periods,
+                     self.engine, blend) for tf in panels for objective, target, blend in objectives]
+            if self.workers > 1 and len(jobs) > 1:
+                futures = [self._pool().submit(solve_combination, *x[:-1]) for x in jobs]
+            else:
+                futures = None
+            self.results, self.errors = list(), list()
+            for i, job in enumerate(jobs):
+                try:
+                    result = futures[i].result() if futures is not None else solve_combination(*job[:-1])
+                except Exception as e:
+                    self.errors.append((job[1], job[2], job[3], repr(e)))
+                    continue
+                result['blend'] = job[-1]
+                self.results.append(result)
+        finally:
+            for x in panels.values():
+                x.close()
+        tickers = list()
+        for tf in panels:
+            tickers += [x for x in panels[tf].columns if x not in tickers]
+        if len(self.results) == 0:
+            return {x: 0.0 for x in tickers}, ["No portfolio solved: {}".format(self.errors)]
+        weights = self.blend(self.results, tickers)
+        cleaned_weights = {x: round(y, 2) if abs(y) >= 1e-4 else 0.0 for x, y in weights.items()}
+        p_list = list()
+        begin, end = self.results[0]['period']
+        p_list.append("Period: {} - {}".format(str(begin), str(end)))
+        p_list.append("Bounds: {} Base: {}".format(weight_bounds, base_asset))
+        p_list.append("Return periods: {} Risk model periods: {}".format(exp_return_periods, risk_model_periods))
+        for x in self.results:
+            mu, sigma, sharpe = x['performance']
+            p_list.append("{} {} {}: Expected return: {:.2f}% Volatility: {:.2f}% Sharpe Ratio: {:.2f}".format(
+                x['time_frame'], x['objective'], x['target'], 100 * mu, 100 * sigma, sharpe))
+        for x in self.errors:
+            p_list.append("{} {} {}: failed {}".format(*x))
+        return cleaned_weights, p_list
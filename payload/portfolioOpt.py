@@ -1,22 +1,70 @@
 import datetime
-from time import ctime
-from copy import deepcopy
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
 import pandas as pd
 import numpy
 from pypfopt.efficient_frontier import EfficientFrontier
 from pypfopt import risk_models
 from pypfopt import expected_returns
+from pypfopt import objective_functions
+import scipy.optimize as sco
+import scipy.cluster.hierarchy as sch
+import scipy.spatial.distance as ssd
 
 from timeit import default_timer as timer
+from payload.estimator import RollingEstimator
+from payload.frontier import Frontier
+from payload.qpsolver import QPFrontier, box_bounds, max_return_weights
+
+# Optimizer engines: PyPortfolioOpt scipy solver, the dedicated mean-variance QP solver
+# or hierarchical risk parity allocation
+ENGINES = ('scipy', 'qp', 'hrp')
 
 
 class PortfolioOpt:
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 16, cache_path: str = None, frontier_points: int = 0,
+                 engine: str = 'scipy', cache_interval: float = 600):
+        """
+        :param cache_size: how many generate_report results to keep, 0 to disable
+        :param cache_path: pickle file to keep results between restarts, None to keep them in memory only
+        :param cache_interval: least seconds between cache file writes, save_cache writes new results on exit
+        :param frontier_points: efficient frontier grid size, targets are solved starting
+                                from the frontier, 0 to disable
+        :param engine: optimizer engine, one of ENGINES
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown optimizer engine {engine}")
+        self.engine = engine
         self.start = timer()
         self.last_call = self.start
         self.cutoff_date = datetime.datetime.now()
         self.weight_bound: float = 0
+        # Grid rows forward filled by the last build_pricing_panel call
+        self.pricing_gaps: int = 0
+        # Rolling estimators by time frame, kept between generate_report calls
+        self.estimators = dict()
+        # LRU of generate_report results by inputs fingerprint
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.cache_hits = 0
+        self.report_cache = self._load_cache()
+        self.cache_interval = cache_interval
+        # Results added since the last cache file write
+        self._cache_changed = False
+        self._cache_saved = timer()
+        # Last solved weights by (objective, weight bounds) to start the next solve from
+        self.last_weights = dict()
+        # Iterations, evaluations and time of the last solve, empty if report was cached
+        self.solver_stats = dict()
+        # Efficient frontier grid traced once per new bar, 0 points to solve targets only
+        self.frontier_points = frontier_points
+        self.frontier: Frontier = None
+        self._frontier_key = None
+        # Points and time of the frontier traced by the last report, empty if it was not traced
+        self.frontier_stats = dict()
 
     # region Helpers
     def elapsed_time(self):
@@ -36,6 +84,60 @@ class PortfolioOpt:
         except ValueError:
             return None
 
+    def _load_cache(self) -> OrderedDict:
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return OrderedDict()
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            return cache if isinstance(cache, OrderedDict) else OrderedDict()
+        except Exception:
+            return OrderedDict()
+
+    def save_cache(self) -> None:
+        """
+        Write results added since the last write to the cache file, the file is replaced at once
+        so a crash while writing keeps the previous one
+        """
+        if self.cache_path is None or not self._cache_changed:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self.report_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_path)
+        self._cache_changed = False
+        self._cache_saved = timer()
+
+    @ staticmethod
+    def fingerprint(pricing_data: pd.DataFrame, **params) -> str:
+        """
+        Hash of pricing data index, columns and values with optimizer parameters
+
+        :param pricing_data: pricing data frame
+        :param params: optimizer parameters
+        :rtype: str
+        """
+        h = hashlib.sha1()
+        h.update(numpy.ascontiguousarray(pricing_data.index.asi8).tobytes())
+        h.update('/'.join(pricing_data.columns).encode())
+        h.update(numpy.ascontiguousarray(pricing_data.values, dtype=numpy.float64).tobytes())
+        h.update(repr(sorted(params.items())).encode())
+        return h.hexdigest()
+
+    @ staticmethod
+    def timeframe_ms(time_frame: str):
+        """
+        Candle duration of regular time frame in milliseconds, None for months
+
+        :param time_frame: 1m..1h..1w etc.
+        :rtype: int or None
+        """
+        units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+        if time_frame[-1] not in units:
+            return None
+        return int(time_frame[:-1]) * units[time_frame[-1]] * 1000
+
     @ staticmethod
     def as_int(int_string):
         if int_string is None: return None
@@ -47,8 +149,11 @@ class PortfolioOpt:
     # endregion
 
     # region Optimizer
-    def generate_analysis_model(self, pricing_data, weight_bounds, exp_return_periods, risk_model_periods):
-        """Generate efficient frontier model
+    def generate_analysis_model(self, pricing_data, weight_bounds, exp_return_periods, risk_model_periods,
+                                time_frame: str = None):
+        """Generate efficient frontier model.
+        With time_frame expected returns and covariance come from the rolling estimator
+        of that time frame, which keeps its state between calls.
 
         :param pricing_data: Adjusted closing prices of the asset, each row is a date
                    and each column is a ticker/id.
@@ -56,34 +161,313 @@ class PortfolioOpt:
         :param exp_return_periods: Number of time periods for expected returns for each asset.
                                  Set to None if optimising for volatility only.
         :param risk_model_periods: Number of time periods for covariance of returns for each asset.
+        :param time_frame: Time frame of pricing_data, None to count over the whole window.
         :return:
         """
-        mu = expected_returns.mean_historical_return(pricing_data, frequency=exp_return_periods)
-        s = risk_models.sample_cov(pricing_data, frequency=risk_model_periods)
+        if time_frame is None:
+            mu = expected_returns.mean_historical_return(pricing_data, frequency=exp_return_periods)
+            s = risk_models.sample_cov(pricing_data, frequency=risk_model_periods)
+        else:
+            estimator = self.estimators.setdefault(time_frame, RollingEstimator())
+            estimator.update(pricing_data)
+            mu = estimator.mean_returns(exp_return_periods)
+            s = estimator.covariance(risk_model_periods)
         range_begin = pricing_data.index[0]
         range_end = pricing_data.index[-1]
-        return range_begin, range_end, EfficientFrontier(mu, s, weight_bounds=weight_bounds, gamma=0)
+        model = QPFrontier if self.engine == 'qp' else EfficientFrontier
+        return range_begin, range_end, model(mu, s, weight_bounds=weight_bounds, gamma=0)
+
+    def _initial_guess(self, ef: EfficientFrontier, key: tuple) -> numpy.ndarray:
+        """
+        Last solved weights of the same objective and bounds for ef tickers,
+        new tickers start from zero, equal weights if nothing was solved yet
+        """
+        last = self.last_weights.get(key)
+        if last is None:
+            return ef.initial_guess
+        lower = numpy.array([-numpy.inf if b[0] is None else b[0] for b in ef.bounds])
+        upper = numpy.array([numpy.inf if b[1] is None else b[1] for b in ef.bounds])
+        guess = numpy.clip(numpy.array([last.get(t, 0.0) for t in ef.tickers]), lower, upper)
+        if guess.sum() <= 0:
+            return ef.initial_guess
+        return guess / guess.sum()
+
+    def solve(self, ef: EfficientFrontier, objective: str, target: float, weight_bounds,
+              initial_guess: numpy.ndarray = None, remember: bool = True) -> dict:
+        """
+        Solve efficient_return or efficient_risk problem of ef the same way PyPortfolioOpt does,
+        but start from the last weights solved for the same objective and bounds.
+        Models of the QP engine are solved by QPFrontier from the same start.
+        Solver iterations, evaluations and time are kept in self.solver_stats.
+
+        :param ef: efficient frontier model
+        :param objective: 'efficient_return' or 'efficient_risk'
+        :param target: target return or target risk
+        :param weight_bounds: weight bounds used to build ef
+        :param initial_guess: weights to start from instead of the last solved ones
+        :param remember: keep solved weights to start the next solve from
+        :return: asset weights
+        :rtype: dict
+        """
+        if not isinstance(target, float) or target < 0:
+            raise ValueError(f"{objective} target should be a positive float")
+        if objective not in ('efficient_return', 'efficient_risk'):
+            raise ValueError(f"Unknown objective {objective}")
+        key = (objective, tuple(weight_bounds))
+        start = timer()
+        if initial_guess is None:
+            initial_guess = self._initial_guess(ef, key)
+        fallback = False
+        if isinstance(ef, QPFrontier):
+            getattr(ef, objective)(target, initial_guess=initial_guess)
+            iterations, evaluations, success = ef.stats['iterations'], ef.stats['evaluations'], ef.stats['success']
+            if not success:
+                # Singular covariance may stop the multiplier search, SLSQP weights replace only a failed solve
+                weights = ef.weights
+                iterations, evaluations, success = self._slsqp(ef, objective, target, initial_guess)
+                fallback = True
+                if not success:
+                    ef.weights = weights
+        else:
+            iterations, evaluations, success = self._slsqp(ef, objective, target, initial_guess)
+        self.solver_stats = {'objective':   objective,
+                             'engine':      self.engine,
+                             'warm_start':  key in self.last_weights,
+                             'iterations':  iterations,
+                             'evaluations': evaluations,
+                             'solve_time':  timer() - start,
+                             'success':     success,
+                             'fallback':    fallback}
+        if success and remember:
+            self.last_weights[key] = dict(zip(ef.tickers, ef.weights))
+        return dict(zip(ef.tickers, ef.weights))
+
+    @ staticmethod
+    def _slsqp(ef: EfficientFrontier, objective: str, target: float, initial_guess: numpy.ndarray) -> tuple:
+        """
+        Solve efficient_return or efficient_risk problem of ef with SLSQP like PyPortfolioOpt
+        and set ef weights
+
+        :return: iterations, evaluations and success
+        :rtype: tuple
+        """
+        if objective == 'efficient_return':
+            fun, args = objective_functions.volatility, (ef.cov_matrix, ef.gamma)
+            target_constraint = {"type": "eq", "fun": lambda w: w.dot(ef.expected_returns) - target}
+        else:
+            fun, args = objective_functions.negative_sharpe, (ef.expected_returns, ef.cov_matrix, ef.gamma, 0.02)
+            target_constraint = {"type": "ineq",
+                                 "fun": lambda w: target - numpy.sqrt(
+                                     objective_functions.volatility(w, ef.cov_matrix))}
+        result = sco.minimize(fun, x0=initial_guess, args=args, method="SLSQP",
+                              bounds=ef.bounds, constraints=ef.constraints + [target_constraint])
+        ef.weights = result["x"]
+        return int(result.get('nit', 0)), int(result.get('nfev', 0)), bool(result.success)
+
+    @ staticmethod
+    def _max_return_weights(ef: EfficientFrontier) -> numpy.ndarray:
+        """
+        Maximum expected return portfolio within bounds: lower bounds first,
+        the rest goes to assets with the highest return up to their upper bounds
+        """
+        return max_return_weights(numpy.asarray(ef.expected_returns, dtype=numpy.float64), *box_bounds(ef.bounds))
+
+    def trace_frontier(self, ef: EfficientFrontier, weight_bounds, points: int = 20) -> Frontier:
+        """
+        Trace efficient frontier of ef on a grid of target returns from the minimum volatility
+        portfolio to the maximum return one. Every point starts from the previous one.
+
+        :param ef: efficient frontier model
+        :param weight_bounds: weight bounds used to build ef
+        :param points: grid size
+        :rtype: Frontier
+        """
+        start = timer()
+        mu = numpy.asarray(ef.expected_returns)
+        cov = numpy.asarray(ef.cov_matrix)
+        min_vol = numpy.array(list(ef.min_volatility().values()))
+        max_ret = self._max_return_weights(ef)
+        weights = [min_vol]
+        for target in numpy.linspace(min_vol.dot(mu), max_ret.dot(mu), points)[1:-1]:
+            w = self.solve(ef, 'efficient_return', float(target), weight_bounds,
+                           initial_guess=weights[-1], remember=False)
+            weights.append(numpy.array(list(w.values())))
+        weights.append(max_ret)
+        weights = numpy.array(weights)
+        risks = numpy.sqrt(numpy.einsum('ij,jk,ik->i', weights, cov, weights))
+        self.frontier_stats = {'points': len(weights), 'trace_time': timer() - start}
+        return Frontier(ef.tickers, weights @ mu, risks, weights)
+
+    def _update_frontier(self, ef: EfficientFrontier, pricing_data, weight_bounds, time_frame: str):
+        """
+        Trace frontier once per new bar, portfolio and weight bounds
+        """
+        key = (time_frame, pricing_data.index[-1], tuple(pricing_data.columns), tuple(weight_bounds))
+        if self.frontier is None or self._frontier_key != key:
+            self.frontier = self.trace_frontier(ef, weight_bounds, self.frontier_points)
+            self._frontier_key = key
+        return self.frontier
+
+    def query_frontier(self, target_return: float = None, target_risk: float = None):
+        """
+        Answer target return or target risk what-if from the last traced frontier by interpolation
+
+        :return: expected return, volatility and weights dict or None if there is no frontier or
+                 target is out of it
+        :rtype: tuple or None
+        """
+        if self.frontier is None:
+            return None
+        if target_return is not None:
+            point = self.frontier.for_return(target_return)
+        else:
+            point = self.frontier.for_risk(target_risk)
+        if point is None:
+            return None
+        return float(point[0]), float(point[1]), self.frontier.weights_dict(point[2])
+
+    def _frontier_guess(self, target_return: float = None, target_risk: float = None):
+        if self.frontier_points < 2 or self.frontier is None:
+            return None
+        point = self.frontier.for_return(target_return) if target_return is not None \
+            else self.frontier.for_risk(target_risk)
+        return None if point is None else point[2]
+
+    @ staticmethod
+    def cluster_order(cov: numpy.ndarray) -> numpy.ndarray:
+        """
+        Assets order of single linkage clustering by correlation distance sqrt((1 - corr) / 2),
+        so correlated assets are neighbours. Assets with zero variance are uncorrelated with others.
+
+        :param cov: covariance matrix
+        :rtype: numpy.ndarray
+        """
+        if len(cov) < 2:
+            return numpy.arange(len(cov))
+        std = numpy.sqrt(numpy.clip(numpy.diag(cov), 0, None))
+        std = numpy.where(std > 0, std, 1)
+        corr = numpy.clip(cov / numpy.outer(std, std), -1, 1)
+        numpy.fill_diagonal(corr, 1)
+        distance = numpy.sqrt((1 - corr) / 2)
+        # Exact symmetry is required by squareform
+        distance = (distance + distance.T) / 2
+        numpy.fill_diagonal(distance, 0)
+        return sch.leaves_list(sch.linkage(ssd.squareform(distance, checks=False), 'single'))
+
+    @ staticmethod
+    def bisection_weights(cov: numpy.ndarray, order: numpy.ndarray) -> numpy.ndarray:
+        """
+        Recursive bisection of ordered assets: each half gets weight inversely proportional to
+        variance of its inverse variance portfolio. Only covariance diagonal is inverted,
+        zero variances are floored.
+
+        :param cov: covariance matrix
+        :param order: assets order from cluster_order
+        :rtype: numpy.ndarray
+        """
+        variances = numpy.diag(cov).astype(numpy.float64)
+        floor = max(variances.max(initial=0) * 1e-12, 1e-18)
+        inverse = 1 / numpy.clip(variances, floor, None)
+
+        def cluster_variance(items):
+            w = inverse[items] / inverse[items].sum()
+            return max(w @ cov[numpy.ix_(items, items)] @ w, floor)
+
+        weights = numpy.ones(len(cov))
+        clusters = [numpy.asarray(order)]
+        while len(clusters) > 0:
+            clusters = [x[j:k] for x in clusters for j, k in ((0, len(x) // 2), (len(x) // 2, len(x))) if len(x) > 1]
+            for first, second in zip(clusters[::2], clusters[1::2]):
+                first_variance, second_variance = cluster_variance(first), cluster_variance(second)
+                alpha = 1 - first_variance / (first_variance + second_variance)
+                weights[first] *= alpha
+                weights[second] *= 1 - alpha
+        return weights
+
+    @ staticmethod
+    def bounded_weights(weights: numpy.ndarray, lower: numpy.ndarray, upper: numpy.ndarray) -> numpy.ndarray:
+        """
+        Clip weights to bounds and spread the clipped excess or shortage over assets
+        within bounds in proportion to their weights, until weights sum to 1
+        """
+        weights = numpy.clip(weights, lower, upper)
+        for _ in range(len(weights)):
+            left = 1 - weights.sum()
+            free = (weights < upper) if left > 0 else (weights > lower)
+            if abs(left) < 1e-12 or not free.any():
+                break
+            share = weights[free] if weights[free].sum() > 0 else numpy.ones(free.sum())
+            weights[free] += left * share / share.sum()
+            weights = numpy.clip(weights, lower, upper)
+        return weights
+
+    def hrp(self, ef: EfficientFrontier, weight_bounds) -> dict:
+        """
+        Hierarchical risk parity weights of ef covariance within weight bounds.
+        Costs one clustering and no matrix inversion, so it stays fast and stable
+        for large portfolios with near-singular covariance.
+        Assets with zero variance, like the constant base asset column, would get unbounded
+        inverse variance, so they are left out of clustering and get their lower bounds only.
+
+        :param ef: efficient frontier model, its weights are set
+        :param weight_bounds: weight bounds used to build ef
+        :return: asset weights
+        :rtype: dict
+        """
+        start = timer()
+        cov = numpy.asarray(ef.cov_matrix, dtype=numpy.float64)
+        lower, upper = box_bounds(ef.bounds)
+        variances = numpy.diag(cov)
+        risky = variances > max(variances.max(initial=0) * 1e-12, 1e-18)
+        weights = lower.copy()
+        if risky.any():
+            risky_cov = cov[numpy.ix_(risky, risky)]
+            weights[risky] = self.bisection_weights(risky_cov, self.cluster_order(risky_cov)) * \
+                (1 - lower[~risky].sum())
+        ef.weights = self.bounded_weights(weights, lower, upper)
+        self.solver_stats = {'objective':  'hrp',
+                             'engine':     self.engine,
+                             'solve_time': timer() - start,
+                             'success':    bool(abs(ef.weights.sum() - 1) < 1e-9)}
+        return dict(zip(ef.tickers, ef.weights))
 
     def forward_looking_return(self, pricing_data, start_date, end_date, weights):
-        df_pricing = pricing_data \
-            .loc[start_date:end_date] \
-            .dropna(axis=1, how='any') \
-            .iloc[[0, -1]]
-        df_weights = pd.DataFrame([weights])
-        pricing_changes = df_pricing.pct_change()
-        filtered_pricing = pricing_changes.tail(1).filter(axis=1, items=weights.keys())
-        range_begin, range_end = pricing_changes.index.values
-        wavg_return = (df_weights.values * filtered_pricing.values).sum()
-        return range_begin, range_end, wavg_return
+        """
+        Weighted return of assets between first and last rows of the date range.
+        Range is found by binary search in sorted DatetimeIndex, assets with missing prices
+        inside the range are skipped.
 
-    def build_pricing_data_from_ohlcv(self, ohlcv_data: dict, base_asset: str, time_frame: str):
+        :param pricing_data: pricing data frame with DatetimeIndex
+        :param start_date: range begin
+        :param end_date: range end
+        :param weights: {asset: weight}
+        :return: range begin, range end, weighted average return
+        """
+        index = pricing_data.index
+        first = index.searchsorted(pd.Timestamp(start_date), side='left')
+        last = index.searchsorted(pd.Timestamp(end_date), side='right') - 1
+        values = pricing_data.values[first:last + 1]
+        valid = ~numpy.isnan(values).any(axis=0)
+        changes = values[-1] / values[0] - 1
+        columns = {x: i for i, x in enumerate(pricing_data.columns) if valid[i]}
+        df_weights = numpy.array([w for x, w in weights.items() if x in columns])
+        filtered_changes = numpy.array([changes[columns[x]] for x in weights.keys() if x in columns])
+        wavg_return = (df_weights * filtered_changes).sum()
+        return index[first], index[last], wavg_return
+
+    def build_pricing_panel(self, ohlcv_data: dict, base_asset: str, time_frame: str):
         """
-        Build new column names from market to asset name.
+        Stack close prices of all markets into one timestamp aligned array
+        of asset prices in base asset.
 
-        Build new pricing dict from ohlcv_data 'close' column
-        and flip prices if necessary.
+        Rows are the union of candle timestamps completed to the regular time_frame grid,
+        missing candles (gaps) are forward filled per market, self.pricing_gaps counts
+        grid rows where any market had no candle after it started.
 
-        Add base asset column with price equal to '1'.
+        Markets with base asset give asset price directly or flipped,
+        markets with BTC are crossed with BTC price in base asset.
+        Base asset column with price equal to '1' is added last.
+        Column order follows first appearance of an asset in ohlcv_data.
 
         :param ohlcv_data: Pricing data
         :type ohlcv_data: dict
@@ -91,59 +475,81 @@ class PortfolioOpt:
         :type base_asset: str
         :param time_frame: Time frame to choose from ohlcv_data, 1m..1h..etc.
         :type time_frame: str
-        :return: Formated pricing data dict
-        """
-        data_c = pd.DataFrame()
-        for m, ohlcv in ohlcv_data.items():
-            if base_asset in m:
-                asset1, asset2 = m.split('/')
-                a_np = numpy.array(ohlcv[time_frame]).transpose()
-                a_np = {"date":   a_np[0], "o": a_np[1], "h": a_np[2],
-                        "l":      a_np[3], "c": a_np[4], "v": a_np[5]}
-                data = pd.DataFrame(a_np)
-                data["date"] = data["date"].apply(lambda x: ctime(x / 1000.0))
-                data = data.set_index("date")
-                if asset1 != base_asset:
-                    data_c[asset1] = data['c']
-                else:
-                    # Flip price for markets like asset/base_asset
-                    data_c[asset2] = data['c'].apply(lambda x: 1/x)
-            else:
-                # 2-leg markets
-                if '/BTC' in m:
-                    asset1, _ = m.split('/')
-                    a_np = numpy.array(ohlcv[time_frame]).transpose()
-                    if f'BTC/{base_asset}' in ohlcv_data.keys():
-                        btc_np = numpy.array(ohlcv_data[f'BTC/{base_asset}'][time_frame]).transpose()
-                        a_np = {"date": a_np[0], "o": a_np[1],           "h": a_np[2],
-                                "l":    a_np[3], "c": a_np[4]*btc_np[4], "v": a_np[5]}
-                    elif f'{base_asset}/BTC' in ohlcv_data.keys():
-                        btc_np = numpy.array(ohlcv_data[f'{base_asset}/BTC'][time_frame]).transpose()
-                        a_np = {"date": a_np[0], "o": a_np[1],           "h": a_np[2],
-                                "l":    a_np[3], "c": a_np[4]/btc_np[4], "v": a_np[5]}
-                    data = pd.DataFrame(a_np)
-                    data["date"] = data["date"].apply(lambda x: ctime(x / 1000.0))
-                    data = data.set_index("date")
-                    data_c[asset1] = data['c']
-                elif 'BTC/' in m:
-                    _, asset2 = m.split('/')
-                    a_np = numpy.array(ohlcv[time_frame]).transpose()
-                    if f'BTC/{base_asset}' in ohlcv_data.keys():
-                        btc_np = numpy.array(ohlcv_data[f'BTC/{base_asset}'][time_frame]).transpose()
-                        a_np = {"date": a_np[0], "o": a_np[1],           "h": a_np[2],
-                                "l":    a_np[3], "c": a_np[4]/btc_np[4], "v": a_np[5]}
-                    elif f'{base_asset}/BTC' in ohlcv_data.keys():
-                        btc_np = numpy.array(ohlcv_data[f'{base_asset}/BTC'][time_frame]).transpose()
-                        a_np = {"date": a_np[0], "o": a_np[1],           "h": a_np[2],
-                                "l":    a_np[3], "c": a_np[4]*btc_np[4], "v": a_np[5]}
-                    data = pd.DataFrame(a_np)
-                    data["date"] = data["date"].apply(lambda x: ctime(x / 1000.0))
-                    data = data.set_index("date")
-                    data_c[asset2] = data['c']
-
-        # Add new column with 1 price for base asset
-        data_c[base_asset] = 1
-        return data_c
+        :return: datetime64 index, columns list and (index, columns) prices array,
+                 NaN before the first candle of market
+        :rtype: tuple
+        """
+        markets = [m for m, ohlcv in ohlcv_data.items() if len(ohlcv.get(time_frame, list())) > 0]
+        series = list()
+        for m in markets:
+            candles = ohlcv_data[m][time_frame]
+            if isinstance(candles, numpy.ndarray):
+                # CandleStore memmaps are sliced by column without iterating rows
+                series.append((candles[:, 0].astype(numpy.int64), candles[:, 4]))
+                continue
+            series.append((numpy.fromiter((x[0] for x in candles), dtype=numpy.int64, count=len(candles)),
+                           numpy.fromiter((x[4] for x in candles), dtype=numpy.float64, count=len(candles))))
+        if len(series) > 0:
+            timestamps = numpy.unique(numpy.concatenate([x[0] for x in series]))
+        else:
+            timestamps = numpy.empty(0, dtype=numpy.int64)
+        step = self.timeframe_ms(time_frame)
+        if step is not None and len(timestamps) > 1:
+            timestamps = numpy.union1d(timestamps, numpy.arange(timestamps[0], timestamps[-1] + 1, step))
+        closes = numpy.full((len(timestamps), len(markets)), numpy.nan)
+        for j, (ts, close) in enumerate(series):
+            closes[numpy.searchsorted(timestamps, ts), j] = close
+        # Forward fill gaps with index of the last known row of every market
+        rows = numpy.where(numpy.isnan(closes), 0, numpy.arange(len(timestamps))[:, None])
+        numpy.maximum.accumulate(rows, axis=0, out=rows)
+        started = ~numpy.isnan(closes[rows, numpy.arange(len(markets))])
+        self.pricing_gaps = int((numpy.isnan(closes) & started).any(axis=1).sum())
+        closes = closes[rows, numpy.arange(len(markets))]
+        m_index = {m: j for j, m in enumerate(markets)}
+        # BTC price in base asset for 2-leg markets, as base/BTC close to divide by when flipped
+        btc_close, btc_flipped = None, False
+        if f'BTC/{base_asset}' in m_index:
+            btc_close = closes[:, m_index[f'BTC/{base_asset}']]
+        elif f'{base_asset}/BTC' in m_index:
+            btc_close, btc_flipped = closes[:, m_index[f'{base_asset}/BTC']], True
+        prices = dict()
+        for m, j in m_index.items():
+            asset1, asset2 = m.split('/')
+            if asset2 == base_asset:
+                prices[asset1] = closes[:, j]
+            elif asset1 == base_asset:
+                # Flip price for markets like base_asset/asset
+                prices[asset2] = 1 / closes[:, j]
+            elif btc_close is None:
+                continue
+            elif asset2 == 'BTC':
+                # asset/BTC close is asset price in BTC
+                prices[asset1] = closes[:, j] / btc_close if btc_flipped else closes[:, j] * btc_close
+            elif asset1 == 'BTC':
+                # BTC/asset close is BTC price in asset
+                prices[asset2] = 1 / (closes[:, j] * btc_close) if btc_flipped else btc_close / closes[:, j]
+        prices.pop(base_asset, None)
+        columns = list(prices.keys()) + [base_asset]
+        values = numpy.ones((len(timestamps), len(columns)))
+        for j, x in enumerate(prices.values()):
+            values[:, j] = x
+        return timestamps.astype('datetime64[ms]'), columns, values
+
+    def build_pricing_data_from_ohlcv(self, ohlcv_data: dict, base_asset: str, time_frame: str):
+        """
+        Build pricing data frame from ohlcv_data 'close' column
+        with asset names as columns and DatetimeIndex, see build_pricing_panel.
+
+        :param ohlcv_data: Pricing data
+        :type ohlcv_data: dict
+        :param base_asset: Base asset
+        :type base_asset: str
+        :param time_frame: Time frame to choose from ohlcv_data, 1m..1h..etc.
+        :type time_frame: str
+        :return: Formated pricing data frame
+        """
+        index, columns, values = self.build_pricing_panel(ohlcv_data, base_asset, time_frame)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(index, name='date'), columns=columns)
 
     def generate_report(self, ohlcv_data: dict = None, time_frames: list = None,
                         weight_bounds: tuple = None, base_asset: str = None,
@@ -151,18 +557,56 @@ class PortfolioOpt:
                         target_return: float = None, target_risk: float = None):
         # Transform ohlcv data into pricing data and add 1 price base asset column
         # Multiple timeframes data creation controlled from time_frames list
-        p_d = deepcopy(self.build_pricing_data_from_ohlcv(ohlcv_data, base_asset, time_frames[0]))
+        p_d = self.build_pricing_data_from_ohlcv(ohlcv_data, base_asset, time_frames[0])
+        return self.generate_report_from_pricing_data(p_d, time_frames[0], weight_bounds, base_asset,
+                                                      exp_return_periods, risk_model_periods,
+                                                      target_return, target_risk)
+
+    def generate_report_from_pricing_data(self, p_d: pd.DataFrame, time_frame: str, weight_bounds: tuple = None,
+                                          base_asset: str = None, exp_return_periods: int = None,
+                                          risk_model_periods: int = None, target_return: float = None,
+                                          target_risk: float = None):
+        """
+        Optimize pricing data of one time frame, see generate_report.
+        Backtests replay windows of stored history through it.
+
+        :param p_d: pricing data frame from build_pricing_data_from_ohlcv
+        :param time_frame: time frame of pricing data
+        :return: cleaned weights and report lines
+        :rtype: tuple
+        """
+        self.solver_stats = dict()
+        self.frontier_stats = dict()
+        # Return cached result for the same inputs
+        key = self.fingerprint(p_d, engine=self.engine, time_frame=time_frame, weight_bounds=weight_bounds,
+                               base_asset=base_asset, exp_return_periods=exp_return_periods,
+                               risk_model_periods=risk_model_periods, target_return=target_return,
+                               target_risk=target_risk)
+        if key in self.report_cache:
+            self.cache_hits += 1
+            self.report_cache.move_to_end(key)
+            cleaned_weights, p_list = self.report_cache[key]
+            return dict(cleaned_weights), list(p_list)
         # Generate EfficientFrontier Portfolio
         analysis_range_begin, analysis_range_end, ef = self.generate_analysis_model(
-                p_d, weight_bounds, exp_return_periods, risk_model_periods)
-        # Calculate the 'Markowitz portfolio', minimising volatility for a given target_return.
-        # target_return: the desired return of the resulting portfolio
-        if target_return is not None:
-            _oer = ef.efficient_return(target_return=target_return)
-        # Calculate the Sharpe-maximising portfolio for a given volatility(max return for a target_risk).
-        # target_risk: the desired volatility of the resulting portfolio
-        if target_risk is not None:
-            _omw = ef.efficient_risk(target_risk=target_risk)
+                p_d, weight_bounds, exp_return_periods, risk_model_periods, time_frame)
+        if self.engine == 'hrp':
+            # Hierarchical risk parity allocation, target return and target risk are not used
+            self.hrp(ef, weight_bounds)
+        else:
+            # Trace efficient frontier and start exact solves from the frontier point of target
+            if self.frontier_points > 1:
+                self._update_frontier(ef, p_d, weight_bounds, time_frame)
+            # Calculate the 'Markowitz portfolio', minimising volatility for a given target_return.
+            # target_return: the desired return of the resulting portfolio
+            if target_return is not None:
+                _oer = self.solve(ef, 'efficient_return', target_return, weight_bounds,
+                                  initial_guess=self._frontier_guess(target_return=target_return))
+            # Calculate the Sharpe-maximising portfolio for a given volatility(max return for a target_risk).
+            # target_risk: the desired volatility of the resulting portfolio
+            if target_risk is not None:
+                _omw = self.solve(ef, 'efficient_risk', target_risk, weight_bounds,
+                                  initial_guess=self._frontier_guess(target_risk=target_risk))
         # Minimise volatility
         # _raw_weights = ef.min_volatility()
         # Maximise the Sharpe Ratio
@@ -191,6 +635,13 @@ class PortfolioOpt:
         # rebal_str = ["{}:{:.2f}%".format(str(k[0]), 100 * v) for k, v in sorted(non_zero_weights.items(),
         #                                                                          key=lambda kv: -kv[1])]
         # p_list.append(rebal_str)
+        if self.cache_size > 0:
+            self.report_cache[key] = (dict(cleaned_weights), list(p_list))
+            while len(self.report_cache) > self.cache_size:
+                self.report_cache.popitem(last=False)
+            self._cache_changed = True
+            if timer() - self._cache_saved >= self.cache_interval:
+                self.save_cache()
         return cleaned_weights, p_list
 
     # endregion
@@ -0,0 +1,320 @@
+"""
+Mean-variance QP engine
+
+Solves the long-only, box bounded, fully invested mean-variance problems of generate_report
+without a general purpose solver. Efficient portfolios are minimisers of w'Sw - nu * mu'w over
+the box simplex {lower <= w <= upper, sum(w) = 1} for a return multiplier nu. A minimiser is found
+by accelerated projected gradient (FISTA) with exact projection onto the box simplex, then its
+active set gives the exact frontier segment w(nu) = a + nu * b by one KKT linear solve.
+Targets are roots of conditions along the segment, a root is accepted when KKT conditions hold
+there, otherwise the next multiplier is searched in the bracket around it.
+Solves are deterministic and a warm start from the solution costs no gradient iterations.
+
+ """
+import numpy
+from pypfopt.efficient_frontier import EfficientFrontier
+
+
+def box_bounds(bounds) -> tuple:
+    """
+    Lower and upper bounds arrays of (lower, upper) pairs, None means 0 and 1
+    """
+    lower = numpy.array([0 if b[0] is None else b[0] for b in bounds], dtype=numpy.float64)
+    upper = numpy.array([1 if b[1] is None else b[1] for b in bounds], dtype=numpy.float64)
+    return lower, upper
+
+
+def max_return_weights(mu: numpy.ndarray, lower: numpy.ndarray, upper: numpy.ndarray) -> numpy.ndarray:
+    """
+    Maximum expected return portfolio within bounds: lower bounds first,
+    the rest goes to assets with the highest return up to their upper bounds
+    """
+    weights = lower.copy()
+    left = 1 - weights.sum()
+    for i in numpy.argsort(-mu, kind='stable'):
+        add = min(upper[i] - lower[i], left)
+        weights[i] += add
+        left -= add
+    return weights
+
+
+def project(v: numpy.ndarray, lower: numpy.ndarray, upper: numpy.ndarray) -> numpy.ndarray:
+    """
+    Euclidean projection of v onto {lower <= w <= upper, sum(w) = 1}, which is clip(v - t, lower, upper)
+    for the shift t where the sum is 1. The sum falls piecewise linearly in t between
+    breakpoints v - upper and v - lower, so t is found from sorted breakpoints in O(n log n).
+
+    :raises ValueError: if bounds do not allow weights summing to 1
+    """
+    n = len(v)
+    if lower.sum() > 1 + 1e-12 or upper.sum() < 1 - 1e-12:
+        raise ValueError("weight bounds do not allow fully invested portfolio")
+    points = numpy.concatenate((v - upper, v - lower))
+    # Asset leaves its upper bound at v - upper and reaches lower bound at v - lower
+    changes = numpy.concatenate((-numpy.ones(n), numpy.ones(n)))
+    order = numpy.argsort(points, kind='stable')
+    points = points[order]
+    slopes = numpy.cumsum(changes[order])
+    sums = upper.sum() + numpy.concatenate(([0.0], numpy.cumsum(slopes[:-1] * numpy.diff(points))))
+    k = int(numpy.searchsorted(-sums, -1.0))
+    if k == 0:
+        t = points[0]
+    elif k == len(points):
+        t = points[-1]
+    else:
+        t = points[k - 1] + (sums[k - 1] - 1) / -slopes[k - 1]
+    return numpy.clip(v - t, lower, upper)
+
+
+class QPFrontier(EfficientFrontier):
+    """
+    EfficientFrontier with efficient_return, efficient_risk and min_volatility solved by the QP engine.
+    Performance, clean weights and other helpers are PyPortfolioOpt ones.
+    """
+
+    def __init__(self, expected_returns, cov_matrix, weight_bounds=(0, 1), gamma=0,
+                 tol: float = 1e-9, max_iter: int = 5000, max_search: int = 100):
+        """
+        :param expected_returns: expected returns of assets
+        :param cov_matrix: covariance of returns of assets
+        :param weight_bounds: minimum and maximum weight of an asset
+        :param gamma: L2 regularisation added to covariance like in PyPortfolioOpt objectives
+        :param tol: weights tolerance of gradient steps, bounds and KKT checks
+        :param max_iter: gradient iterations per multiplier
+        :param max_search: multipliers tried per solve
+        """
+        super().__init__(expected_returns, cov_matrix, weight_bounds=weight_bounds, gamma=gamma)
+        self._mu = numpy.asarray(expected_returns, dtype=numpy.float64)
+        self._q = numpy.asarray(cov_matrix, dtype=numpy.float64) + gamma * numpy.eye(self.n_assets)
+        self._lower, self._upper = box_bounds(self.bounds)
+        self._lipschitz = 2 * max(float(numpy.linalg.eigvalsh(self._q)[-1]), 1e-12)
+        # Multiplier scale where return and variance terms are comparable
+        self._scale = self._lipschitz / max(float(numpy.ptp(self._mu)), 1e-12)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.max_search = max_search
+        # Gradient iterations, multipliers tried and KKT check result of the last solve
+        self.stats = dict()
+        self._iterations = 0
+        self._evaluations = 0
+
+    # region Engine
+    def _descend(self, nu: float, w: numpy.ndarray) -> numpy.ndarray:
+        """
+        Minimise w'Qw - nu * mu'w over the box simplex by FISTA with gradient restart
+        """
+        self._evaluations += 1
+        step = 1 / self._lipschitz
+        linear = nu * self._mu
+        x = y = w
+        t = 1.0
+        for _ in range(self.max_iter):
+            self._iterations += 1
+            x_next = project(y - step * (2 * self._q @ y - linear), self._lower, self._upper)
+            if numpy.abs(x_next - x).max() <= self.tol:
+                return x_next
+            if (y - x_next) @ (x_next - x) > 0:
+                t, y = 1.0, x_next
+            else:
+                t_next = (1 + numpy.sqrt(1 + 4 * t * t)) / 2
+                y = x_next + (t - 1) / t_next * (x_next - x)
+                t = t_next
+            x = x_next
+        return x
+
+    def _segment(self, w: numpy.ndarray) -> tuple:
+        """
+        Frontier segment of the active set of w: minimisers a + nu * b with budget multiplier
+        ya + nu * yb while assets on bounds stay there
+
+        :return: a, b, ya, yb, lower bound mask, upper bound mask
+        :rtype: tuple
+        """
+        at_lower = w <= self._lower + self.tol
+        at_upper = ~at_lower & (w >= self._upper - self.tol)
+        free = ~(at_lower | at_upper)
+        k = int(free.sum())
+        a = numpy.where(at_upper, self._upper, self._lower)
+        b = numpy.zeros(self.n_assets)
+        # Stationarity 2Qw - nu * mu + y = 0 of free assets and budget equation
+        kkt = numpy.zeros((k + 1, k + 1))
+        kkt[:k, :k] = 2 * self._q[numpy.ix_(free, free)]
+        kkt[:k, k] = 1
+        kkt[k, :k] = 1
+        rhs = numpy.zeros((k + 1, 2))
+        rhs[:k, 0] = -2 * self._q[numpy.ix_(free, ~free)] @ a[~free]
+        rhs[:k, 1] = self._mu[free]
+        rhs[k, 0] = 1 - a[~free].sum()
+        solution = numpy.linalg.lstsq(kkt, rhs, rcond=None)[0]
+        a[free] = solution[:k, 0]
+        b[free] = solution[:k, 1]
+        return a, b, solution[k, 0], solution[k, 1], at_lower, at_upper
+
+    def _optimal(self, segment: tuple, nu: float) -> bool:
+        """
+        KKT conditions of segment point: free weights within bounds, budget met and
+        no bound asset can improve the objective by leaving its bound
+        """
+        a, b, ya, yb, at_lower, at_upper = segment
+        w = a + nu * b
+        if (w < self._lower - self.tol).any() or (w > self._upper + self.tol).any() or abs(w.sum() - 1) > self.tol:
+            return False
+        gradient = 2 * self._q @ w - nu * self._mu + (ya + nu * yb)
+        eps = self.tol * (self._lipschitz + abs(nu) * numpy.abs(self._mu).max())
+        return not ((at_lower & (gradient < -eps)) | (at_upper & (gradient > eps))).any()
+
+    def _search(self, condition, root, w: numpy.ndarray, lo: float = -numpy.inf, hi: float = numpy.inf) -> tuple:
+        """
+        Search frontier multiplier where condition crosses zero, condition grows with nu.
+        The first candidate is the root on the segment of w, so a warm start from the solution
+        is checked without gradient iterations.
+
+        :param condition: condition(w, nu) value at frontier point
+        :param root: root(segment) of condition on segment or None
+        :param w: feasible weights to start from
+        :return: weights, multiplier and True if KKT conditions hold
+        :rtype: tuple
+        """
+        segment = self._segment(w)
+        nu = root(segment)
+        if nu is not None and lo <= nu <= hi and self._optimal(segment, nu):
+            return segment[0] + nu * segment[1], nu, True
+        if nu is None or not lo <= nu <= hi:
+            # Not at the bracket end: with a zero-variance asset the condition may vanish there
+            nu = 0.0 if lo < 0 < hi else (lo + hi) / 2 if numpy.isfinite(lo + hi) \
+                else lo + self._scale if numpy.isfinite(lo) else hi - self._scale
+        width = hi - lo
+        for _ in range(self.max_search):
+            w = self._descend(nu, w)
+            segment = self._segment(w)
+            candidate = root(segment)
+            if candidate is not None and lo <= candidate <= hi and self._optimal(segment, candidate):
+                return segment[0] + candidate * segment[1], candidate, True
+            if condition(segment[0] + nu * segment[1] if self._optimal(segment, nu) else w, nu) < 0:
+                lo = nu
+            else:
+                hi = nu
+            if numpy.isfinite(lo + hi) and hi - lo <= 1e-12 * max(1.0, abs(lo), abs(hi)):
+                break
+            # Secant step while the bracket shrinks fast enough, bisection or doubling otherwise
+            if candidate is not None and lo < candidate < hi and hi - lo < width / 2:
+                nu = candidate
+            elif numpy.isfinite(lo) and numpy.isfinite(hi):
+                nu = (lo + hi) / 2
+            elif numpy.isfinite(lo):
+                nu = lo + max(abs(lo), self._scale)
+            else:
+                nu = hi - max(abs(hi), self._scale)
+            width = hi - lo
+        return w, nu, False
+
+    def _start(self, initial_guess) -> numpy.ndarray:
+        self._iterations = 0
+        self._evaluations = 0
+        guess = self.initial_guess if initial_guess is None else numpy.asarray(initial_guess, dtype=numpy.float64)
+        return project(guess, self._lower, self._upper)
+
+    def _finish(self, weights: numpy.ndarray, success: bool) -> dict:
+        self.weights = weights
+        self.stats = {'iterations': self._iterations, 'evaluations': self._evaluations, 'success': success}
+        return dict(zip(self.tickers, self.weights))
+
+    def _variance(self, w: numpy.ndarray) -> float:
+        return float(w @ self._q @ w)
+
+    # endregion
+
+    # region Objectives
+    def min_volatility(self, initial_guess: numpy.ndarray = None) -> dict:
+        """
+        Minimise volatility.
+
+        :param initial_guess: weights to start from
+        :return: asset weights for the volatility-minimising portfolio
+        :rtype: dict
+        """
+        w, _, success = self._search(lambda x, nu: nu, lambda s: 0.0, self._start(initial_guess))
+        return self._finish(w, success)
+
+    def max_sharpe(self, risk_free_rate: float = 0.02, initial_guess: numpy.ndarray = None) -> dict:
+        """
+        Maximise the Sharpe ratio, the tangency portfolio of efficient_risk without volatility limit.
+
+        :param risk_free_rate: risk-free rate of borrowing/lending
+        :param initial_guess: weights to start from
+        :return: asset weights for the Sharpe-maximising portfolio
+        :rtype: dict
+        """
+        return self.efficient_risk(float('inf'), risk_free_rate, initial_guess)
+
+    def efficient_return(self, target_return: float, initial_guess: numpy.ndarray = None) -> dict:
+        """
+        Calculate the 'Markowitz portfolio', minimising volatility for a given target return.
+        Target above the highest or below the lowest attainable return gives the portfolio
+        of that end and unsuccessful stats.
+
+        :param target_return: the desired return of the resulting portfolio
+        :param initial_guess: weights to start from
+        :raises ValueError: if target_return is not a positive float
+        :return: asset weights for the Markowitz portfolio
+        :rtype: dict
+        """
+        if not isinstance(target_return, float) or target_return < 0:
+            raise ValueError("target_return should be a positive float")
+        w = self._start(initial_guess)
+        highest = max_return_weights(self._mu, self._lower, self._upper)
+        lowest = max_return_weights(-self._mu, self._lower, self._upper)
+        if target_return >= highest @ self._mu:
+            return self._finish(highest, bool(target_return - highest @ self._mu <= self.tol))
+        if target_return <= lowest @ self._mu:
+            return self._finish(lowest, bool(lowest @ self._mu - target_return <= self.tol))
+
+        def root(segment):
+            slope = segment[1] @ self._mu
+            return (target_return - segment[0] @ self._mu) / slope if slope > 0 else None
+
+        w, _, success = self._search(lambda x, nu: x @ self._mu - target_return, root, w)
+        return self._finish(w, success)
+
+    def efficient_risk(self, target_risk: float, risk_free_rate: float = 0.02,
+                       initial_guess: numpy.ndarray = None) -> dict:
+        """
+        Calculate the Sharpe-maximising portfolio for a given volatility (max return for a target_risk).
+        Sharpe ratio grows along the frontier up to the tangency portfolio where
+        nu * (return - risk_free_rate) = 2 * variance, so the answer is the tangency portfolio
+        or the frontier portfolio with target volatility if tangency one is riskier.
+
+        :param target_risk: the desired volatility of the resulting portfolio
+        :param risk_free_rate: risk-free rate of borrowing/lending
+        :param initial_guess: weights to start from
+        :raises ValueError: if target_risk is not a positive float
+        :return: asset weights for the efficient risk portfolio
+        :rtype: dict
+        """
+        if not isinstance(target_risk, float) or target_risk < 0:
+            raise ValueError("target_risk should be a positive float")
+        w = self._start(initial_guess)
+        safest, _, success = self._search(lambda x, nu: nu, lambda s: 0.0, w)
+        if self._variance(safest) > target_risk ** 2 + self.tol:
+            return self._finish(safest, False)
+
+        # Along a segment w'Qb = 0 at nu = 0 and b'Qb = mu'b / 2, so the tangency condition is linear
+        def tangency_root(segment):
+            excess = segment[0] @ self._mu - risk_free_rate
+            return 2 * self._variance(segment[0]) / excess if excess > 0 else None
+
+        tangency, nu, success = self._search(lambda x, nu: nu * (x @ self._mu - risk_free_rate) - 2 * self._variance(x),
+                                             tangency_root, safest, lo=0.0)
+        if self._variance(tangency) <= target_risk ** 2:
+            return self._finish(tangency, success)
+
+        def risk_root(segment):
+            spread = segment[1] @ self._q @ segment[1]
+            base = self._variance(segment[0])
+            return numpy.sqrt((target_risk ** 2 - base) / spread) if spread > 0 and base <= target_risk ** 2 else None
+
+        w, _, success = self._search(lambda x, nu: self._variance(x) - target_risk ** 2, risk_root, tangency,
+                                     lo=0.0, hi=nu)
+        return self._finish(w, success)
+
+    # endregion
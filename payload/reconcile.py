@@ -0,0 +1,52 @@
+"""
+Order reconciliation
+
+Diffs quotes of a new cycle against orders still open on the exchange. An open order
+on the same market and side within price and amount tolerance of a quote is kept with
+its queue priority, the rest of open orders are cancelled and only unmatched quotes
+are placed, so a cycle with unchanged recommendations sends no requests at all.
+
+ """
+
+
+def _distance(quote: dict, order: dict) -> tuple:
+    """
+    Relative price and amount distances of open order from quote,
+    amount of partially filled order is its remaining amount
+    """
+    remaining = order.get('remaining')
+    amount = remaining if remaining is not None else order.get('amount') or 0
+    price = order.get('price') or 0
+    if not quote['price'] or not quote['amount']:
+        return float('inf'), float('inf')
+    return abs(price - quote['price']) / quote['price'], abs(amount - quote['amount']) / quote['amount']
+
+
+def reconcile_orders(quotes: list, open_orders: dict, price_tolerance: float = 0.001,
+                     amount_tolerance: float = 0.05) -> tuple:
+    """
+    Match quotes with open orders one to one, the closest in price first
+
+    :param quotes: quotes from quote collector
+    :param open_orders: {order_history key: order} of orders open on the exchange
+    :param price_tolerance: relative price change to keep an order
+    :param amount_tolerance: relative amount change to keep an order
+    :return: kept order keys, order keys to cancel and quotes to place
+    :rtype: tuple
+    """
+    candidates = list()
+    for i, q in enumerate(quotes):
+        for key, order in open_orders.items():
+            if order.get('symbol') != q['symbol'] or str(order.get('side')).upper() != q['side']:
+                continue
+            price, amount = _distance(q, order)
+            if price <= price_tolerance and amount <= amount_tolerance:
+                candidates.append((price, amount, i, key))
+    kept, matched = dict(), set()
+    for _, _, i, key in sorted(candidates, key=lambda x: x[:2]):
+        if i not in matched and key not in kept:
+            kept[key] = i
+            matched.add(i)
+    cancel = [x for x in open_orders if x not in kept]
+    place = [q for i, q in enumerate(quotes) if i not in matched]
+    return list(kept), cancel, place
@@ -0,0 +1,196 @@
+"""
+Min-cost-flow trade router
+
+Assets are nodes and tradable markets are pairs of arcs between them: selling the market
+base for its quote and buying the base with the quote. Every arc costs fee plus half of
+the relative ticker spread per unit of value moved through it. Assets to sell supply their
+surplus value, assets to buy demand theirs, and the cheapest flow between them is solved
+as one sparse linear program, so trades may go through transit assets when no direct
+market exists or a multi-hop route is cheaper.
+All legs of a route are placed in the same cycle, so a leg selling a transit asset can only
+spend what is already free on the account: with free balances passed and exceeded by the
+cheapest flow, outflow of every asset beyond its own surplus is capped by its free value.
+Value which can not be passed on is parked in transit assets of the cheapest routes, so first
+legs are still placed and the next cycles sell the transit asset once the first legs are
+filled, demand left without value is returned unrouted.
+The node-arc incidence matrix is built once per market set, only costs change with tickers.
+When priced markets form no cycle, i.e. every asset is quoted in the base asset only, there is
+one route between any two assets and the flow is summed up the market tree without a solver.
+
+ """
+import numpy
+from scipy import sparse
+from scipy.optimize import linprog, OptimizeResult
+from scipy.sparse.csgraph import connected_components, breadth_first_order
+
+
+class TradeRouter:
+
+    def __init__(self, markets: list, fee: float = 0.001) -> None:
+        """
+        :param markets: tradable markets, i.e. ['ETH/BTC', 'BTC/USDT']
+        :param fee: relative trading fee of every trade
+        """
+        self.markets = list(markets)
+        self.fee = fee
+        self.assets = sorted({a for m in self.markets for a in m.split('/')})
+        self.index = {x: i for i, x in enumerate(self.assets)}
+        bases = numpy.array([self.index[m.split('/')[0]] for m in self.markets], dtype=numpy.int64)
+        quotes = numpy.array([self.index[m.split('/')[1]] for m in self.markets], dtype=numpy.int64)
+        # Arcs 0..n-1 sell market base for quote, arcs n..2n-1 buy market base with quote
+        self._tails = numpy.concatenate([bases, quotes])
+        self._heads = numpy.concatenate([quotes, bases])
+        arcs = numpy.arange(len(self._tails))
+        # Flow leaves tail and enters head: -1 and 1 in node rows
+        self._incidence = sparse.csr_matrix(
+                (numpy.concatenate([-numpy.ones(len(arcs)), numpy.ones(len(arcs))]),
+                 (numpy.concatenate([self._tails, self._heads]), numpy.concatenate([arcs, arcs]))),
+                shape=(len(self.assets), len(arcs)))
+        self._outflow = sparse.csr_matrix((numpy.ones(len(arcs)), (self._tails, arcs)),
+                                          shape=(len(self.assets), len(arcs)))
+        self.stats = dict()
+
+    def costs(self, tickers: dict) -> numpy.ndarray:
+        """
+        Cost of every arc per unit of value, inf for markets without ticker
+
+        :param tickers: tickers with 'bid' and 'ask' of markets
+        :rtype: numpy.ndarray
+        """
+        cost = numpy.full(len(self.markets), numpy.inf)
+        for i, m in enumerate(self.markets):
+            t = tickers.get(m)
+            if t is not None and t.get('bid') and t.get('ask'):
+                cost[i] = self.fee + (t['ask'] - t['bid']) / (t['ask'] + t['bid'])
+        return numpy.concatenate([cost, cost])
+
+    def _balance(self, values: dict, priced: numpy.ndarray) -> tuple:
+        """
+        Node supplies of assets, the larger of sold and bought value of every component
+        connected by priced markets is scaled down to the smaller one
+
+        :return: supplies aligned with self.assets and values left unrouted
+        :rtype: tuple
+        """
+        supply = numpy.zeros(len(self.assets))
+        unrouted = dict()
+        for a, v in values.items():
+            if a in self.index:
+                supply[self.index[a]] -= v
+            elif v != 0:
+                unrouted[a] = v
+        n = len(self.markets)
+        tails, heads = self._tails[:n][priced[:n]], self._heads[:n][priced[:n]]
+        components = connected_components(sparse.coo_matrix((numpy.ones(len(tails)), (tails, heads)),
+                                                            shape=(len(self.assets), ) * 2), directed=False)[1]
+        for c in numpy.unique(components):
+            nodes = components == c
+            sold, bought = supply[nodes & (supply > 0)].sum(), -supply[nodes & (supply < 0)].sum()
+            if numpy.isclose(sold, bought, rtol=1e-9, atol=0):
+                continue
+            elif sold > bought:
+                scale = numpy.where(supply > 0, bought / sold, 1)
+            else:
+                scale = numpy.where(supply < 0, sold / bought, 1)
+            for i in numpy.flatnonzero(nodes & (scale < 1)):
+                unrouted[self.assets[i]] = -supply[i] * (1 - scale[i])
+                supply[i] *= scale[i]
+        return supply, unrouted
+
+    def _tree_flow(self, supply: numpy.ndarray, priced: numpy.ndarray):
+        """
+        The only flow meeting supplies when priced markets form a forest: every market carries
+        the net supply of the subtree behind it
+
+        :return: linprog like result with arc flows or None if priced markets have a cycle
+        """
+        n = len(self.markets)
+        tails, heads = self._tails[:n][priced[:n]], self._heads[:n][priced[:n]]
+        graph = sparse.coo_matrix((numpy.ones(len(tails)), (tails, heads)), shape=(len(self.assets), ) * 2).tocsr()
+        components, labels = connected_components(graph, directed=False)
+        if len(tails) != len(self.assets) - components:
+            return None
+        arcs = {(int(x), int(y)): i for i, x, y in zip(numpy.flatnonzero(priced[:n]), tails, heads)}
+        flow = numpy.zeros(2 * n)
+        net = supply.copy()
+        for c in range(components):
+            order, parents = breadth_first_order(graph, int(numpy.argmax(labels == c)), directed=False)
+            # Leaves first: a node passes its net supply on to its parent
+            for node in order[:0:-1]:
+                parent = int(parents[node])
+                if (node, parent) in arcs:
+                    # node is the market base, positive net supply sells it
+                    i = arcs[(node, parent)]
+                    flow[i if net[node] > 0 else n + i] = abs(net[node])
+                else:
+                    i = arcs[(parent, node)]
+                    flow[n + i if net[node] > 0 else i] = abs(net[node])
+                net[parent] += net[node]
+        return OptimizeResult(x=flow, status=0)
+
+    def _capped(self, c: numpy.ndarray, bounds: list, supply: numpy.ndarray, capacity: numpy.ndarray,
+                parking: numpy.ndarray):
+        """
+        Cheapest flow with outflow of every node capped by capacity.
+        Slack of every node is its value left unrouted, it costs more than any route, so value
+        is left only where free balances are short. Parking nodes may keep inflow they can not
+        pass on, parking is cheaper than leaving sold value unrouted, so first legs are placed.
+
+        :param parking: nodes allowed to park inflow
+        :return: linprog result with flows, slacks and parked values
+        """
+        m = len(self.assets)
+        c = numpy.concatenate([c, numpy.ones(m), numpy.full(m, 0.5)])
+        a_eq = sparse.hstack([self._incidence, -sparse.diags(numpy.sign(supply)), -sparse.diags(parking.astype(float))],
+                             format='csr')
+        bounds = bounds + [(0, abs(x)) for x in supply] + [(0, None) if x else (0, 0) for x in parking]
+        a_ub = sparse.hstack([self._outflow, sparse.csr_matrix((m, 2 * m))], format='csr')
+        return linprog(c, A_ub=a_ub, b_ub=capacity, A_eq=a_eq, b_eq=-supply, bounds=bounds, method='highs')
+
+    def route(self, values: dict, tickers: dict, free: dict = None) -> tuple:
+        """
+        Cheapest trades moving value from assets to sell to assets to buy
+
+        :param values: value to buy (positive) or to sell (negative) of assets in portfolio base asset
+        :param tickers: tickers with 'bid' and 'ask' of markets
+        :param free: free balances of assets in portfolio base asset, caps value sent on by transit assets,
+                     None for no caps
+        :return: trades as (market, side, value) with BUY or SELL of market base
+                 and values left unrouted {asset: value}
+        :rtype: tuple
+        """
+        self.stats = {'trades': 0, 'success': True}
+        cost = self.costs(tickers)
+        priced = numpy.isfinite(cost)
+        supply, unrouted = self._balance(values, priced)
+        if not (supply > 0).any():
+            return list(), unrouted
+        # Flow conservation: inflow - outflow of every node equals its demand, markets without tickers are closed
+        c = numpy.where(priced, cost, 0)
+        bounds = [(0, None) if x else (0, 0) for x in priced]
+        result = self._tree_flow(supply, priced)
+        if result is None:
+            result = linprog(c, A_eq=self._incidence, b_eq=-supply, bounds=bounds, method='highs')
+        tolerance = 1e-9 * numpy.abs(supply).max()
+        if result.status == 0 and free is not None:
+            outflow = self._outflow @ result.x
+            capacity = numpy.maximum(supply, 0) + numpy.array([max(free.get(x, 0), 0) for x in self.assets])
+            if (outflow > capacity + tolerance).any():
+                # Only transit assets the cheapest routes pass through may park value
+                on_route = (supply == 0) & (self._incidence @ result.x + outflow > tolerance)
+                result = self._capped(c, bounds, supply, capacity, on_route)
+        self.stats['success'] = bool(result.status == 0)
+        if result.status != 0:
+            for i in numpy.flatnonzero(supply != 0):
+                unrouted[self.assets[i]] = unrouted.get(self.assets[i], 0) - supply[i]
+            return list(), unrouted
+        n = len(self.markets)
+        flow = result.x[:2 * n]
+        slack = result.x[2 * n:2 * n + len(self.assets)]
+        for i in numpy.flatnonzero(slack > tolerance):
+            unrouted[self.assets[i]] = unrouted.get(self.assets[i], 0) - float(numpy.sign(supply[i]) * slack[i])
+        trades = list()
+        for i in numpy.flatnonzero(flow > tolerance):
+            trades.append((self.markets[i % n], 'SELL' if i < n else 'BUY', float(flow[i])))
+        self.stats['trades'] = len(trades)
+        return trades, unrouted
@@ -0,0 +1,88 @@
+"""
+Conversion routes index
+
+Maps (asset, quote) pairs to the shortest path of market legs between them.
+Every leg is a (market, direction) tuple: direction 1 when the leg sells the market
+base for its quote (amount is multiplied by price) and -1 when it buys the base
+with the quote (amount is divided by price). So an amount of asset is valued in
+quote as amount * prod(price(market) ** direction).
+Routes are found once per market set with breadth first search and
+prefer transit assets when several paths have the same length.
+
+ """
+from collections import deque
+
+
+class RouteIndex:
+
+    def __init__(self, markets: list, transit_assets: tuple = ('BTC', ), max_legs: int = 4) -> None:
+        """
+        :param markets: markets list, i.e. ['ETH/BTC', 'BTC/USDT']
+        :param transit_assets: assets preferred as middle legs
+        :param max_legs: longest route length
+        """
+        self.markets = list(markets)
+        self.max_legs = max_legs
+        # {asset: [(neighbour asset, market, direction)]}
+        self._graph = dict()
+        for m in self.markets:
+            base, quote = m.split('/')
+            self._graph.setdefault(base, list()).append((quote, m, 1))
+            self._graph.setdefault(quote, list()).append((base, m, -1))
+        for x in self._graph.values():
+            x.sort(key=lambda y: y[0] not in transit_assets)
+        # {quote: {asset: legs}}
+        self._routes = dict()
+
+    @property
+    def assets(self) -> list:
+        return list(self._graph.keys())
+
+    def routes_to(self, quote: str) -> dict:
+        """
+        Routes of all reachable assets to quote, searched once per quote
+
+        :param quote: asset to value in
+        :return: {asset: ((market, direction), ...)}, empty route for quote itself
+        :rtype: dict
+        """
+        if quote in self._routes:
+            return self._routes[quote]
+        routes = {quote: tuple()}
+        queue = deque([quote])
+        while queue:
+            asset = queue.popleft()
+            if len(routes[asset]) >= self.max_legs:
+                continue
+            for neighbour, market, direction in self._graph.get(asset, list()):
+                if neighbour not in routes:
+                    # Neighbour reaches asset by the reversed leg
+                    routes[neighbour] = ((market, -direction), ) + routes[asset]
+                    queue.append(neighbour)
+        self._routes[quote] = routes
+        return routes
+
+    def route(self, asset: str, quote: str) -> tuple:
+        """
+        :return: legs from asset to quote
+        :rtype: tuple
+        :raises KeyError: if there is no route
+        """
+        return self.routes_to(quote)[asset]
+
+    def convert(self, amount: float, asset: str, quote: str, price) -> float:
+        """
+        Value amount of asset in quote
+
+        :param amount: amount of asset
+        :param price: callable returning price of a market
+        :return: amount counted in quote
+        :rtype: float
+        :raises KeyError: if there is no route
+        """
+        for market, direction in self.route(asset, quote):
+            if direction > 0:
+                amount *= price(market)
+            else:
+                amount /= price(market)
+        return amount
@@ -5,14 +5,41 @@ from time import sleep, time_ns, time, ctime
 import warnings
 from sys import exit
 from random import randrange, seed
+import numpy as np
 
-from binance.restclient import RestClient as binanceRestClient
+from binance.restclient import RestClient as binanceRestClient, TERMINAL_STATUSES
 from payload.trader import Trader
 from yat.assetlist.StaticAssetList import StaticAssetList
 from yat.uicurses import uiCurses, curses
 from yat.influx import Influx
 from yat.calcus import rounded_to_precision
+from yat.candlestore import CandleStore
 from payload.portfolioOpt import PortfolioOpt
+from payload.parallel import ParallelOpt
+from payload.routes import RouteIndex
+from payload.router import TradeRouter
+from payload.reconcile import reconcile_orders
+from payload.valuation import Valuation
+
+
+# Settings copied to Runner attributes as is
+SETTINGS_ATTRIBUTES = {'DRY_RUN':               'dry_run',
+                       'LOOP_INTERVAL':         'loop_interval',
+                       'MARKET_ONLY':           'market_only',
+                       'REBALANCING_PRECISION': 'rebalancing_precision',
+                       'TARGET_RETURN':         'portfolio_target_return',
+                       'TARGET_RISK':           'portfolio_target_risk',
+                       'TIME_FRAMES':           'portfolio_time_frames', }
+
+# Settings which change portfolio assets and markets
+PORTFOLIO_SETTINGS = ('PORTFOLIO_WHITE_LIST', 'PORTFOLIO_BLACK_LIST', 'PORTFOLIO_BASE_ASSET', 'WEIGHT_BOUNDS')
+
+# Settings which rebuild portfolio optimizers
+OPTIMIZER_SETTINGS = ('OPTIMIZER_CACHE_SIZE', 'OPTIMIZER_CACHE_PATH', 'OPTIMIZER_CACHE_INTERVAL', 'FRONTIER_POINTS',
+                      'OPTIMIZER_ENGINE', 'OPTIMIZER_WORKERS')
+
+# Settings applied on restart only
+RESTART_SETTINGS = ('BUILD_DATE', 'MARKETS_CACHE_PATH', 'MARKETS_CACHE_TTL', 'WATCHED_FILE')
 
 
 class Runner(object):
@@ -29,18 +56,15 @@ class Runner(object):
         self.file_watcher = watcher
         self.file_watcher.look()
         self.last_fetch_time = int(time())
-        self.dry_run = kwargs['DRY_RUN']
-        self.loop_interval = kwargs['LOOP_INTERVAL']
-        self.market_only = kwargs['MARKET_ONLY']
+        self._init_state(kwargs)
         # Init screen with ui
         self.ui = uiCurses()
         self.ui.print_ui()
         self.ui.push_data(header_str="Portfolio ReBalancer build:{}".format(kwargs['BUILD_DATE']))
         # Init database connection
-        if 'INFLUX_DATA' in kwargs and len(kwargs['INFLUX_DATA']) > 0:
-            self.db = Influx(**kwargs['INFLUX_DATA'])
-        else:
-            self.db = None
+        self._init_db(kwargs)
+        # Init on-disk candles storage
+        self._init_candle_store(kwargs)
         # Initialise exchanges
         self.data_provider_list = []
         self.exchange = binanceRestClient(window=kwargs['AUTH_DATA']['binance']['window'],
@@ -48,37 +72,17 @@ class Runner(object):
                                           secret=kwargs['AUTH_DATA']['binance']['secret'],
                                           verbose=False,
                                           logger=logger,
-                                          marketonly=self.market_only)
+                                          marketonly=self.market_only,
+                                          workers=kwargs.get('API_WORKERS', 1),
+                                          weight_limit=kwargs.get('API_WEIGHT_LIMIT', 1200),
+                                          candle_store=self.candle_store,
+                                          markets_cache_path=kwargs.get('MARKETS_CACHE_PATH'),
+                                          markets_ttl=kwargs.get('MARKETS_CACHE_TTL', 86400))
         self.data_provider_list.append(self.exchange.exchange_name)
         # self.data_provider_list.append([self.exchange.exchange_name, self.exchange])
+        self._init_optimizers(kwargs)
         # Init portfolio
-        self.portfolio_base_asset = kwargs['PORTFOLIO_BASE_ASSET']
-        self.portfolio_weight_bounds = kwargs['WEIGHT_BOUNDS']
-        # Define Static portfolio asset list
-        self.portfolio_manager = StaticAssetList(self.logger,
-                                                 self.exchange,
-                                                 kwargs['PORTFOLIO_WHITE_LIST'],
-                                                 kwargs['PORTFOLIO_BLACK_LIST'],
-                                                 self.portfolio_weight_bounds)
-        self.portfolio_manager.refresh_assetlist()
-        # Define markets and filter assets with direct or 2-leg markets only
-        self.portfolio_base_markets = self.portfolio_manager.build_portfolio_assets_markets(self.portfolio_base_asset)
-        self.portfolio_assets = self.portfolio_manager.whitelist
-        self.portfolio = self.portfolio_manager.portfolio
-
-        self.rebalancing_precision = kwargs['REBALANCING_PRECISION']
-        self.portfolio_base_amount: float = 0
-        self.portfolio_target_return = kwargs['TARGET_RETURN']
-        self.portfolio_target_risk = kwargs['TARGET_RISK']
-        self.portfolio_time_frames = kwargs['TIME_FRAMES']
-        self.portfolio_ohlcv = {}
-        self.portfolio_current_weights = {}
-        self.portfolio_recommended_weights = {}
-        self.portfolio_difference = {}
-        # Quote collector container
-        self.quote_collector = []
-        self.run_step = 0
-        self.balances = {}
+        self._init_portfolio(kwargs)
         # Get all tickers
         self.exchange.process_tickers()
         # Run main loop and close threads on exit
@@ -88,11 +92,137 @@ class Runner(object):
             try:
                 self.logger.info(self.ui.teardown())
             finally:
-                pass
+                self.parallel_opt.close()
+                self.portfolio_opt.save_cache()
             # self.logger.info("Shutdown application")
             # self.exchange2.execute.shutdown()
             # self.exchange.order_history_to_pickle(self.cache_path)
 
+    # region Settings
+    def _set_attributes(self, settings: dict):
+        for x, y in SETTINGS_ATTRIBUTES.items():
+            setattr(self, y, settings[x])
+
+    def _init_state(self, settings: dict):
+        """
+        Settings attributes and empty portfolio state of the first cycle
+        """
+        # Applied settings, compared with reloaded ones in _apply_settings
+        self.settings = dict(settings)
+        self._set_attributes(settings)
+        self.portfolio_base_amount: float = 0
+        self.portfolio_ohlcv = {}
+        self.portfolio_current_weights = {}
+        self.portfolio_recommended_weights = {}
+        self.portfolio_difference = {}
+        # Quote collector container
+        self.quote_collector = []
+        self.run_step = 0
+        self.balances = {}
+
+    def _init_db(self, settings: dict):
+        if 'INFLUX_DATA' in settings and len(settings['INFLUX_DATA']) > 0:
+            self.db = Influx(**settings['INFLUX_DATA'])
+        else:
+            self.db = None
+
+    def _init_candle_store(self, settings: dict):
+        if settings.get('CANDLES_PATH'):
+            self.candle_store = CandleStore(settings['CANDLES_PATH'], logger=self.logger)
+        else:
+            self.candle_store = None
+
+    def _init_optimizers(self, settings: dict):
+        # Optimizer keeps rolling estimators state between cycles
+        self.portfolio_opt = PortfolioOpt(cache_size=settings.get('OPTIMIZER_CACHE_SIZE', 16),
+                                          cache_path=settings.get('OPTIMIZER_CACHE_PATH'),
+                                          cache_interval=settings.get('OPTIMIZER_CACHE_INTERVAL', 600),
+                                          frontier_points=settings.get('FRONTIER_POINTS', 0),
+                                          engine=settings.get('OPTIMIZER_ENGINE', 'scipy'))
+        # Solves OPTIMIZER_OBJECTIVES on all time frames in worker processes started on first use
+        self.parallel_opt = ParallelOpt(workers=settings.get('OPTIMIZER_WORKERS'),
+                                        engine=settings.get('OPTIMIZER_ENGINE', 'scipy'))
+
+    def _init_portfolio(self, settings: dict):
+        """
+        Build portfolio assets, markets and watched tickers from settings
+        with already loaded exchange markets
+        """
+        self.portfolio_base_asset = settings['PORTFOLIO_BASE_ASSET']
+        self.portfolio_weight_bounds = settings['WEIGHT_BOUNDS']
+        # Define Static portfolio asset list, asset list changes passed lists so pass copies
+        self.portfolio_manager = StaticAssetList(self.logger,
+                                                 self.exchange,
+                                                 list(settings['PORTFOLIO_WHITE_LIST']),
+                                                 list(settings['PORTFOLIO_BLACK_LIST']),
+                                                 self.portfolio_weight_bounds)
+        self.portfolio_manager.refresh_assetlist()
+        # Define markets and filter assets with direct or 2-leg markets only
+        self.portfolio_base_markets = self.portfolio_manager.build_portfolio_assets_markets(self.portfolio_base_asset)
+        self.portfolio_assets = self.portfolio_manager.whitelist
+        self.portfolio = self.portfolio_manager.portfolio
+        # Refresh only tickers of markets between portfolio assets
+        watched_markets = self.portfolio_manager.build_watched_markets()
+        self.exchange.watch_tickers(watched_markets)
+        # Conversion routes for balances valuation by ohlcv and quotes amounts by tickers.
+        # Ohlcv is fetched for direct and BTC markets only, so valuation routes have 2 legs at most
+        self.ohlcv_routes = RouteIndex(self.portfolio_base_markets)
+        self.ticker_routes = RouteIndex(watched_markets)
+        self.trade_router = TradeRouter(watched_markets, fee=settings.get('TRADE_FEE', 0.001))
+        self.valuation = Valuation(self.ohlcv_routes, self.portfolio_assets, self.portfolio_base_asset)
+        # Drop data of the previous portfolio
+        self.portfolio_current_weights.clear()
+        self.portfolio_recommended_weights.clear()
+        self.portfolio_difference.clear()
+        self.quote_collector.clear()
+
+    def _apply_settings(self, settings: dict) -> set:
+        """
+        Apply only changed settings keeping exchange connection, markets and caches.
+        Portfolio is rebuilt on asset lists, base asset or weight bounds change,
+        optimizers are rebuilt on their settings change dropping rolling estimators state,
+        credentials are replaced in the exchange client.
+        Next cycle starts immediately after any change.
+
+        :param settings: reloaded settings dict
+        :return: names of changed settings
+        :rtype: set
+        """
+        changed = {x for x in set(self.settings) | set(settings) if self.settings.get(x) != settings.get(x)}
+        if len(changed) == 0:
+            return changed
+        # Watcher clears its dict on the next reload
+        settings = dict(settings)
+        self._set_attributes(settings)
+        self.exchange.marketonly = self.market_only
+        if 'AUTH_DATA' in changed:
+            self.exchange.set_credentials(api_key=settings['AUTH_DATA']['binance']['api_key'],
+                                          secret=settings['AUTH_DATA']['binance']['secret'])
+        if 'INFLUX_DATA' in changed:
+            self._init_db(settings)
+        if 'CANDLES_PATH' in changed:
+            self._init_candle_store(settings)
+            self.exchange.candle_store = self.candle_store
+        if 'API_WORKERS' in changed:
+            self.exchange.workers = max(1, int(settings.get('API_WORKERS', 1)))
+        if 'API_WEIGHT_LIMIT' in changed:
+            self.exchange.rate_limiter.resize(settings.get('API_WEIGHT_LIMIT', 1200))
+        if len(changed & set(PORTFOLIO_SETTINGS)) > 0:
+            self._init_portfolio(settings)
+        elif 'TRADE_FEE' in changed:
+            self.trade_router.fee = settings.get('TRADE_FEE', 0.001)
+        if len(changed & set(OPTIMIZER_SETTINGS)) > 0:
+            self.parallel_opt.close()
+            self.portfolio_opt.save_cache()
+            self._init_optimizers(settings)
+        for x in changed & set(RESTART_SETTINGS):
+            self.logger.warning(f"Setting {x} is applied on restart only")
+        self.logger.info("Applied new settings: {}".format(', '.join(sorted(changed))))
+        self.settings = settings
+        self.last_fetch_time = 0
+        return changed
+    # endregion
+
     # region Index data
     def _update_index_data(self):
         self.ui.index_data.clear()
@@ -125,6 +255,7 @@ class Runner(object):
     def _count_symbol_amount(self, symbol_base, amount):
         """
         Count amount of symbol_base currency from portfolio_base_asset amount
+        through indexed ticker route with ask prices
 
         :param symbol_base: asset name
         :type symbol_base: str
@@ -133,40 +264,32 @@ class Runner(object):
         :return: amount quoted in symbol_base asset
         :rtype: float
         """
-        amount = amount
-        symbol_base = symbol_base
-        symbol_quote = self.portfolio_base_asset
         try:
-            if symbol_base == symbol_quote:
-                return amount
-            if f'{symbol_base}/{symbol_quote}' in self.exchange.all_tickers.keys():
-                ask_price = self.exchange.all_tickers[f'{symbol_base}/{symbol_quote}']['ask']
-                return amount / ask_price
-            elif f'{symbol_quote}/{symbol_base}' in self.exchange.all_tickers.keys():
-                ask_price = self.exchange.all_tickers[f'{symbol_quote}/{symbol_base}']['ask']
-                return amount * ask_price
-            elif f'{symbol_base}/BTC' in self.exchange.all_tickers.keys():
-                a_btc_price = self.exchange.all_tickers[f'{symbol_base}/BTC']['ask']
-                ba_btc_price = 0
-                if f'{symbol_quote}/BTC' in self.exchange.all_tickers.keys():
-                    ba_btc_price = 1 / self.exchange.all_tickers[f'{symbol_quote}/BTC']['ask']
-                elif f'BTC/{symbol_quote}' in self.exchange.all_tickers.keys():
-                    ba_btc_price = self.exchange.all_tickers[f'BTC/{symbol_quote}']['ask']
-                return amount * a_btc_price * ba_btc_price
-            # TODO This case need more testing
-            elif f'BTC/{symbol_base}' in self.exchange.all_tickers.keys():
-                a_btc_price = 1 / self.exchange.all_tickers[f'BTC/{symbol_base}']['ask']
-                ba_btc_price = 0
-                if f'{symbol_quote}/BTC' in self.exchange.all_tickers.keys():
-                    ba_btc_price = 1 / self.exchange.all_tickers[f'{symbol_quote}/BTC']['ask']
-                elif f'BTC/{symbol_quote}' in self.exchange.all_tickers.keys():
-                    ba_btc_price = self.exchange.all_tickers[f'BTC/{symbol_quote}']['ask']
-                return amount * a_btc_price * ba_btc_price
+            return self.ticker_routes.convert(amount, self.portfolio_base_asset, symbol_base,
+                                              lambda m: self.exchange.all_tickers[m]['ask'])
         except KeyError:
             return 0.0
         except ZeroDivisionError:
             return 0.0
 
+    def _free_values(self, balances: dict, tickers) -> dict:
+        """
+        Free balances of routed assets valued in portfolio_base_asset with bid prices
+
+        :param balances: exchange balances
+        :param tickers: tickers of watched markets
+        :return: {asset: free value}
+        :rtype: dict
+        """
+        free = dict()
+        for a in self.trade_router.assets:
+            try:
+                free[a] = self.ticker_routes.convert(balances.get(a, dict()).get('free') or 0, a,
+                                                     self.portfolio_base_asset, lambda m: tickers[m]['bid'])
+            except (KeyError, TypeError, ZeroDivisionError):
+                free[a] = 0.0
+        return free
+
     def price_from_ohlcv_close(self, a1: str, a2: str = None):
         """
         Get price from last close ohlcv value.
@@ -187,61 +310,27 @@ class Runner(object):
         i1 = m_o[list(m_o)[-1]]
         return float(i1[-1][4])
 
-    def _count_base_balance(self, asset: str) -> float:
+    def _ohlcv_close_prices(self) -> np.ndarray:
         """
-        Count asset in portfolio_base_asset amount.
-        Count through BTC market as 2-leg trade multiplying last close prices.
-
-        :param asset: asset name
-        :type asset: str
-        :return: amount counted in base asset price
-        :rtype: float
+        Last close prices of valuation markets, NaN for markets without ohlcv
         """
-        asset = asset
-        pbasset = self.portfolio_base_asset
-        lbm = list(self.portfolio_ohlcv.keys())
-        # Define is there a direct trade with existed market or 2 leg trade through BTC
-        try:
-            if asset == pbasset:
-                return self.balances[asset]['all']
-            elif f'{asset}/{pbasset}' in lbm:
-                return self.balances[asset]['all'] * self.price_from_ohlcv_close(f'{asset}/{pbasset}')
-            elif f'{pbasset}/{asset}' in lbm:
-                return self.balances[asset]['all'] / self.price_from_ohlcv_close(f'{pbasset}/{asset}')
-            # Find right swap markets for this assets pair
-            elif f'{asset}/BTC' in lbm:
-                a_btc_p = self.price_from_ohlcv_close(f'{asset}/BTC')
-                ba_btc_p = 0
-                if f'{pbasset}/BTC' in lbm:
-                    ba_btc_p = 1 / self.price_from_ohlcv_close(f'{pbasset}/BTC')
-                elif f'BTC/{pbasset}' in lbm:
-                    ba_btc_p = self.price_from_ohlcv_close(f'BTC/{pbasset}')
-                return self.balances[asset]['all'] * a_btc_p * ba_btc_p
-            elif f'BTC/{asset}' in lbm:
-                a_btc_p = 1 / self.price_from_ohlcv_close(f'BTC/{asset}')
-                ba_btc_p = 0
-                if f'{pbasset}/BTC' in lbm:
-                    ba_btc_p = 1 / self.price_from_ohlcv_close(f'{pbasset}/BTC')
-                elif f'BTC/{pbasset}' in lbm:
-                    # With USDSB can happen 3-legs markets.
-                    ba_btc_p = self.price_from_ohlcv_close(f'BTC/{pbasset}')
-                return self.balances[asset]['all'] * a_btc_p * ba_btc_p
-        except KeyError:
-            return 0.0
-        except ZeroDivisionError:
-            return 0.0
-
-    def _count_portfolio_base_amount(self):
-        pbv = 0
-        for c in self.portfolio_assets:
-            pbv += self._count_base_balance(c)
-        self.portfolio_base_amount = pbv
+        prices = np.full(len(self.valuation.markets), np.nan)
+        for i, m in enumerate(self.valuation.markets):
+            try:
+                prices[i] = self.price_from_ohlcv_close(m)
+            except (KeyError, IndexError):
+                pass
+        return prices
 
-    def _update_portfolio_current_weights(self):
+    def _update_valuation(self):
+        """
+        Count base values of all portfolio assets, portfolio base amount and current weights
+        in one pass and keep them in self.valuation for ui and quotes
+        """
+        self.valuation.update(self.balances, self._ohlcv_close_prices())
+        self.portfolio_base_amount = self.valuation.total
         self.portfolio_current_weights.clear()
-        for c in self.portfolio_assets:
-            base_balance = float(self._count_base_balance(c))
-            self.portfolio_current_weights[c] = base_balance/self.portfolio_base_amount
+        self.portfolio_current_weights.update(self.valuation.weights_dict())
 
     def _update_portfolio_data(self):
         self.ui.portfolio_data.clear()
@@ -251,11 +340,8 @@ class Runner(object):
                 balance_all = self.balances[c]['all']
             except KeyError:
                 balance_all = 0
-            base_balance = float(self._count_base_balance(c))
-            try:
-                bp = base_balance / self.portfolio_base_amount
-            except ZeroDivisionError:
-                bp = 0
+            base_balance = self.valuation.base_value(c)
+            bp = self.portfolio_current_weights.get(c, 0)
             try:
                 recw = self.portfolio_recommended_weights[c]
                 difw = self.portfolio_difference[c]
@@ -291,6 +377,41 @@ class Runner(object):
     # endregion
 
     # region Portfolio quotes processor
+    def _frontier_what_if(self) -> list:
+        """
+        Report lines of FRONTIER_WHAT_IF targets answered from the frontier of the last report
+
+        :return: report lines, empty without FRONTIER_POINTS
+        :rtype: list
+        """
+        lines = list()
+        if self.portfolio_opt.frontier is None:
+            return lines
+        for kind, target in self.settings.get('FRONTIER_WHAT_IF', list()):
+            point = self.portfolio_opt.query_frontier(**{'target_' + kind: target})
+            if point is None:
+                lines.append("What if {} {}: out of frontier".format(kind, target))
+                continue
+            mu, sigma, weights = point
+            top = sorted(((x, y) for x, y in weights.items() if y >= 0.01), key=lambda kv: -kv[1])
+            lines.append("What if {} {}: Expected return: {:.2f}% Volatility: {:.2f}% {}".format(
+                    kind, target, 100 * mu, 100 * sigma, ' '.join("{} {:.2f}".format(x, y) for x, y in top)))
+        return lines
+
+    def _log_pricing_gaps(self, gaps: dict):
+        """
+        Log candles missing in pricing panels of the last report, warn above PRICING_GAPS_LIMIT rows
+
+        :param gaps: forward filled grid rows by time frame
+        """
+        limit = self.settings.get('PRICING_GAPS_LIMIT', 10)
+        for tf, count in gaps.items():
+            if count > limit:
+                self.logger.warning("Pricing {}: {} rows with missing candles forward filled, limit {}".format(
+                        tf, count, limit))
+            elif count > 0:
+                self.logger.debug("Pricing {}: {} rows with missing candles forward filled".format(tf, count))
+
     def _compare_weights(self, current: dict, recommended: dict):
         """Compare 2 dicts with same keys.
         Check keys before processing.
@@ -325,12 +446,12 @@ class Runner(object):
         Fill quote_collector with necessary quotes.
         """
         # Check for all_tickers and fetch if they are empty
-        if not(isinstance(self.exchange.all_tickers, dict)):
+        if self.exchange.all_tickers is None:
             self.logger.info('Exchange tickers are empty, fetching...')
             self.exchange.process_tickers()
-            t = self.exchange.all_tickers.copy()
-        else:
-            t = self.exchange.all_tickers.copy()
+        # Tickers table is updated in place by process_tickers, it runs in this loop only,
+        # so tickers do not change while quotes are generated and are not copied
+        t = self.exchange.all_tickers
         if not(isinstance(self.portfolio_difference, dict)):
             self.logger.info("Portfolio difference dict are empty")
             return False
@@ -350,65 +471,41 @@ class Runner(object):
                 b[i] = {'free': 0, "locked": 0, "all": 0}
                 # self.logger.info("No balance for some assets!")
                 # return False
-        # Define cross markets to avoid extra commission on rebalancing
-        pcmall = ["{}/{}".format(x, y) for x in d for y in d]
-        pcmall_s = [x for x in pcmall if x in t.keys()]
-        # Filter for rebalancing_precision
-        rw_pos = {}
-        rw_neg = {}
-        pos_cumsum = 0
-        neg_cumsum = 0
-        # Create dict with portfolio_base_amount and filter zero weights
-        for a, w in d.items():
-            if abs(w) >= self.rebalancing_precision:
-                _ = {'rebal_target': w,
-                     'free': b[a]['free'],
-                     'locked': b[a]['locked'],
-                     'all': b[a]['all'],
-                     'base_amount': w * self.portfolio_base_amount}
-                if w > 0:
-                    rw_pos[a] = _
-                    pos_cumsum += abs(w)
-                elif w < 0:
-                    rw_neg[a] = _
-                    neg_cumsum += abs(w)
-        # Iterate by positive weights and match with negative weights assets
-        # Define amount to trade founding min of base_amount
-        # Convert base amount to proper amount for symbol
-        # Define price and other orders params
-        # !!!Avoid refactoring before implementing non base assets!!!
-        for a, b in rw_pos.items():
-            for c, d in rw_neg.items():
-                if f'{a}/{c}' in pcmall_s:
-                    base_amount = min(abs(b['base_amount']), abs(d['base_amount']))
-                    amount = rounded_to_precision(self._count_symbol_amount(a, base_amount), 8)
-                    # Avoid small amount quotes
-                    if amount < 1e-6:
-                        break
-                    # TODO Implement crossing spread behaviour
-                    price = t[f'{a}/{c}']['bid']
-                    self.quote_collector.append({'symbol': f'{a}/{c}', 'order_type': 'LIMIT', 'side': 'BUY',
-                                                 'amount': amount, 'price': price})
-                    rw_neg[c]['base_amount'] += base_amount
-                    rw_pos[a]['base_amount'] -= base_amount
-                elif f'{c}/{a}' in pcmall_s:
-                    base_amount = min(abs(b['base_amount']), abs(d['base_amount']))
-                    amount = rounded_to_precision(self._count_symbol_amount(c, base_amount), 8)
-                    # Avoid small amount quotes
-                    if amount < 1e-6:
-                        break
-                    price = t[f'{c}/{a}']['ask']
-                    self.quote_collector.append({'symbol': f'{c}/{a}', 'order_type': 'LIMIT', 'side': 'SELL',
-                                                 'amount': amount, 'price': price})
-                    rw_neg[c]['base_amount'] += base_amount
-                    rw_pos[a]['base_amount'] -= base_amount
-                else:
-                    self.logger.error("No market for trading assets")
+        # Value to buy or to sell of assets out of rebalancing precision
+        values = {a: w * self.portfolio_base_amount for a, w in d.items() if abs(w) >= self.rebalancing_precision}
+        # Cheapest trades between sold and bought assets, through transit assets if needed,
+        # all legs are quoted at once so transit assets pass on only their free balances
+        trades, unrouted = self.trade_router.route(values, t, free=self._free_values(b, t))
+        for market, side, base_amount in trades:
+            symbol_base = market.split('/')[0]
+            amount = rounded_to_precision(self._count_symbol_amount(symbol_base, base_amount), 8)
+            # Avoid small amount quotes
+            if amount < 1e-6:
+                continue
+            # TODO Implement crossing spread behaviour
+            price = t[market]['bid'] if side == 'BUY' else t[market]['ask']
+            self.quote_collector.append({'symbol': market, 'order_type': 'LIMIT', 'side': side,
+                                         'amount': amount, 'price': price})
         # Check for empty recommendations lists
-        rw_pos.update(rw_neg)
-        for x, y in rw_pos.items():
-            if abs(y['base_amount']) > 10:
-                self.logger.error('Not all recommendations filled')
+        if any(x not in self.trade_router.index for x in unrouted):
+            self.logger.error("No market for trading assets")
+        if any(abs(x) > 10 for x in unrouted.values()):
+            self.logger.error('Not all recommendations filled')
+
+    def _reconcile_orders(self):
+        """
+        Diff quote_collector against open orders: keep orders matching a quote within
+        ORDER_PRICE_TOLERANCE and ORDER_AMOUNT_TOLERANCE, cancel the others
+        and leave only quotes without a matching order in quote_collector.
+        """
+        open_orders = self.exchange.open_orders()
+        kept, cancel, place = reconcile_orders(self.quote_collector, open_orders,
+                                               price_tolerance=self.settings.get('ORDER_PRICE_TOLERANCE', 0.001),
+                                               amount_tolerance=self.settings.get('ORDER_AMOUNT_TOLERANCE', 0.05))
+        if len(cancel) > 0:
+            self.exchange.cancel_processed_orders(cancel)
+        self.logger.debug("Orders kept: {} canceled: {} new: {}".format(len(kept), len(cancel), len(place)))
+        self.quote_collector[:] = place
 
     def _proceed_orders(self):
         """
@@ -440,12 +537,13 @@ class Runner(object):
             self.ui.reload_ui(screen_data='Missing quote_collector')
 
     def _update_db_with_succeed_trades(self, order_history: dict):
-        """Update provided db with succeed orders
+        """Update provided db with succeed orders,
+        finished orders are reported once including partially filled canceled ones
         """
         if not self.db:
             return
         for o in order_history.values():
-            if o['status'] == 'closed' or (o['status'] == 'open' and o['filled'] > 0):
+            if o['status'] == 'closed' or (o.get('filled') or 0) > 0:
                 self.db.report_order(o, 'rebalancer', 'binance')
     # endregion
 
@@ -471,14 +569,16 @@ class Runner(object):
             sleep(1)
             for t in self.data_provider_list:
                 if t == 'binance' and self._wait_timeout():
-                    # Cancel non filled orders if exist and clear order history finally
+                    # Update orders status, open orders are kept and reconciled with new quotes
                     self.ui.reload_ui(statusbar_str="Fetching orders")
                     self.exchange.fetch_processed_orders()
-                    self.ui.reload_ui(statusbar_str="Canceling orders")
-                    self.exchange.cancel_processed_orders()
-                    # self.exchange.fetch_processed_orders()
-                    self._update_db_with_succeed_trades(self.exchange.order_history)
-                    self.exchange.order_history.clear()
+                    # Report and forget finished orders and orders never placed,
+                    # orders with exception status are kept and fetched again next cycle
+                    finished = {x: y for x, y in self.exchange.order_history.items()
+                                if y.get('status') in TERMINAL_STATUSES or y.get('id') is None}
+                    self._update_db_with_succeed_trades(finished)
+                    for x in finished:
+                        del self.exchange.order_history[x]
                     quotes_info = [x for x in self.quote_collector]
                     self.ui.reload_ui(statusbar_str="Load tickers", screen_data=quotes_info)
                     # Perform checking connections and previous lag
@@ -499,8 +599,7 @@ class Runner(object):
                     self.ui.reload_ui(statusbar_str="Load balances")
                     self.exchange.fetch_balances()
                     self.balances = {x: y for x, y in self.exchange.balances.items() if x in self.portfolio_assets}
-                    self._count_portfolio_base_amount()
-                    self._update_portfolio_current_weights()
+                    self._update_valuation()
                     # Add data to lists for ui
                     self._update_index_data()
                     self._update_pctchange_sparkline()
@@ -508,15 +607,39 @@ class Runner(object):
                     # Calculate optimize portfolio
                     self.ui.reload_ui(statusbar_str="Optimize portfolio")
                     # Get recommended weights from optimizer
-                    self.portfolio_recommended_weights, p_list = PortfolioOpt().generate_report(
-                            ohlcv_data=self.portfolio_ohlcv,
-                            time_frames=self.portfolio_time_frames,
-                            weight_bounds=self.portfolio_weight_bounds,
-                            base_asset=self.portfolio_base_asset,
-                            exp_return_periods=exp_return_periods,
-                            risk_model_periods=risk_model_periods,
-                            target_return=self.portfolio_target_return,
-                            target_risk=self.portfolio_target_risk)
+                    if self.settings.get('OPTIMIZER_OBJECTIVES'):
+                        # Blend of all objectives on all time frames
+                        self.portfolio_recommended_weights, p_list = self.parallel_opt.generate_report(
+                                ohlcv_data=self.portfolio_ohlcv,
+                                time_frames=self.portfolio_time_frames,
+                                weight_bounds=self.portfolio_weight_bounds,
+                                base_asset=self.portfolio_base_asset,
+                                exp_return_periods=exp_return_periods,
+                                risk_model_periods=risk_model_periods,
+                                objectives=self.settings['OPTIMIZER_OBJECTIVES'])
+                        for x in self.parallel_opt.errors:
+                            self.logger.warning("Optimizer objective failed: {}".format(x))
+                        for x in self.parallel_opt.results:
+                            if len(x['stats']) > 0:
+                                self.logger.debug("Optimizer solve {} {} {}: {}".format(
+                                        x['time_frame'], x['objective'], x['target'], x['stats']))
+                        self._log_pricing_gaps(self.parallel_opt.pricing_gaps)
+                    else:
+                        self.portfolio_recommended_weights, p_list = self.portfolio_opt.generate_report(
+                                ohlcv_data=self.portfolio_ohlcv,
+                                time_frames=self.portfolio_time_frames,
+                                weight_bounds=self.portfolio_weight_bounds,
+                                base_asset=self.portfolio_base_asset,
+                                exp_return_periods=exp_return_periods,
+                                risk_model_periods=risk_model_periods,
+                                target_return=self.portfolio_target_return,
+                                target_risk=self.portfolio_target_risk)
+                        if len(self.portfolio_opt.solver_stats) > 0:
+                            self.logger.debug("Optimizer solve: {}".format(self.portfolio_opt.solver_stats))
+                        if len(self.portfolio_opt.frontier_stats) > 0:
+                            self.logger.debug("Optimizer frontier: {}".format(self.portfolio_opt.frontier_stats))
+                        p_list += self._frontier_what_if()
+                        self._log_pricing_gaps({self.portfolio_time_frames[0]: self.portfolio_opt.pricing_gaps})
                     self.ui.reload_ui(portfolio_opt_data=p_list)
                     # Compare current and recommended weights
                     self._compare_weights(self.portfolio_current_weights, self.portfolio_recommended_weights)
@@ -527,6 +650,9 @@ class Runner(object):
                     # Generate quotes and fill quote_collector
                     self.ui.reload_ui(statusbar_str="Generate quotes")
                     self._generate_quotes()
+                    # Cancel changed open orders and leave new quotes only
+                    self.ui.reload_ui(statusbar_str="Reconcile orders")
+                    self._reconcile_orders()
                     quotes_info = ["{} {} {}@{}".format(x['side'], x['symbol'],
                                                         x['amount'], x['price']) for x in self.quote_collector]
                     self.ui.reload_ui(screen_data=quotes_info)
@@ -547,11 +673,9 @@ class Runner(object):
                 self._proceed_orders()
 
             if self.file_watcher.look():
-                # Re init Runner with new settings
-                self.ui.reload_ui(statusbar_str="Reinit runner with new settings")
-                self.__init__(logger=self.logger,
-                              watcher=self.file_watcher,
-                              **self.file_watcher.settings)
+                # Apply changed settings only
+                self.ui.reload_ui(statusbar_str="Apply new settings")
+                self._apply_settings(self.file_watcher.settings)
             self.run_step += 1
             self.ui.reload_ui(statusbar_str="OK")
             # Wait for sleep timeout
@@ -0,0 +1,158 @@
+"""
+Parallel settings sweep
+
+Backtests combinations of settings, i.e. WEIGHT_BOUNDS, TARGET_RETURN, TARGET_RISK,
+REBALANCING_PRECISION, LOOP_INTERVAL and TIME_FRAMES, over a grid or random search
+in a process pool. Workers map the same CandleStore files read-only, so candles are
+shared through the page cache instead of being pickled to every worker.
+Every finished combination is appended to a results csv under its key, combinations
+already there are skipped, so an interrupted sweep continues where it stopped.
+Failed combinations are kept with their error and backtested again on the next run.
+
+ """
+import os
+import json
+import hashlib
+import itertools
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from timeit import default_timer as timer
+import pandas as pd
+
+from payload.backtest import Backtest
+from yat.candlestore import CandleStore
+
+# Runner warnings of thousands of backtest cycles are not printed by default
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+METRICS = ('return', 'max_drawdown', 'turnover', 'fees', 'cycles', 'fills', 'seconds')
+COLUMNS = ('key', 'params') + METRICS + ('error', )
+
+
+def grid(space: dict) -> list:
+    """
+    All combinations of settings values
+
+    :param space: {setting: list of values}
+    :rtype: list
+    """
+    names = sorted(space)
+    return [dict(zip(names, x)) for x in itertools.product(*(space[x] for x in names))]
+
+
+def random_search(space: dict, n: int, seed: int = 0) -> list:
+    """
+    n distinct random combinations of settings values, all of them if there are less
+
+    :param space: {setting: list of values}
+    :param n: combinations to draw
+    :param seed: random seed, the same seed draws the same combinations
+    :rtype: list
+    """
+    combinations = grid(space)
+    return random.Random(seed).sample(combinations, min(n, len(combinations)))
+
+
+def combination_key(params: dict) -> str:
+    """
+    Stable key of settings values, tuples and lists of the same values give the same key
+    """
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def run_combination(candles_path: str, markets: list, balances: dict, settings: dict, params: dict,
+                    spread: float, fee: float, window: int) -> dict:
+    """
+    Backtest one combination of settings, runs in a pool worker
+
+    :return: results row
+    :rtype: dict
+    """
+    start = timer()
+    row = {'key': combination_key(params), 'params': json.dumps(params, sort_keys=True)}
+    try:
+        settings = dict(settings, **params)
+        store = CandleStore(candles_path)
+        # Files are checked by the sweep before workers start
+        ohlcv_data = {m: {tf: store.read(m, tf, check=False) for tf in settings['TIME_FRAMES']} for m in markets}
+        bt = Backtest(ohlcv_data, balances, settings, spread=spread, fee=fee, window=window,
+                      logger=logging.getLogger(__name__))
+        row.update(Backtest.summary(bt.run()))
+        row.update({'cycles': bt.runner.run_step, 'fills': len(bt.fills), 'error': ''})
+    except Exception as e:
+        row['error'] = repr(e)
+    row['seconds'] = timer() - start
+    return row
+
+
+class Sweep:
+
+    def __init__(self, candles_path: str, markets: list, balances: dict, settings: dict, results_path: str,
+                 workers: int = None, spread: float = 0.001, fee: float = 0.001, window: int = 200) -> None:
+        """
+        :param candles_path: CandleStore directory with candles of markets
+        :param markets: tradable markets to backtest
+        :param balances: initial amounts {asset: amount}
+        :param settings: base settings, combinations override them
+        :param results_path: results csv, appended and read on resume
+        :param workers: worker processes, None for all cores, 1 to backtest in this process
+        :param spread: relative bid-ask spread of simulated tickers
+        :param fee: relative trading fee
+        :param window: candles known to the optimizer at every cycle
+        """
+        self.candles_path = candles_path
+        self.markets = list(markets)
+        self.balances = dict(balances)
+        self.settings = dict(settings)
+        self.results_path = results_path
+        self.workers = workers or os.cpu_count() or 1
+        self.spread = spread
+        self.fee = fee
+        self.window = window
+
+    def results(self) -> pd.DataFrame:
+        """
+        Results of finished combinations indexed by key
+        """
+        if not os.path.exists(self.results_path) or os.path.getsize(self.results_path) == 0:
+            return pd.DataFrame(columns=COLUMNS).set_index('key')
+        results = pd.read_csv(self.results_path, keep_default_na=False).drop_duplicates('key', keep='last') \
+            .set_index('key')
+        # Metrics of failed rows are empty and would turn their columns into strings
+        for x in METRICS:
+            results[x] = pd.to_numeric(results[x], errors='coerce')
+        return results
+
+    def _append(self, row: dict) -> None:
+        header = not os.path.exists(self.results_path) or os.path.getsize(self.results_path) == 0
+        pd.DataFrame([row], columns=COLUMNS).to_csv(self.results_path, mode='a', header=header, index=False)
+
+    def run(self, combinations: list) -> pd.DataFrame:
+        """
+        Backtest combinations missing in results or failed in previous runs
+
+        :param combinations: settings values from grid or random_search
+        :return: results of all finished combinations
+        :rtype: pd.DataFrame
+        """
+        results = self.results()
+        done = set(results.index[results['error'] == ''])
+        pending = {combination_key(x): x for x in combinations}
+        pending = [x for k, x in pending.items() if k not in done]
+        if len(pending) > 0:
+            time_frames = {tf for x in pending for tf in x.get('TIME_FRAMES', self.settings['TIME_FRAMES'])}
+            store = CandleStore(self.candles_path)
+            for m in self.markets:
+                for tf in time_frames:
+                    store.check(m, tf)
+        jobs = [(self.candles_path, self.markets, self.balances, self.settings, x, self.spread, self.fee,
+                 self.window) for x in pending]
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for future in as_completed([executor.submit(run_combination, *x) for x in jobs]):
+                    self._append(future.result())
+        else:
+            for x in jobs:
+                self._append(run_combination(*x))
+        return self.results()
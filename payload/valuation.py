@@ -0,0 +1,72 @@
+"""
+Vectorized portfolio valuation
+
+Keeps portfolio balances and market prices as numpy vectors aligned by asset and by market.
+Conversion routes are turned into an exponents matrix once per portfolio, so prices
+of all assets in quote are exp(exponents @ log(market prices)) and base values, total
+and weights of the whole portfolio are counted in one pass.
+
+ """
+import numpy as np
+
+from payload.routes import RouteIndex
+
+
+class Valuation:
+
+    def __init__(self, routes: RouteIndex, assets: list, quote: str) -> None:
+        """
+        :param routes: conversion routes over priced markets
+        :param assets: portfolio assets
+        :param quote: asset to value portfolio in
+        """
+        self.assets = list(assets)
+        self.quote = quote
+        self.markets = routes.markets
+        self.index = {x: i for i, x in enumerate(self.assets)}
+        market_index = {x: i for i, x in enumerate(self.markets)}
+        # Route legs directions as powers of market prices, assets without route are never priced
+        self.exponents = np.zeros((len(self.assets), len(self.markets)))
+        self.routed = np.zeros(len(self.assets), dtype=bool)
+        quote_routes = routes.routes_to(quote)
+        for i, a in enumerate(self.assets):
+            if a in quote_routes:
+                self.routed[i] = True
+                for market, direction in quote_routes[a]:
+                    self.exponents[i, market_index[market]] += direction
+        self._legs = self.exponents != 0
+        self.amounts = np.zeros(len(self.assets))
+        self.prices = np.full(len(self.assets), np.nan)
+        self.base_values = np.zeros(len(self.assets))
+        self.total = 0.0
+        self.weights = np.zeros(len(self.assets))
+
+    def update(self, balances: dict, market_prices: np.ndarray) -> None:
+        """
+        Count base values, total and weights of all assets
+
+        :param balances: exchange balances {asset: {'all': amount}}
+        :param market_prices: prices aligned with self.markets, NaN or 0 for unknown ones
+        """
+        self.amounts = np.fromiter((balances.get(a, dict()).get('all', 0) for a in self.assets),
+                                   dtype=np.float64, count=len(self.assets))
+        market_prices = np.asarray(market_prices, dtype=np.float64)
+        known = np.isfinite(market_prices) & (market_prices > 0)
+        log_prices = np.log(np.where(known, market_prices, 1))
+        priced = self.routed & ~(self._legs @ ~known)
+        self.prices = np.where(priced, np.exp(self.exponents @ log_prices), np.nan)
+        self.base_values = np.where(priced, self.amounts * np.nan_to_num(self.prices), 0)
+        self.total = float(self.base_values.sum())
+        self.weights = self.base_values / self.total if self.total > 0 else np.zeros(len(self.assets))
+
+    def base_value(self, asset: str) -> float:
+        """
+        Last counted asset value in quote, 0 for unknown asset
+        """
+        return float(self.base_values[self.index[asset]]) if asset in self.index else 0.0
+
+    def weights_dict(self) -> dict:
+        """
+        Last counted weights as {asset: weight}
+        """
+        return dict(zip(self.assets, self.weights.tolist()))
@@ -8,13 +8,12 @@ from yat.settingsWatcher import settingsWatcher
 from payload.runner import Runner
 from yat import logger
 
-watcher = settingsWatcher()
-settings = watcher.settings
-
-logger = logger.setup_custom_logger('Rebalancer', log_level=DEBUG)
-
 
 if __name__ == '__main__':
+    # Spawned optimizer workers import this module again, startup runs in the main process only
+    watcher = settingsWatcher()
+    settings = watcher.settings
+    logger = logger.setup_custom_logger('Rebalancer', log_level=DEBUG)
     start = time.time()
     try:
         market1 = Runner(logger=logger, watcher=watcher, **settings)
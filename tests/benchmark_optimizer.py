@@ -0,0 +1,57 @@
+"""
+Optimizer engines benchmark
+
+Solves the same efficient_return and efficient_risk problems with PyPortfolioOpt scipy solver
+and the QP engine on random portfolios of growing size, prints solve times and how
+far QP solutions are from scipy ones.
+
+    python -m tests.benchmark_optimizer
+
+ """
+import numpy
+import pandas as pd
+from pypfopt import risk_models
+from pypfopt import expected_returns
+from pypfopt.efficient_frontier import EfficientFrontier
+from timeit import default_timer as timer
+
+from payload.qpsolver import QPFrontier
+
+
+def problem(assets: int, periods: int = 200, seed: int = 0) -> tuple:
+    numpy.random.seed(seed)
+    prices = pd.DataFrame(100 * numpy.exp(numpy.cumsum(numpy.random.normal(0.001, 0.01, (periods, assets)), axis=0)))
+    return expected_returns.mean_historical_return(prices, frequency=periods), \
+        risk_models.sample_cov(prices, frequency=periods)
+
+
+def solve(model, mu, cov, bounds, objective: str, target: float) -> tuple:
+    ef = model(mu, cov, weight_bounds=bounds)
+    start = timer()
+    getattr(ef, objective)(target)
+    return timer() - start, ef
+
+
+def main():
+    print("{:>6} {:>16} {:>7} {:>10} {:>10} {:>12} {:>12}".format(
+        'assets', 'objective', 'target', 'scipy, ms', 'qp, ms', 'objective,%', 'max |dw|'))
+    for assets in (10, 30, 60, 100):
+        mu, cov = problem(assets)
+        bounds = (0, min(1.0, 5 / assets))
+        highest = numpy.sort(mu.values)[::-1][:assets // 5 or 1].mean()
+        for objective, target in (('efficient_return', float(0.5 * highest)),
+                                  ('efficient_risk', 0.05)):
+            scipy_time, ef = solve(EfficientFrontier, mu, cov, bounds, objective, target)
+            qp_time, qp = solve(QPFrontier, mu, cov, bounds, objective, target)
+            # Variance for target return, Sharpe ratio for target risk
+            if objective == 'efficient_return':
+                expected, actual = ef.weights @ cov.values @ ef.weights, qp.weights @ cov.values @ qp.weights
+            else:
+                expected, actual = ef.portfolio_performance()[2], qp.portfolio_performance()[2]
+            print("{:>6} {:>16} {:>7.3f} {:>10.1f} {:>10.1f} {:>12.3f} {:>12.4f}".format(
+                assets, objective, target, 1000 * scipy_time, 1000 * qp_time,
+                100 * (actual / expected - 1), numpy.abs(ef.weights - qp.weights).max()))
+
+
+if __name__ == '__main__':
+    main()
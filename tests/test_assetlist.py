@@ -53,6 +53,15 @@ class Test_build_portfolio_assets_markets(TestStaticAssetList):
                              self.al.portfolio)
 
 
+class Test_build_watched_markets(TestStaticAssetList):
+    def test_build_watched_markets(self):
+        self.al = StaticAssetList.StaticAssetList(logger, TestExchange, ['BTC', 'ETH', 'BNB', 'USDT', 'AE'],
+                                                  black_list, weight_bounds)
+        self.al.build_portfolio_assets_markets('USDT')
+        w_markets = self.al.build_watched_markets()
+        self.assertListEqual(sorted(w_markets), ['AE/BTC', 'BNB/USDT', 'BTC/USDT', 'ETH/USDT'])
+
+
 class Test_refresh_assetlist(TestStaticAssetList):
     def test_refresh_assetlist(self):
         self.al.refresh_assetlist()
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy
+
+from payload.backtest import Backtest, SimulatedExchange, align_candles
+
+random_state = numpy.random.RandomState(0)
+
+
+def candles(n: int, drift: float, volatility: float = 0.01) -> list:
+    closes = 100 * numpy.exp(numpy.cumsum(random_state.normal(drift, volatility, n)))
+    return [[1559818800000 + i * 3600000, x, x * 1.002, x * 0.998, x, 1.0] for i, x in enumerate(closes)]
+
+
+ohlcv_data = {f'{x}/USDT': {'1h': candles(400, 0.001 * i)} for i, x in enumerate('ABC')}
+settings = {'DRY_RUN':               False,
+            'LOOP_INTERVAL':         (3600, 3600 * 3),
+            'MARKET_ONLY':           False,
+            'REBALANCING_PRECISION': 0.01,
+            'TARGET_RETURN':         None,
+            'TARGET_RISK':           0.5,
+            'TIME_FRAMES':           ['1h'],
+            'PORTFOLIO_BASE_ASSET':  'USDT',
+            'PORTFOLIO_WHITE_LIST':  ['A', 'B', 'C', 'USDT'],
+            'PORTFOLIO_BLACK_LIST':  [],
+            'WEIGHT_BOUNDS':         (0, 0.6),
+            'OPTIMIZER_ENGINE':      'qp'}
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.bt = Backtest(ohlcv_data, {'USDT': 10000.0}, settings, window=100)
+
+
+class Test_align_candles(unittest.TestCase):
+    def test_align_candles_gaps(self):
+        data = {'A/USDT': {'1h': [[0, 1, 2, 0.5, 1, 1], [7200000, 3, 4, 2, 3, 1]]},
+                'B/USDT': {'1h': [[3600000, 5, 6, 4, 5, 1], [7200000, 6, 7, 5, 6, 1]]}}
+        timestamps, lows, highs, closes = align_candles(data, ['A/USDT', 'B/USDT'], '1h')
+        numpy.testing.assert_array_equal(timestamps, [0, 3600000, 7200000])
+        numpy.testing.assert_array_equal(closes, [[1, numpy.nan], [1, 5], [3, 6]])
+        numpy.testing.assert_array_equal(lows, [[0.5, numpy.nan], [1, 4], [2, 5]])
+        numpy.testing.assert_array_equal(highs, [[2, numpy.nan], [1, 6], [4, 7]])
+
+
+class Test_SimulatedExchange(unittest.TestCase):
+    def test_fill(self):
+        exchange = SimulatedExchange(['A/USDT', 'B/USDT'], {'USDT': 100.0, 'B': 2.0}, spread=0.02, fee=0.01)
+        exchange.set_prices(numpy.array([10.0, 20.0]))
+        self.assertAlmostEqual(exchange.all_tickers['A/USDT']['bid'], 9.9)
+        self.assertAlmostEqual(exchange.all_tickers['B/USDT']['ask'], 20.2)
+        exchange.place_multiple_orders([
+            {'symbol': 'A/USDT', 'order_type': 'LIMIT', 'side': 'BUY', 'amount': 20.0, 'price': 9.9},
+            {'symbol': 'B/USDT', 'order_type': 'LIMIT', 'side': 'SELL', 'amount': 1.0, 'price': 20.2}])
+        # Buy is limited by quote balance, sell price is not reached
+        fills = exchange.fill(numpy.array([9.8, 19.0]), numpy.array([10.5, 20.1]))
+        self.assertEqual(len(fills), 1)
+        self.assertAlmostEqual(exchange.balances['USDT']['all'], 0)
+        self.assertAlmostEqual(exchange.balances['A']['all'], 100 / 9.9 * 0.99)
+        self.assertEqual(exchange.balances['B']['all'], 2.0)
+        orders = exchange.open_orders()
+        self.assertAlmostEqual(orders['1']['remaining'], 20 - 100 / 9.9)
+        self.assertEqual(orders['2']['remaining'], 1.0)
+        # Open sell fills later, canceled buy does not
+        exchange.cancel_processed_orders(['1'])
+        fills = exchange.fill(numpy.array([9.0, 20.0]), numpy.array([10.0, 20.5]))
+        self.assertListEqual(fills, [('B/USDT', 'SELL', 1.0, 20.2)])
+        self.assertDictEqual(exchange.open_orders(), dict())
+
+
+class Test_run(TestBacktest):
+    def test_run(self):
+        history = self.bt.run()
+        self.assertListEqual(list(history.columns), ['value', 'turnover', 'fees'])
+        self.assertEqual(len(history), 400 - 99)
+        self.assertAlmostEqual(history['value'].iloc[0], 10000.0)
+        self.assertTrue((history['value'] > 0).all())
+        self.assertGreater(len(self.bt.quotes), 0)
+        self.assertGreater(len(self.bt.fills), 0)
+        self.assertAlmostEqual(history['fees'].sum(), history['turnover'].sum() * 0.001)
+        # Runner quotes are passive: bid for BUY and ask for SELL
+        for _, x in self.bt.quotes:
+            self.assertIn(x['side'], ('BUY', 'SELL'))
+        self.assertEqual(self.bt.interval, 2)
+
+    def test_value_matches_balances(self):
+        history = self.bt.run()
+        prices = {a: self.bt.closes[-1, self.bt.exchange.symbols.index(f'{a}/USDT')] for a in 'ABC'}
+        prices['USDT'] = 1.0
+        value = sum(y['all'] * prices[x] for x, y in self.bt.exchange.balances.items())
+        # Fills after the last cycle are not replayed
+        self.assertAlmostEqual(history['value'].iloc[-1], value, delta=1e-6 * value)
+
+    def test_qp_engine_by_default(self):
+        bt = Backtest(ohlcv_data, {'USDT': 10000.0}, {x: y for x, y in settings.items() if x != 'OPTIMIZER_ENGINE'})
+        self.assertEqual(bt.runner.portfolio_opt.engine, 'qp')
+        self.assertEqual(bt.runner.portfolio_opt.cache_size, 0)
+
+    def test_summary(self):
+        summary = Backtest.summary(self.bt.run())
+        self.assertSetEqual(set(summary.keys()), {'return', 'max_drawdown', 'turnover', 'fees'})
+        self.assertGreaterEqual(summary['max_drawdown'], 0)
+        self.assertGreater(summary['turnover'], 0)
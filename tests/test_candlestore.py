@@ -0,0 +1,83 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+
+from yat.candlestore import CandleStore, ROW_BYTES
+
+hour = 3600000
+
+
+def make_candles(start: int, count: int, price: float = 100.0):
+    return [[start + i * hour, price + i, price + i + 1, price + i - 1, price + i, 10.0] for i in range(count)]
+
+
+class TestCandleStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cs = CandleStore(self.tmp.name, window=50)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+
+class Test_append(TestCandleStore):
+    def test_append_and_tail(self):
+        candles = make_candles(1560974400000, 30)
+        self.assertEqual(self.cs.append('BTC/USDT', '1h', candles), 30)
+        self.assertListEqual(self.cs.tail('BTC/USDT', '1h', 10), candles[-10:])
+        self.assertEqual(self.cs.last_timestamp('BTC/USDT', '1h'), candles[-1][0])
+        self.assertIsInstance(self.cs.tail('BTC/USDT', '1h', 1)[0][0], int)
+
+    def test_append_replaces_forming_candle(self):
+        candles = make_candles(1560974400000, 30)
+        self.cs.append('BTC/USDT', '1h', candles)
+        update = make_candles(candles[-1][0], 2, price=500.0)
+        self.assertEqual(self.cs.append('BTC/USDT', '1h', candles[:5] + update), 1)
+        stored = self.cs.tail('BTC/USDT', '1h', 100)
+        self.assertEqual(len(stored), 31)
+        self.assertListEqual(stored[-2:], update)
+
+    def test_append_compacts(self):
+        self.cs.append('BTC/USDT', '1h', make_candles(1560974400000, 101))
+        self.assertEqual(len(self.cs.read('BTC/USDT', '1h')), 50)
+        self.assertEqual(self.cs.last_timestamp('BTC/USDT', '1h'), 1560974400000 + 100 * hour)
+
+    def test_read_missing(self):
+        self.assertEqual(len(self.cs.read('ETH/USDT', '1h')), 0)
+        self.assertIsNone(self.cs.last_timestamp('ETH/USDT', '1h'))
+
+
+class Test_check(TestCandleStore):
+    def test_check_truncated_row(self):
+        self.cs.append('BTC/USDT', '1h', make_candles(1560974400000, 20))
+        fn = self.cs.filename('BTC/USDT', '1h')
+        with open(fn, 'ab') as f:
+            f.write(b'\x00' * 7)
+        self.assertFalse(self.cs.check('BTC/USDT', '1h'))
+        self.assertEqual(os.path.getsize(fn), 20 * ROW_BYTES)
+        self.assertTrue(self.cs.check('BTC/USDT', '1h'))
+
+    def test_check_unordered_rows(self):
+        candles = make_candles(1560974400000, 20)
+        candles[12][0] = candles[3][0]
+        fn = self.cs.filename('BTC/USDT', '1h')
+        with open(fn, 'wb') as f:
+            f.write(np.asarray(candles, dtype=np.float64).tobytes())
+        fresh = CandleStore(self.tmp.name, window=50)
+        self.assertEqual(len(fresh.read('BTC/USDT', '1h')), 12)
+
+    def test_read_without_check(self):
+        candles = make_candles(1560974400000, 20)
+        candles[12][0] = candles[3][0]
+        fn = self.cs.filename('BTC/USDT', '1h')
+        with open(fn, 'wb') as f:
+            f.write(np.asarray(candles, dtype=np.float64).tobytes())
+        fresh = CandleStore(self.tmp.name, window=50)
+        self.assertEqual(len(fresh.read('BTC/USDT', '1h', check=False)), 20)
+        self.assertEqual(os.path.getsize(fn), 20 * ROW_BYTES)
+
+
+if __name__ == '__main__':
+    unittest.main()
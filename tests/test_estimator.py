@@ -0,0 +1,79 @@
+import unittest
+
+import numpy
+import pandas as pd
+from pypfopt import risk_models
+from pypfopt import expected_returns
+
+from payload.estimator import RollingEstimator
+
+# Random walk prices of 5 assets for 300 hours
+numpy.random.seed(7)
+prices = pd.DataFrame(100 * numpy.exp(numpy.cumsum(numpy.random.normal(0, 0.01, (300, 5)), axis=0)),
+                      index=pd.date_range('2019-06-01', periods=300, freq='h', name='date'),
+                      columns=['BTC', 'ETH', 'BNB', 'XRP', 'USDT'])
+
+
+def window(end: int, length: int = 200, forming: float = 1.0):
+    data = prices.iloc[end - length:end].copy()
+    data.iloc[-1] *= forming
+    return data
+
+
+class TestRollingEstimator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.re = RollingEstimator()
+
+    def assertMatchesBatch(self, data):
+        mu = expected_returns.mean_historical_return(data, frequency=200)
+        s = risk_models.sample_cov(data, frequency=200)
+        numpy.testing.assert_allclose(self.re.mean_returns(200).values, mu.values, rtol=1e-9, atol=1e-12)
+        numpy.testing.assert_allclose(self.re.covariance(200).values, s.values, rtol=1e-9, atol=1e-12)
+        self.assertListEqual(list(self.re.covariance(200).columns), list(data.columns))
+
+
+class Test_update(TestRollingEstimator):
+    def test_update_forming_bar(self):
+        self.assertFalse(self.re.update(window(200)))
+        self.assertMatchesBatch(window(200))
+        # Same bars with changed forming candle
+        self.assertTrue(self.re.update(window(200, forming=1.01)))
+        self.assertMatchesBatch(window(200, forming=1.01))
+
+    def test_update_new_bars(self):
+        self.re.update(window(200))
+        for end in (201, 202, 205, 206):
+            self.assertTrue(self.re.update(window(end)))
+            self.assertMatchesBatch(window(end))
+        self.assertEqual(self.re.rebuilds, 1)
+
+    def test_update_rebuild(self):
+        self.re.update(window(100, 100))
+        # Windows do not overlap
+        self.assertFalse(self.re.update(window(300, 100)))
+        self.assertMatchesBatch(window(300, 100))
+        # Other window length
+        self.assertFalse(self.re.update(window(300)))
+        self.assertMatchesBatch(window(300))
+        # Old bars changed
+        self.assertFalse(self.re.update(window(300) * 1.01))
+        self.assertEqual(self.re.rebuilds, 4)
+
+    def test_update_long_run(self):
+        self.re.update(window(100, 20))
+        for end in range(101, 300):
+            self.re.update(window(end, 20))
+        self.assertMatchesBatch(window(299, 20))
+        # State is recounted once per window length
+        self.assertEqual(self.re.rebuilds, 11)
+
+    def test_update_missing_prices(self):
+        data = window(200)
+        data.iloc[:5, 2] = numpy.nan
+        self.assertFalse(self.re.update(data))
+        self.assertMatchesBatch(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
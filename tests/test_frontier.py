@@ -0,0 +1,66 @@
+import unittest
+
+import numpy
+
+from payload.frontier import Frontier
+
+tickers = ['BTC', 'ETH', 'USDT']
+# Grid from the safest to the most profitable portfolio, unordered on purpose
+returns = [0.3, 0.1, 0.2, 0.4]
+risks = [0.3, 0.05, 0.1, 0.5]
+weights = [[0.3, 0.6, 0.1], [0.0, 0.2, 0.8], [0.1, 0.4, 0.5], [0.5, 0.5, 0.0]]
+
+
+class TestFrontier(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.f = Frontier(tickers, returns, risks, weights, risk_free_rate=0.0)
+
+
+class Test_for_return(TestFrontier):
+    def test_for_return_grid_point(self):
+        ret, risk, w = self.f.for_return(0.2)
+        self.assertEqual(risk, 0.1)
+        numpy.testing.assert_allclose(w, [0.1, 0.4, 0.5])
+
+    def test_for_return_interpolated(self):
+        ret, risk, w = self.f.for_return(0.25)
+        self.assertAlmostEqual(risk, 0.2)
+        numpy.testing.assert_allclose(w, [0.2, 0.5, 0.3])
+        self.assertAlmostEqual(w.sum(), 1)
+
+    def test_for_return_out_of_grid(self):
+        self.assertIsNone(self.f.for_return(0.05))
+        self.assertIsNone(self.f.for_return(0.5))
+
+
+class Test_for_risk(TestFrontier):
+    def test_for_risk_max_sharpe(self):
+        # Sharpe falls along the grid, the safest portfolio is the best
+        ret, risk, w = self.f.for_risk(0.4)
+        self.assertEqual(ret, 0.1)
+
+    def test_for_risk_segment(self):
+        f = Frontier(tickers, returns, risks, weights, risk_free_rate=0.18)
+        ret, risk, w = f.for_risk(0.2)
+        self.assertAlmostEqual(risk, 0.2)
+        self.assertAlmostEqual(ret, 0.25)
+
+    def test_for_risk_too_safe(self):
+        self.assertIsNone(self.f.for_risk(0.01))
+
+    def test_for_risk_riskless(self):
+        # All in base asset has no risk and no return
+        with numpy.errstate(all='raise'):
+            f = Frontier(tickers, [0.0] + returns, [0.0] + risks, [[0.0, 0.0, 1.0]] + weights, risk_free_rate=0.02)
+            self.assertEqual(f.sharpe[0], -numpy.inf)
+            ret, risk, w = f.for_risk(0.01)
+        self.assertAlmostEqual(risk, 0.01)
+        self.assertAlmostEqual(ret, 0.02)
+
+    def test_weights_dict(self):
+        self.assertDictEqual(self.f.weights_dict(self.f.weights[0]), {'BTC': 0.0, 'ETH': 0.2, 'USDT': 0.8})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 from unittest import TestCase
 from yat.influx import Influx
-import settings
+import _settings as settings
 
 order1 = {'id': '441793725', 'timestamp': 1560791405253,
           'datetime': '2019-06-17T17:10:05.253Z', 'lastTradeTimestamp': None,
@@ -0,0 +1,90 @@
+import unittest
+import tempfile
+import pickle
+from unittest.mock import patch
+
+import ccxt
+
+from binance import marketcache
+from binance.marketcache import load_markets
+
+markets = {'ETH/BTC': {'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC', 'active': True}}
+
+
+class CountingFetch:
+    """
+    Loads markets into exchange like load_markets does and counts calls
+    """
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.exchange.markets = dict(markets)
+        self.exchange.symbols = list(markets.keys())
+        return self.exchange.markets
+
+
+class TestMarketCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        marketcache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.exchange = ccxt.binance()
+        self.fetch = CountingFetch(self.exchange)
+
+    def tearDown(self) -> None:
+        marketcache.clear()
+        self.tmp.cleanup()
+
+
+class Test_load_markets(TestMarketCache):
+    def test_load_markets_memory(self):
+        load_markets(self.exchange, self.fetch)
+        other = ccxt.binance()
+        loaded, source = load_markets(other, CountingFetch(other))
+        self.assertEqual(source, 'memory')
+        self.assertEqual(self.fetch.calls, 1)
+        self.assertDictEqual(loaded, markets)
+        self.assertListEqual(other.symbols, ['ETH/BTC'])
+
+    def test_load_markets_disk(self):
+        load_markets(self.exchange, self.fetch, path=self.tmp.name)
+        marketcache.clear()
+        other = ccxt.binance()
+        fetch = CountingFetch(other)
+        loaded, source = load_markets(other, fetch, path=self.tmp.name)
+        self.assertEqual(source, 'disk')
+        self.assertEqual(fetch.calls, 0)
+        self.assertDictEqual(other.markets, markets)
+
+    def test_load_markets_expired(self):
+        load_markets(self.exchange, self.fetch, path=self.tmp.name)
+        with patch.object(marketcache, 'time', return_value=marketcache.time() + 100):
+            _, source = load_markets(self.exchange, self.fetch, path=self.tmp.name, ttl=50)
+        self.assertEqual(source, 'exchange')
+        self.assertEqual(self.fetch.calls, 2)
+
+    def test_load_markets_other_ccxt_version(self):
+        load_markets(self.exchange, self.fetch, path=self.tmp.name)
+        marketcache.clear()
+        fn = marketcache.filename(self.exchange, self.tmp.name)
+        with open(fn, 'rb') as f:
+            entry = pickle.load(f)
+        entry['version'] = (marketcache.CACHE_VERSION, '1.0.0', 'binance')
+        with open(fn, 'wb') as f:
+            pickle.dump(entry, f)
+        _, source = load_markets(self.exchange, self.fetch, path=self.tmp.name)
+        self.assertEqual(source, 'exchange')
+
+    def test_load_markets_broken_file(self):
+        with open(marketcache.filename(self.exchange, self.tmp.name), 'wb') as f:
+            f.write(b'broken')
+        _, source = load_markets(self.exchange, self.fetch, path=self.tmp.name)
+        self.assertEqual(source, 'exchange')
+
+
+if __name__ == '__main__':
+    unittest.main()
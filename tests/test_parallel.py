@@ -0,0 +1,82 @@
+import unittest
+
+import numpy
+
+from payload.parallel import ParallelOpt, SharedPanel
+from payload.portfolioOpt import PortfolioOpt
+
+random_state = numpy.random.RandomState(0)
+
+
+def candles(step: int, n: int, drift: float) -> list:
+    closes = 100 * numpy.exp(numpy.cumsum(random_state.normal(drift, 0.01, n)))
+    return [[1559818800000 + i * step, x, x, x, x, 1.0] for i, x in enumerate(closes)]
+
+
+ohlcv_data = {f'{x}/USDT': {'1h': candles(3600000, 200, 0.001 * i), '4h': candles(14400000, 200, 0.001 * i)}
+              for i, x in enumerate('ABCDEF')}
+objectives = [('min_volatility', None), ('max_sharpe', None), ('efficient_return', 0.3, 2)]
+weight_bounds = (0, 0.5)
+
+
+class TestParallelOpt(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.po = ParallelOpt(workers=1)
+
+    def tearDown(self) -> None:
+        self.po.close()
+
+
+class Test_SharedPanel(unittest.TestCase):
+    def test_shared_panel(self):
+        index, columns, values = PortfolioOpt().build_pricing_panel(ohlcv_data, 'USDT', '1h')
+        panel = SharedPanel(index, columns, values)
+        try:
+            expected = PortfolioOpt().build_pricing_data_from_ohlcv(ohlcv_data, 'USDT', '1h')
+            actual = SharedPanel.read(panel.spec)
+            self.assertTrue(actual.equals(expected))
+            self.assertTrue(actual.index.equals(expected.index))
+        finally:
+            panel.close()
+
+
+class Test_generate_report(TestParallelOpt):
+    def test_generate_report_combinations(self):
+        weights, p_list = self.po.generate_report(ohlcv_data, ['1h', '4h'], weight_bounds, 'USDT', 200, 200, objectives)
+        self.assertEqual(len(self.po.results), 6)
+        self.assertListEqual(self.po.errors, list())
+        self.assertListEqual(list(weights.keys()), ['A', 'B', 'C', 'D', 'E', 'F', 'USDT'])
+        self.assertAlmostEqual(sum(weights.values()), 1, delta=0.05)
+        self.assertTrue(all(weight_bounds[0] <= x <= weight_bounds[1] + 0.01 for x in weights.values()))
+        self.assertEqual(len(p_list), 3 + 6)
+
+    def test_blend(self):
+        results = [{'weights': {'A': 1.0, 'B': 0.0}, 'blend': 1.0},
+                   {'weights': {'B': 1.0}, 'blend': 3.0}]
+        self.assertDictEqual(self.po.blend(results, ['A', 'B', 'C']), {'A': 0.25, 'B': 0.75, 'C': 0.0})
+
+    def test_generate_report_same_in_workers(self):
+        expected, _ = self.po.generate_report(ohlcv_data, ['1h', '4h'], weight_bounds, 'USDT', 200, 200, objectives)
+        po = ParallelOpt(workers=2)
+        try:
+            weights, _ = po.generate_report(ohlcv_data, ['1h', '4h'], weight_bounds, 'USDT', 200, 200, objectives)
+        finally:
+            po.close()
+        self.assertDictEqual(weights, expected)
+
+    def test_generate_report_hrp(self):
+        po = ParallelOpt(workers=1, engine='hrp')
+        weights, p_list = po.generate_report(ohlcv_data, ['1h', '4h'], weight_bounds, 'USDT', 200, 200, objectives)
+        self.assertListEqual([(x['time_frame'], x['objective'], x['blend']) for x in po.results],
+                             [('1h', 'hrp', 4.0), ('4h', 'hrp', 4.0)])
+        self.assertEqual(len(p_list), 3 + 2)
+        self.assertAlmostEqual(sum(weights.values()), 1, delta=0.05)
+
+    def test_generate_report_errors(self):
+        weights, p_list = self.po.generate_report(ohlcv_data, ['1h'], weight_bounds, 'USDT', 200, 200,
+                                                  [('efficient_return', 'high'), ('min_volatility', None)])
+        self.assertEqual(len(self.po.results), 1)
+        self.assertEqual(len(self.po.errors), 1)
+        self.assertRaises(ValueError, self.po.generate_report, ohlcv_data, ['1h'], weight_bounds, 'USDT', 200, 200,
+                          [('max_return', None)])
@@ -1,4 +1,8 @@
 import unittest
+import os
+import tempfile
+import numpy
+import pandas as pd
 from payload.portfolioOpt import PortfolioOpt
 
 pricing_data_2 = {'BTC/USDT': {'1h': [[1559034000000, 8710.74, 8743.85, 8692.54, 8711.43, 1052.468837],
@@ -234,6 +238,11 @@ class Test_make_weight_bounds(TestPortfolioOpt):
 
 
 class Test_forward_looking_return(TestPortfolioOpt):
+    @ staticmethod
+    def weighted_return(pricing_data, begin, end, weights):
+        # Weights depend on the solver version, the return of the same weights does not
+        return sum(w * (pricing_data.loc[end, x] / pricing_data.loc[begin, x] - 1) for x, w in weights.items())
+
     def test_forward_looking_return(self):
         d_c = self.po.build_pricing_data_from_ohlcv(pricing_data, base_asset, '1h')
         r_b, r_e, e_f = self.po.generate_analysis_model(d_c, weight_bounds, frequency, frequency)
@@ -243,9 +252,9 @@ class Test_forward_looking_return(TestPortfolioOpt):
             _omw = e_f.efficient_risk(target_risk=target_risk)
         w_c = e_f.clean_weights()
         a, b, c = self.po.forward_looking_return(d_c, r_b, r_e, w_c)
-        self.assertEqual(a, 'Thu Jun  6 14:00:00 2019')
-        self.assertEqual(b, 'Thu Jun  6 18:00:00 2019')
-        self.assertEqual(c, 0.01827667022913032)
+        self.assertEqual(a, pd.Timestamp('2019-06-06 11:00:00'))
+        self.assertEqual(b, pd.Timestamp('2019-06-06 15:00:00'))
+        self.assertAlmostEqual(c, self.weighted_return(d_c, a, b, w_c))
 
     def test_forward_looking_return_pd3(self):
         d_c = self.po.build_pricing_data_from_ohlcv(pricing_data_3, 'USDT', '1h')
@@ -253,9 +262,9 @@ class Test_forward_looking_return(TestPortfolioOpt):
         _oer = e_f.efficient_return(target_return=0.5)
         w_c = e_f.clean_weights()
         a, b, c = self.po.forward_looking_return(d_c, r_b, r_e, w_c)
-        self.assertEqual(a, 'Wed Jun 19 23:00:00 2019')
-        self.assertEqual(b, 'Thu Jun 20 18:00:00 2019')
-        self.assertEqual(c, 0.01929084626691416)
+        self.assertEqual(a, pd.Timestamp('2019-06-19 20:00:00'))
+        self.assertEqual(b, pd.Timestamp('2019-06-20 15:00:00'))
+        self.assertAlmostEqual(c, self.weighted_return(d_c, a, b, w_c))
 
 
 class Test_generate_analysis_model(TestPortfolioOpt):
@@ -304,5 +313,223 @@ class Test_build_pricing_data_from_ohlcv(TestPortfolioOpt):
         self.assertEqual(dc['ADA'].sum(), 20)
 
 
+class Test_build_pricing_panel(TestPortfolioOpt):
+    def test_build_pricing_panel_index(self):
+        index, columns, values = self.po.build_pricing_panel(pricing_data_3, 'USDT', '1h')
+        self.assertEqual(index.dtype, numpy.dtype('datetime64[ms]'))
+        self.assertEqual(index[0], numpy.datetime64(1560974400000, 'ms'))
+        self.assertTupleEqual(values.shape, (20, 4))
+        self.assertListEqual(columns, ['BTC', 'ETH', 'BNB', 'USDT'])
+
+    def test_build_pricing_panel_union(self):
+        data = {'ETH/USDT': {'1h': pricing_data_3['ETH/USDT']['1h'][2:]},
+                'BTC/USDT': {'1h': pricing_data_3['BTC/USDT']['1h'][:-2]}}
+        index, columns, values = self.po.build_pricing_panel(data, 'USDT', '1h')
+        self.assertEqual(len(index), 20)
+        # ETH has no price before its first candle, BTC last price is carried forward
+        self.assertTrue(numpy.isnan(values[:2, 0]).all())
+        self.assertTrue((values[-3:, 1] == pricing_data_3['BTC/USDT']['1h'][-3][4]).all())
+
+    def test_build_pricing_panel_gaps(self):
+        candles = pricing_data_3['BTC/USDT']['1h']
+        data = {'BTC/USDT': {'1h': candles[:5] + candles[8:]}}
+        index, _, values = self.po.build_pricing_panel(data, 'USDT', '1h')
+        self.assertEqual(len(index), 20)
+        self.assertTrue((numpy.diff(index) == numpy.timedelta64(1, 'h')).all())
+        self.assertEqual(self.po.pricing_gaps, 3)
+        self.assertTrue((values[5:8, 0] == candles[4][4]).all())
+
+    def test_build_pricing_panel_btc_cross(self):
+        data = {'ETH/BTC': {'1h': [[0, 0, 0, 0, 0.02, 0]]}, 'BTC/XRP': {'1h': [[0, 0, 0, 0, 40000.0, 0]]},
+                'BTC/USDT': {'1h': [[0, 0, 0, 0, 10000.0, 0]]}}
+        _, columns, values = self.po.build_pricing_panel(data, 'USDT', '1h')
+        self.assertListEqual(columns, ['ETH', 'XRP', 'BTC', 'USDT'])
+        numpy.testing.assert_allclose(values[0], [200.0, 0.25, 10000.0, 1.0])
+        _, columns, values = self.po.build_pricing_panel(data, 'XRP', '1h')
+        self.assertListEqual(columns, ['ETH', 'BTC', 'USDT', 'XRP'])
+        numpy.testing.assert_allclose(values[0], [800.0, 40000.0, 4.0, 1.0])
+
+
+class Test_generate_report_cache(TestPortfolioOpt):
+    def test_generate_report_cache_hit(self):
+        a, b = self.po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+        a['BTC'] = 1
+        c, d = self.po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+        self.assertEqual(self.po.cache_hits, 1)
+        self.assertNotEqual(c['BTC'], 1)
+        self.assertListEqual(b, d)
+        self.po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.4)
+        self.assertEqual(self.po.cache_hits, 1)
+        self.assertEqual(len(self.po.report_cache), 2)
+
+    def test_generate_report_cache_size(self):
+        po = PortfolioOpt(cache_size=1)
+        po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+        po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.4)
+        po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+        self.assertEqual(po.cache_hits, 0)
+        self.assertEqual(len(po.report_cache), 1)
+
+    def test_generate_report_cache_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'optimizer.pickle')
+            po = PortfolioOpt(cache_path=path)
+            a, b = po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+            # Written on exit only within the interval
+            self.assertFalse(os.path.exists(path))
+            po.save_cache()
+            po = PortfolioOpt(cache_path=path)
+            c, d = po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+            self.assertEqual(po.cache_hits, 1)
+            self.assertDictEqual(a, c)
+            self.assertListEqual(os.listdir(tmp), ['optimizer.pickle'])
+
+    def test_generate_report_cache_interval(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'optimizer.pickle')
+            po = PortfolioOpt(cache_path=path, cache_interval=0)
+            po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+            self.assertEqual(len(PortfolioOpt(cache_path=path).report_cache), 1)
+
+
+# Random walk prices of 30 assets for 300 hours
+numpy.random.seed(1)
+prices_30 = pd.DataFrame(100 * numpy.exp(numpy.cumsum(numpy.random.normal(0.001, 0.01, (300, 30)), axis=0)),
+                         index=pd.date_range('2019-06-01', periods=300, freq='h', name='date'),
+                         columns=[f'A{i}' for i in range(30)])
+
+
+class Test_solve(TestPortfolioOpt):
+    def test_solve_cold_same_as_pypfopt(self):
+        _, _, ef = self.po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        expected = ef.efficient_return(target_return=0.1)
+        weights = self.po.solve(ef, 'efficient_return', 0.1, (0, 0.2))
+        self.assertDictEqual(weights, expected)
+        self.assertFalse(self.po.solver_stats['warm_start'])
+        self.assertGreater(self.po.solver_stats['iterations'], 0)
+
+    def test_solve_warm_start(self):
+        _, _, ef = self.po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        self.po.solve(ef, 'efficient_return', 0.3, (0, 0.2))
+        cold = self.po.solver_stats['iterations']
+        _, _, ef = self.po.generate_analysis_model(prices_30.iloc[1:201], (0, 0.2), 200, 200)
+        weights = self.po.solve(ef, 'efficient_return', 0.3, (0, 0.2))
+        self.assertTrue(self.po.solver_stats['warm_start'])
+        self.assertLess(self.po.solver_stats['iterations'], cold)
+        # Both solutions are optimal within SLSQP default tolerance
+        w = numpy.array(list(weights.values()))
+        expected = numpy.array(list(ef.efficient_return(target_return=0.3).values()))
+        cov = ef.cov_matrix.values
+        self.assertAlmostEqual(w.dot(ef.expected_returns.values), 0.3)
+        self.assertAlmostEqual(w @ cov @ w / (expected @ cov @ expected), 1, delta=0.01)
+
+    def test_solve_keys(self):
+        _, _, ef = self.po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        self.po.solve(ef, 'efficient_return', 0.1, (0, 0.2))
+        self.po.solve(ef, 'efficient_risk', 0.1, (0, 0.2))
+        self.assertFalse(self.po.solver_stats['warm_start'])
+        self.assertSetEqual(set(self.po.last_weights.keys()),
+                            {('efficient_return', (0, 0.2)), ('efficient_risk', (0, 0.2))})
+        self.assertRaises(ValueError, self.po.solve, ef, 'efficient_return', 1, (0, 0.2))
+
+
+class Test_trace_frontier(TestPortfolioOpt):
+    def test_trace_frontier(self):
+        _, _, ef = self.po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        frontier = self.po.trace_frontier(ef, (0, 0.2), 10)
+        self.assertEqual(len(frontier), 10)
+        numpy.testing.assert_allclose(frontier.weights.sum(axis=1), 1)
+        self.assertTrue((frontier.weights >= -1e-9).all() and (frontier.weights <= 0.2 + 1e-9).all())
+        # Interpolated point is close to the exact solution
+        ret, risk, weights = frontier.for_return(0.3)
+        exact = numpy.array(list(self.po.solve(ef, 'efficient_return', 0.3, (0, 0.2)).values()))
+        self.assertAlmostEqual(risk, numpy.sqrt(exact @ ef.cov_matrix.values @ exact), delta=0.001)
+
+    def test_generate_report_with_frontier(self):
+        po = PortfolioOpt(frontier_points=10)
+        a, b = po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, 0.5)
+        self.assertEqual(len(po.frontier), 10)
+        ret, risk, weights = po.query_frontier(target_return=0.02)
+        self.assertListEqual(list(weights.keys()), list(a.keys()))
+        self.assertIsNone(po.query_frontier(target_return=100.0))
+
+
+class Test_qp_engine(TestPortfolioOpt):
+    def test_qp_engine_solve(self):
+        po = PortfolioOpt(engine='qp')
+        _, _, ef = po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        weights = numpy.array(list(po.solve(ef, 'efficient_return', 0.3, (0, 0.2)).values()))
+        self.assertEqual(po.solver_stats['engine'], 'qp')
+        self.assertTrue(po.solver_stats['success'])
+        _, _, expected = self.po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        expected = numpy.array(list(expected.efficient_return(target_return=0.3).values()))
+        cov = ef.cov_matrix.values
+        self.assertLessEqual(weights @ cov @ weights, expected @ cov @ expected * (1 + 1e-9))
+        self.assertRaises(ValueError, PortfolioOpt, engine='cvxpy')
+
+    def test_qp_engine_fallback(self):
+        po = PortfolioOpt(engine='qp')
+        _, _, ef = po.generate_analysis_model(prices_30.iloc[:200], (0, 0.2), 200, 200)
+        # Search stopped before convergence is replaced by SLSQP solve
+        ef.max_search = 0
+        po.solve(ef, 'efficient_risk', 0.2, (0, 0.2))
+        self.assertTrue(po.solver_stats['fallback'])
+        self.assertTrue(po.solver_stats['success'])
+        self.assertAlmostEqual(ef.weights.sum(), 1)
+
+    def test_qp_engine_generate_report(self):
+        po = PortfolioOpt(engine='qp', frontier_points=10)
+        a, b = po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, None, 0.5)
+        self.assertAlmostEqual(sum(a.values()), 1, delta=0.02)
+        self.assertEqual(len(po.frontier), 10)
+
+
+class Test_hrp(TestPortfolioOpt):
+    def test_bisection_weights(self):
+        # Uncorrelated assets get inverse variance weights
+        cov = numpy.diag([0.01, 0.04])
+        numpy.testing.assert_allclose(self.po.bisection_weights(cov, self.po.cluster_order(cov)), [0.8, 0.2])
+
+    def test_cluster_order(self):
+        # Correlated assets are neighbours
+        returns = numpy.random.RandomState(0).normal(size=(200, 2))
+        returns = numpy.column_stack([returns[:, 0], returns[:, 1], returns[:, 0] + 0.1 * returns[:, 1]])
+        order = list(self.po.cluster_order(numpy.cov(returns.T)))
+        self.assertEqual(abs(order.index(0) - order.index(2)), 1)
+
+    def test_bounded_weights(self):
+        weights = self.po.bounded_weights(numpy.array([0.7, 0.2, 0.1]), numpy.full(3, 0.15), numpy.full(3, 0.5))
+        self.assertAlmostEqual(weights.sum(), 1)
+        numpy.testing.assert_allclose(weights, [0.5, 0.2 + 0.15 * 0.2 / 0.35, 0.15 + 0.15 * 0.15 / 0.35])
+
+    def test_hrp_engine(self):
+        po = PortfolioOpt(engine='hrp')
+        _, _, ef = po.generate_analysis_model(prices_30.iloc[:200], (0.01, 0.1), 200, 200)
+        weights = po.hrp(ef, (0.01, 0.1))
+        self.assertListEqual(list(weights.keys()), list(prices_30.columns))
+        self.assertAlmostEqual(sum(weights.values()), 1)
+        self.assertTrue(all(0.01 - 1e-12 <= x <= 0.1 + 1e-12 for x in weights.values()))
+        # Base asset with constant price has zero variance
+        a, b = po.generate_report(pricing_data_3, ['1h', ], weight_bounds, 'USDT', 20, 20, None, 0.5)
+        self.assertEqual(po.solver_stats['objective'], 'hrp')
+        self.assertAlmostEqual(sum(a.values()), 1, delta=0.02)
+        self.assertTrue(all(weight_bounds[0] - 0.01 <= x <= weight_bounds[1] + 0.01 for x in a.values()))
+        # Base asset keeps its lower bound, risky assets share the rest
+        self.assertAlmostEqual(a['USDT'], weight_bounds[0])
+        self.assertGreater(min(a['BTC'], a['ETH'], a['BNB']), weight_bounds[0])
+        self.assertAlmostEqual(a['BTC'] + a['ETH'] + a['BNB'], 1 - weight_bounds[0], delta=0.02)
+
+    def test_hrp_zero_variance_asset(self):
+        po = PortfolioOpt(engine='hrp')
+        prices = prices_30.iloc[:200].assign(USDT=1.0)
+        _, _, ef = po.generate_analysis_model(prices, (0, 1), 200, 200)
+        weights = po.hrp(ef, (0, 1))
+        self.assertEqual(weights['USDT'], 0)
+        cov = numpy.asarray(ef.cov_matrix)[:30, :30]
+        expected = po.bisection_weights(cov, po.cluster_order(cov))
+        numpy.testing.assert_allclose([weights[x] for x in prices_30.columns], expected, atol=1e-12)
+        self.assertLess(max(weights.values()), 0.1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+import numpy
+import pandas as pd
+from pypfopt import risk_models
+from pypfopt import expected_returns
+from pypfopt.efficient_frontier import EfficientFrontier
+
+from payload.qpsolver import QPFrontier, project, max_return_weights
+
+numpy.random.seed(2)
+prices = pd.DataFrame(100 * numpy.exp(numpy.cumsum(numpy.random.normal(0.001, 0.01, (200, 30)), axis=0)),
+                      columns=[f'A{i}' for i in range(30)])
+mu = expected_returns.mean_historical_return(prices, frequency=200)
+cov = risk_models.sample_cov(prices, frequency=200)
+bounds = (0.01, 0.3)
+
+
+def variance(weights: dict) -> float:
+    w = numpy.array(list(weights.values()))
+    return w @ cov.values @ w
+
+
+class TestQPFrontier(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.qp = QPFrontier(mu, cov, weight_bounds=bounds)
+        self.ef = EfficientFrontier(mu, cov, weight_bounds=bounds)
+
+
+class Test_project(unittest.TestCase):
+    def test_project(self):
+        lower, upper = numpy.zeros(4), numpy.full(4, 0.5)
+        w = project(numpy.array([0.9, 0.3, -0.2, 0.1]), lower, upper)
+        self.assertAlmostEqual(w.sum(), 1)
+        numpy.testing.assert_allclose(w, [0.5, 0.35, 0, 0.15])
+        # Feasible point stays
+        numpy.testing.assert_allclose(project(numpy.array([0.4, 0.3, 0.2, 0.1]), lower, upper), [0.4, 0.3, 0.2, 0.1])
+        self.assertRaises(ValueError, project, numpy.zeros(4), lower, numpy.full(4, 0.2))
+
+    def test_max_return_weights(self):
+        w = max_return_weights(numpy.array([0.1, 0.3, 0.2]), numpy.full(3, 0.1), numpy.full(3, 0.6))
+        numpy.testing.assert_allclose(w, [0.1, 0.6, 0.3])
+
+
+class Test_efficient_return(TestQPFrontier):
+    def test_efficient_return_agrees_with_pypfopt(self):
+        for target in (0.1, 0.2, 0.3):
+            weights = self.qp.efficient_return(target)
+            self.assertTrue(self.qp.stats['success'])
+            self.assertAlmostEqual(numpy.array(list(weights.values())) @ mu.values, target, places=9)
+            # Exact optimum is not worse than SLSQP one and within its tolerance
+            expected = variance(self.ef.efficient_return(target))
+            self.assertLessEqual(variance(weights), expected * (1 + 1e-9))
+            self.assertAlmostEqual(variance(weights) / expected, 1, delta=0.02)
+
+    def test_efficient_return_warm_start(self):
+        weights = numpy.array(list(self.qp.efficient_return(0.2).values()))
+        cold = self.qp.stats['iterations']
+        self.qp.efficient_return(0.2, initial_guess=weights)
+        self.assertGreater(cold, 0)
+        self.assertEqual(self.qp.stats['iterations'], 0)
+        numpy.testing.assert_allclose(self.qp.weights, weights, atol=1e-12)
+
+    def test_efficient_return_deterministic(self):
+        first = self.qp.efficient_return(0.2)
+        second = QPFrontier(mu, cov, weight_bounds=bounds).efficient_return(0.2)
+        self.assertDictEqual(first, second)
+
+    def test_efficient_return_unattainable(self):
+        weights = self.qp.efficient_return(10.0)
+        self.assertFalse(self.qp.stats['success'])
+        self.assertAlmostEqual(sum(weights.values()), 1)
+        self.assertRaises(ValueError, self.qp.efficient_return, 1)
+
+
+class Test_efficient_risk(TestQPFrontier):
+    def test_efficient_risk_agrees_with_pypfopt(self):
+        for target in (0.05, 0.08, 0.2):
+            self.qp.efficient_risk(target)
+            self.ef.efficient_risk(target)
+            self.assertTrue(self.qp.stats['success'])
+            _, sigma, sharpe = self.qp.portfolio_performance()
+            _, _, expected = self.ef.portfolio_performance()
+            self.assertLessEqual(sigma, target + 1e-9)
+            self.assertGreaterEqual(sharpe, expected - 1e-6)
+
+    def test_efficient_risk_unattainable(self):
+        self.qp.efficient_risk(0.001)
+        self.assertFalse(self.qp.stats['success'])
+        min_vol = variance(QPFrontier(mu, cov, weight_bounds=bounds).min_volatility())
+        self.assertAlmostEqual(self.qp.weights @ cov.values @ self.qp.weights, min_vol)
+
+
+class Test_min_volatility(TestQPFrontier):
+    def test_min_volatility(self):
+        weights = self.qp.min_volatility()
+        self.assertTrue(self.qp.stats['success'])
+        self.assertLessEqual(variance(weights), variance(self.ef.min_volatility()) * (1 + 1e-9))
+
+
+class Test_max_sharpe(TestQPFrontier):
+    def test_max_sharpe(self):
+        self.qp.max_sharpe()
+        self.ef.max_sharpe()
+        self.assertTrue(self.qp.stats['success'])
+        self.assertGreaterEqual(self.qp.portfolio_performance()[2], self.ef.portfolio_performance()[2] - 1e-6)
+
+    def test_max_sharpe_base_asset(self):
+        # Constant base asset column has zero variance, the search must not stop at it
+        with_base = prices.assign(USDT=1.0)
+        base_mu = expected_returns.mean_historical_return(with_base, frequency=200)
+        base_cov = risk_models.sample_cov(with_base, frequency=200)
+        qp = QPFrontier(base_mu, base_cov, weight_bounds=(0, 1))
+        ef = EfficientFrontier(base_mu, base_cov, weight_bounds=(0, 1))
+        qp.max_sharpe()
+        ef.max_sharpe()
+        self.assertTrue(qp.stats['success'])
+        self.assertLess(qp.weights[-1], 0.5)
+        self.assertGreaterEqual(qp.portfolio_performance()[2], ef.portfolio_performance()[2] - 1e-6)
+        qp.efficient_risk(0.03)
+        self.assertTrue(qp.stats['success'])
+        self.assertAlmostEqual(qp.portfolio_performance()[1], 0.03, places=6)
@@ -0,0 +1,76 @@
+import unittest
+from threading import Thread
+from timeit import default_timer as timer
+
+from binance.ratelimiter import RateLimiter, get_rate_limiter
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # 100 weight per second
+        self.rl = RateLimiter(capacity=100, interval=1, safety=1)
+
+
+class Test_acquire(TestRateLimiter):
+    def test_acquire_burst(self):
+        self.assertLess(sum(self.rl.acquire(10) for _ in range(10)), 0.01)
+
+    def test_acquire_waits_for_weight(self):
+        self.rl.acquire(100)
+        start = timer()
+        self.rl.acquire(20)
+        self.assertGreaterEqual(timer() - start, 0.15)
+
+    def test_acquire_shared_between_threads(self):
+        self.rl.acquire(100)
+        threads = [Thread(target=self.rl.acquire, args=(10, )) for _ in range(4)]
+        start = timer()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreaterEqual(timer() - start, 0.35)
+
+
+class Test_update_from_headers(TestRateLimiter):
+    def test_update_from_headers(self):
+        self.rl.update_from_headers({'X-MBX-USED-WEIGHT-1M': '95'})
+        start = timer()
+        self.rl.acquire(10)
+        self.assertGreaterEqual(timer() - start, 0.04)
+
+    def test_update_from_headers_missing(self):
+        self.rl.update_from_headers({'Content-Type': 'application/json'})
+        self.rl.update_from_headers(None)
+        self.assertLess(self.rl.acquire(100), 0.01)
+
+
+class Test_pause(TestRateLimiter):
+    def test_pause(self):
+        self.rl.pause(0.2)
+        self.assertGreaterEqual(self.rl.acquire(1), 0.19)
+
+
+class Test_resize(TestRateLimiter):
+    def test_resize(self):
+        self.rl.acquire(50)
+        self.rl.resize(200)
+        self.assertEqual(self.rl.rate, 200)
+        # Used weight stays used
+        self.assertLess(self.rl.acquire(150), 0.01)
+        self.assertGreaterEqual(self.rl.acquire(20), 0.09)
+
+
+class Test_get_rate_limiter(unittest.TestCase):
+    def test_get_rate_limiter_shared(self):
+        self.assertIs(get_rate_limiter('test', capacity=10), get_rate_limiter('test'))
+
+    def test_get_rate_limiter_resized(self):
+        limiter = get_rate_limiter('test_resized', capacity=100, interval=1, safety=1)
+        self.assertIs(get_rate_limiter('test_resized', capacity=50, interval=1), limiter)
+        self.assertEqual(limiter.capacity, 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
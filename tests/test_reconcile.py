@@ -0,0 +1,45 @@
+import unittest
+
+from payload.reconcile import reconcile_orders
+
+quotes = [{'symbol': 'ETH/BTC', 'order_type': 'LIMIT', 'side': 'BUY', 'amount': 1.0, 'price': 0.02},
+          {'symbol': 'BTC/USDT', 'order_type': 'LIMIT', 'side': 'SELL', 'amount': 0.1, 'price': 10000.0},
+          {'symbol': 'XRP/BTC', 'order_type': 'LIMIT', 'side': 'BUY', 'amount': 100.0, 'price': 0.00003}]
+
+
+def order(symbol: str, side: str, amount: float, price: float, remaining: float = None) -> dict:
+    return {'id': symbol, 'symbol': symbol, 'side': side, 'amount': amount, 'price': price,
+            'remaining': amount if remaining is None else remaining, 'status': 'open'}
+
+
+class Test_reconcile_orders(unittest.TestCase):
+    def test_reconcile_orders_unchanged(self):
+        open_orders = {'1': order('ETH/BTC', 'buy', 1.0, 0.02), '2': order('BTC/USDT', 'sell', 0.1, 10005.0),
+                       '3': order('XRP/BTC', 'buy', 100.0, 0.00003)}
+        kept, cancel, place = reconcile_orders(quotes, open_orders)
+        self.assertListEqual(sorted(kept), ['1', '2', '3'])
+        self.assertListEqual(cancel, list())
+        self.assertListEqual(place, list())
+
+    def test_reconcile_orders_changed(self):
+        open_orders = {'1': order('ETH/BTC', 'buy', 1.0, 0.0199),
+                       '2': order('BTC/USDT', 'sell', 0.2, 10000.0, remaining=0.098),
+                       '3': order('XRP/BTC', 'sell', 100.0, 0.00003),
+                       '4': order('BNB/BTC', 'buy', 1.0, 0.002)}
+        kept, cancel, place = reconcile_orders(quotes, open_orders)
+        # Price moved, side changed and stale market are replaced, partially filled remaining matches
+        self.assertListEqual(kept, ['2'])
+        self.assertListEqual(sorted(cancel), ['1', '3', '4'])
+        self.assertListEqual(place, [quotes[0], quotes[2]])
+
+    def test_reconcile_orders_one_to_one(self):
+        open_orders = {'1': order('ETH/BTC', 'buy', 1.0, 0.02001), '2': order('ETH/BTC', 'buy', 1.0, 0.02)}
+        kept, cancel, place = reconcile_orders(quotes[:1] * 2 + [dict(quotes[0], price=0.021)], open_orders)
+        self.assertListEqual(kept, ['2', '1'])
+        self.assertListEqual(cancel, list())
+        self.assertListEqual(place, [dict(quotes[0], price=0.021)])
+
+    def test_reconcile_orders_tolerance(self):
+        open_orders = {'1': order('ETH/BTC', 'buy', 1.0, 0.0199)}
+        self.assertListEqual(reconcile_orders(quotes[:1], open_orders, price_tolerance=0.01)[0], ['1'])
+        self.assertListEqual(reconcile_orders(quotes[:1], open_orders, price_tolerance=0.001)[0], list())
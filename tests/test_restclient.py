@@ -0,0 +1,356 @@
+import unittest
+import tempfile
+from unittest.mock import patch
+from time import sleep, time
+from timeit import default_timer as timer
+from threading import Thread
+
+import ccxt
+
+from binance.restclient import RestClient
+from binance.ratelimiter import RateLimiter
+from yat.candlestore import CandleStore
+from yat import logger
+from logging import DEBUG
+
+markets = {'BTC/USDT': {'symbol': 'BTC/USDT', 'base': 'BTC', 'quote': 'USDT', 'active': True,
+                        'limits': {'amount': {'min': 1e-6, 'max': 9000}, 'price': {'min': 0.01, 'max': 1e6},
+                                   'cost': {'min': 10, 'max': None}}},
+           'ETH/USDT': {'symbol': 'ETH/USDT', 'base': 'ETH', 'quote': 'USDT', 'active': True,
+                        'limits': {'amount': {'min': 1e-5, 'max': 9000}, 'price': {'min': 0.01, 'max': 1e6},
+                                   'cost': {'min': 10, 'max': None}}},
+           'ETH/BTC': {'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC', 'active': True,
+                       'limits': {'amount': {'min': 1e-3, 'max': 9000}, 'price': {'min': 1e-6, 'max': 1e3},
+                                  'cost': {'min': 1e-4, 'max': None}}}, }
+
+hour = 3600000
+
+logger = logger.setup_custom_logger('Tests', log_level=DEBUG)
+
+
+def make_candles(start: int, count: int, step: int = hour, price: float = 100.0):
+    return [[start + i * step, price + i, price + i + 1, price + i - 1, price + i, 10.0] for i in range(count)]
+
+
+class FakeOhlcvSource:
+    """
+    Replaces exchange.fetch_ohlcv, serves hourly candles up to now,
+    keeps requested args and slows every call down
+    """
+
+    def __init__(self, delay: float = 0.0, now: int = 1560974400000 + 1000 * hour):
+        self.delay = delay
+        self.now = now
+        self.calls = list()
+
+    def __call__(self, symbol, timeframe='1h', since=None, limit=None, params={}):
+        self.calls.append((symbol, timeframe, since, limit))
+        sleep(self.delay)
+        last = self.now - self.now % hour
+        limit = limit or 500
+        start = since if since is not None else last - (limit - 1) * hour
+        candles = make_candles(start, (last - start) // hour + 1, price=self.now / hour)
+        return candles[:limit]
+
+
+class TestRestClient(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with patch.object(ccxt.binance, 'load_markets', return_value=markets):
+            self.rc = RestClient(logger=logger, workers=4)
+
+
+class Test_init(unittest.TestCase):
+    def test_init_without_logger(self):
+        with patch.object(ccxt.binance, 'load_markets', return_value=markets):
+            rc = RestClient()
+        self.assertIsNone(rc.logger)
+        self.assertGreater(len(rc.markets), 0)
+
+
+class Test_request(TestRestClient):
+    def test_request_pauses_on_ban(self):
+        def banned(symbol, params={}):
+            self.rc.exchange.on_rest_response(429, '', '', 'GET', {'Retry-After': '30', 'x-mbx-used-weight-1m': '1200'},
+                                              '', {}, None)
+            raise ccxt.RateLimitExceeded('binance 429')
+        self.rc.rate_limiter = RateLimiter()
+        self.rc.exchange.fetch_ticker = banned
+        self.assertRaises(ccxt.RateLimitExceeded, self.rc._request, 'fetch_ticker', 'BTC/USDT')
+        self.assertGreater(self.rc.rate_limiter._paused_until - timer(), 20)
+
+    def test_request_headers_of_thread(self):
+        # Another thread responds with full weight used while this request is in flight
+        def other():
+            self.rc.exchange.on_rest_response(200, '', '', 'GET', {'x-mbx-used-weight-1m': '1200'}, '', {}, None)
+
+        def ticker(symbol, params={}):
+            self.rc.exchange.on_rest_response(200, '', '', 'GET', {'x-mbx-used-weight-1m': '10'}, '', {}, None)
+            thread = Thread(target=other)
+            thread.start()
+            thread.join()
+            return {'symbol': symbol}
+        self.rc.rate_limiter = RateLimiter(safety=1)
+        self.rc.exchange.fetch_ticker = ticker
+        self.rc._request('fetch_ticker', 'BTC/USDT')
+        self.assertGreater(self.rc.rate_limiter._tokens, 1100)
+
+
+class Test_process_ohlcv(TestRestClient):
+    def test_process_ohlcv_structure(self):
+        self.rc.exchange.fetch_ohlcv = FakeOhlcvSource()
+        ohlcv = self.rc.process_ohlcv(['BTC/USDT', 'ETH/USDT'], ['1h', '4h', 'xx'], 20)
+        self.assertListEqual(sorted(ohlcv.keys()), ['BTC/USDT', 'ETH/USDT'])
+        self.assertListEqual(sorted(ohlcv['BTC/USDT'].keys()), ['1h', '4h'])
+        self.assertEqual(len(ohlcv['ETH/USDT']['4h']), 20)
+        self.assertListEqual(sorted(self.rc.ohlcv_latency['ETH/USDT'].keys()), ['1h', '4h'])
+
+    def test_process_ohlcv_concurrent(self):
+        self.rc.exchange.fetch_ohlcv = FakeOhlcvSource(delay=0.05)
+        start = time()
+        self.rc.process_ohlcv(['BTC/USDT', 'ETH/USDT', 'ETH/BTC'], ['1h', '4h'], 20)
+        # 6 requests on 4 workers fit in 2 rounds
+        self.assertLess(time() - start, 0.25)
+        latencies = [v for d in self.rc.ohlcv_latency.values() for v in d.values()]
+        self.assertEqual(len(latencies), 6)
+        self.assertTrue(all(x >= 0.05 for x in latencies))
+
+
+class Test_update_ohlcv(TestRestClient):
+    def setUp(self) -> None:
+        super().setUp()
+        self.source = FakeOhlcvSource()
+        self.rc.exchange.fetch_ohlcv = self.source
+        self.rc.exchange.milliseconds = lambda: self.source.now
+
+    def test_update_ohlcv_tail_only(self):
+        first = self.rc.update_ohlcv('BTC/USDT', '1h', 200)
+        self.assertEqual(len(first), 200)
+        # Forming candle got updated and one more candle appeared
+        self.source.now += hour
+        second = self.rc.update_ohlcv('BTC/USDT', '1h', 200)
+        self.assertEqual(self.source.calls[-1][2], first[-1][0])
+        self.assertLessEqual(self.source.calls[-1][3], 3)
+        self.assertEqual(len(second), 200)
+        self.assertEqual(second[-1][0] - second[-2][0], hour)
+        self.assertEqual(second[-2][0], first[-1][0])
+        self.assertNotEqual(second[-2][4], first[-1][4])
+        self.assertEqual(second[0][0], first[1][0])
+
+    def test_update_ohlcv_gap_refetch(self):
+        self.rc.update_ohlcv('BTC/USDT', '1h', 50)
+        self.source.now += 100 * hour
+        candles = self.rc.update_ohlcv('BTC/USDT', '1h', 50)
+        self.assertIsNone(self.source.calls[-1][2])
+        self.assertEqual(len(candles), 50)
+        self.assertEqual(len(set(x[0] for x in candles)), 50)
+
+
+    def test_update_ohlcv_limit_increase(self):
+        self.rc.update_ohlcv('BTC/USDT', '1h', 50)
+        candles = self.rc.update_ohlcv('BTC/USDT', '1h', 200)
+        self.assertIsNone(self.source.calls[-1][2])
+        self.assertEqual(len(candles), 200)
+
+
+class Test_update_ohlcv_candle_store(Test_update_ohlcv):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rc.candle_store = CandleStore(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_update_ohlcv_warm_start(self):
+        first = self.rc.update_ohlcv('BTC/USDT', '1h', 200)
+        # New client on restart has only the store
+        self.rc._candlesticks.clear()
+        self.source.now += hour
+        second = self.rc.update_ohlcv('BTC/USDT', '1h', 200)
+        self.assertEqual(self.source.calls[-1][2], first[-1][0])
+        self.assertEqual(len(second), 200)
+        self.assertListEqual(self.rc.candle_store.tail('BTC/USDT', '1h', 200), second)
+
+
+class FakeBidsAsksSource:
+    """
+    Replaces exchange.fetch_bids_asks, keeps requested symbols
+    """
+
+    def __init__(self):
+        self.calls = list()
+
+    def __call__(self, symbols=None, params={}):
+        self.calls.append(symbols)
+        return {x: {'symbol': x, 'bid': 1.0, 'ask': 1.1} for x in (symbols or markets.keys())}
+
+
+class Test_process_tickers(TestRestClient):
+    def setUp(self) -> None:
+        super().setUp()
+        self.source = FakeBidsAsksSource()
+        self.rc.exchange.fetch_bids_asks = self.source
+
+    def test_process_tickers_all(self):
+        self.rc.process_tickers()
+        self.assertIsNone(self.source.calls[-1])
+        self.assertEqual(len(self.rc.all_tickers), 3)
+
+    def test_process_tickers_watched(self):
+        self.rc.watch_tickers(['ETH/BTC', 'XXX/BTC'])
+        self.rc.process_tickers()
+        self.assertListEqual(self.source.calls[-1], ['ETH/BTC'])
+        self.assertListEqual(list(self.rc.all_tickers.keys()), ['ETH/BTC'])
+
+    def test_process_tickers_watched_bulk(self):
+        self.rc.watch_tickers(['ETH/BTC', 'BTC/USDT'])
+        self.rc.process_tickers()
+        self.assertIsNone(self.source.calls[-1])
+
+
+quotes = [{'symbol': 'ETH/BTC', 'order_type': 'LIMIT', 'side': 'BUY', 'amount': 0.5, 'price': 0.029},
+          {'symbol': 'BTC/USDT', 'order_type': 'LIMIT', 'side': 'SELL', 'amount': 0.01, 'price': 9220.0},
+          {'symbol': 'ETH/USDT', 'order_type': 'LIMIT', 'side': 'SELL', 'amount': 0.5, 'price': 268.0},
+          {'symbol': 'ETH/USDT', 'order_type': 'LIMIT', 'side': 'SELL', 'amount': 0.5, 'price': 1e7}, ]
+
+
+class FakeOrderSource:
+    """
+    Replaces exchange.create_order, returns open orders with sequential ids
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.orders = list()
+
+    def __call__(self, symbol, type, side, amount, price=None, params={}):
+        sleep(self.delay)
+        order = {'id': str(len(self.orders) + 100), 'symbol': symbol, 'type': type, 'side': side,
+                 'amount': amount, 'price': price, 'status': 'open', 'filled': 0.0, 'timestamp': 0}
+        self.orders.append(order)
+        return dict(order)
+
+
+class Test_place_multiple_orders(TestRestClient):
+    def test_place_multiple_orders_dry_run(self):
+        self.rc.dry_run = True
+        self.rc.place_multiple_orders(quotes)
+        self.assertEqual(len(self.rc.order_history), 4)
+        statuses = sorted(x['status'] for x in self.rc.order_history.values())
+        self.assertListEqual(statuses, ['DRY_RUN', 'DRY_RUN', 'DRY_RUN', 'limits not passed'])
+        self.assertSetEqual(set(self.rc.order_latency.keys()), set(self.rc.order_history.keys()))
+
+    def test_place_multiple_orders_concurrent(self):
+        self.rc.exchange.create_order = FakeOrderSource(delay=0.05)
+        start = time()
+        self.rc.place_multiple_orders(quotes[:3])
+        self.assertLess(time() - start, 0.1)
+        self.assertListEqual(sorted(self.rc.order_history.keys()), ['100', '101', '102'])
+        self.assertTrue(all(list(x.values())[0] >= 0.05 for x in self.rc.order_latency.values()))
+
+
+class FakeOrderBook:
+    """
+    Replaces order endpoints of exchange with a dict of orders by id, counts calls
+    """
+
+    def __init__(self, orders: list):
+        self.orders = {o['id']: dict(o) for o in orders}
+        self.calls = list()
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.calls.append(('fetch_open_orders', symbol))
+        return [dict(o) for o in self.orders.values()
+                if o['status'] == 'open' and symbol in (None, o['symbol'])]
+
+    def fetch_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.calls.append(('fetch_orders', symbol))
+        return [dict(o) for o in self.orders.values() if o['symbol'] == symbol and o['timestamp'] >= since]
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self.calls.append(('fetch_order', symbol))
+        return dict(self.orders[id])
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self.calls.append(('cancel_order', symbol))
+        self.orders[id]['status'] = 'canceled'
+        return {'id': id, 'symbol': symbol, 'status': 'canceled', 'price': None}
+
+
+def make_orders(symbol: str, count: int, start: int = 0):
+    return [{'id': str(start + i), 'symbol': symbol, 'status': 'open', 'timestamp': 1000 + i, 'price': 1.0}
+            for i in range(count)]
+
+
+class TestOrderSync(TestRestClient):
+    def setUp(self) -> None:
+        super().setUp()
+        orders = make_orders('ETH/BTC', 8) + make_orders('BTC/USDT', 2, 100)
+        self.book = FakeOrderBook(orders)
+        for m in ('fetch_open_orders', 'fetch_orders', 'fetch_order', 'cancel_order'):
+            setattr(self.rc.exchange, m, getattr(self.book, m))
+        self.rc.order_history = {o['id']: dict(o) for o in orders}
+        self.rc.order_history['x'] = {'id': None, 'symbol': 'ETH/BTC', 'status': 'limits not passed'}
+        for x in ('1', '2', '3', '4', '5', '6', '101'):
+            self.book.orders[x]['status'] = 'closed'
+
+
+class Test_fetch_processed_orders(TestOrderSync):
+    def test_fetch_processed_orders_statuses(self):
+        self.rc.fetch_processed_orders()
+        statuses = {x: y['status'] for x, y in self.rc.order_history.items()}
+        self.assertDictEqual(statuses, {'0': 'open', '1': 'closed', '2': 'closed', '3': 'closed', '4': 'closed',
+                                        '5': 'closed', '6': 'closed', '7': 'open', '100': 'open', '101': 'closed',
+                                        'x': 'limits not passed'})
+
+    def test_fetch_processed_orders_bulk(self):
+        self.rc.fetch_processed_orders()
+        calls = sorted(self.book.calls)
+        # One open orders request per symbol, all orders for many finished, single order for one
+        self.assertListEqual(calls, [('fetch_open_orders', 'BTC/USDT'), ('fetch_open_orders', 'ETH/BTC'),
+                                     ('fetch_order', 'BTC/USDT'), ('fetch_orders', 'ETH/BTC')])
+
+    def test_fetch_processed_orders_error(self):
+        def failed(id, symbol=None, params={}):
+            raise ccxt.OrderNotFound('binance')
+        self.rc.exchange.fetch_order = failed
+        self.rc.fetch_processed_orders()
+        self.assertEqual(self.rc.order_history['101']['status'], 'OrderNotFound')
+        self.assertEqual(self.rc.order_history['100']['status'], 'open')
+
+    def test_fetch_processed_orders_retry(self):
+        def failed(symbol=None, since=None, limit=None, params={}):
+            raise ccxt.NetworkError('binance')
+        self.rc.exchange.fetch_open_orders = failed
+        self.rc.fetch_processed_orders()
+        self.assertEqual(self.rc.order_history['1']['status'], 'NetworkError')
+        # Order with failed request may still be open, it is tracked until the request succeeds
+        self.assertListEqual(sorted(self.rc.open_orders()), ['0', '1', '100', '101', '2', '3', '4', '5', '6', '7'])
+        self.rc.exchange.fetch_open_orders = self.book.fetch_open_orders
+        self.rc.fetch_processed_orders()
+        self.assertEqual(self.rc.order_history['1']['status'], 'closed')
+        self.assertListEqual(sorted(self.rc.open_orders()), ['0', '100', '7'])
+
+
+class Test_cancel_processed_orders(TestOrderSync):
+    def test_cancel_processed_orders(self):
+        self.rc.fetch_processed_orders()
+        self.book.calls.clear()
+        self.rc.cancel_processed_orders()
+        self.assertEqual(len(self.book.calls), 3)
+        self.assertTrue(all(self.rc.order_history[x]['status'] == 'canceled' for x in ('0', '7', '100')))
+        self.assertEqual(self.rc.order_history['0']['price'], 1.0)
+        self.assertFalse(self.rc.cancel_processed_orders())
+
+    def test_cancel_processed_orders_keys(self):
+        self.rc.fetch_processed_orders()
+        self.assertListEqual(sorted(self.rc.open_orders()), ['0', '100', '7'])
+        self.book.calls.clear()
+        self.rc.cancel_processed_orders(['7', '1'])
+        self.assertListEqual(self.book.calls, [('cancel_order', 'ETH/BTC')])
+        self.assertListEqual(sorted(self.rc.open_orders()), ['0', '100'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+from timeit import default_timer as timer
+
+import numpy
+
+from payload.router import TradeRouter
+
+markets = ['ETH/BTC', 'BTC/USDT', 'XRP/BTC', 'XRP/ETH', 'BNB/ETH', 'ETH/USDT']
+tickers = {m: {'bid': 0.999, 'ask': 1.001} for m in markets}
+
+
+class TestTradeRouter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tr = TradeRouter(markets, fee=0.001)
+
+
+class Test_route(TestTradeRouter):
+    def test_route_direct(self):
+        trades, unrouted = self.tr.route({'ETH': 100.0, 'USDT': -100.0}, tickers)
+        self.assertListEqual(trades, [('ETH/USDT', 'BUY', 100.0)])
+        self.assertDictEqual(unrouted, dict())
+
+    def test_route_multi_hop(self):
+        # Both XRP routes have 2 legs, the XRP/ETH one is wider
+        wide = dict(tickers, **{'XRP/ETH': {'bid': 0.99, 'ask': 1.01}})
+        trades, unrouted = self.tr.route({'BNB': 60.0, 'XRP': 40.0, 'USDT': -100.0}, wide)
+        self.assertCountEqual(trades, [('ETH/USDT', 'BUY', 60.0), ('BNB/ETH', 'BUY', 60.0),
+                                       ('BTC/USDT', 'BUY', 40.0), ('XRP/BTC', 'BUY', 40.0)])
+        self.assertDictEqual(unrouted, dict())
+
+    def test_route_cheapest(self):
+        # Wide ETH/USDT spread makes the BTC route cheaper
+        wide = dict(tickers, **{'ETH/USDT': {'bid': 0.95, 'ask': 1.05}})
+        trades, _ = self.tr.route({'ETH': -50.0, 'USDT': 50.0}, wide)
+        self.assertCountEqual(trades, [('ETH/BTC', 'SELL', 50.0), ('BTC/USDT', 'SELL', 50.0)])
+
+    def test_route_free_transit(self):
+        # Transit legs are placed at once, ETH can pass on only its free value and parks the rest
+        wide = dict(tickers, **{'BTC/USDT': {'bid': 0.99, 'ask': 1.01}})
+        trades, unrouted = self.tr.route({'BNB': 60.0, 'USDT': -60.0}, wide, free={'USDT': 60.0, 'ETH': 20.0})
+        self.assertCountEqual(trades, [('ETH/USDT', 'BUY', 60.0), ('BNB/ETH', 'BUY', 20.0)])
+        self.assertDictEqual(unrouted, {'BNB': 40.0})
+
+    def test_route_free_first_leg(self):
+        # Without free ETH only the first leg is placed, BNB is bought when the XRP sell is filled
+        wide = dict(tickers, **{'XRP/BTC': {'bid': 0.99, 'ask': 1.01}})
+        trades, unrouted = self.tr.route({'BNB': 50.0, 'XRP': -50.0}, wide, free={'XRP': 50.0})
+        self.assertCountEqual(trades, [('XRP/ETH', 'SELL', 50.0)])
+        self.assertDictEqual(unrouted, {'BNB': 50.0})
+
+    def test_route_free_parks_on_route(self):
+        # BNB is a transit asset off the ETH -> BTC -> ZIL route, value is parked in BTC only
+        tr = TradeRouter(['ETH/BTC', 'ZIL/BTC', 'ETH/BNB'])
+        spreads = {m: {'bid': 0.999, 'ask': 1.001} for m in tr.markets}
+        spreads['ETH/BNB'] = {'bid': 0.9999, 'ask': 1.0001}
+        trades, unrouted = tr.route({'ETH': -100.0, 'ZIL': 100.0}, spreads, free={'ETH': 100.0, 'BTC': 0, 'BNB': 0})
+        self.assertListEqual(trades, [('ETH/BTC', 'SELL', 100.0)])
+        self.assertDictEqual(unrouted, {'ZIL': 100.0})
+
+    def test_route_free_direct(self):
+        # BTC route is cheaper but BTC balance is short, the rest goes the direct way
+        wide = dict(tickers, **{'ETH/USDT': {'bid': 0.98, 'ask': 1.02}})
+        trades, unrouted = self.tr.route({'ETH': -50.0, 'USDT': 50.0}, wide, free={'ETH': 50.0, 'BTC': 20.0})
+        self.assertCountEqual(trades, [('ETH/BTC', 'SELL', 20.0), ('BTC/USDT', 'SELL', 20.0),
+                                       ('ETH/USDT', 'SELL', 30.0)])
+        self.assertDictEqual(unrouted, dict())
+
+    def test_route_unbalanced(self):
+        trades, unrouted = self.tr.route({'ETH': 30.0, 'XRP': 10.0, 'USDT': -20.0, 'DOGE': 5.0}, tickers)
+        self.assertAlmostEqual(sum(x[2] for x in trades if x[1] == 'BUY' and x[0] in ('ETH/USDT', 'BTC/USDT')), 20)
+        self.assertAlmostEqual(unrouted['ETH'], 15.0)
+        self.assertAlmostEqual(unrouted['XRP'], 5.0)
+        self.assertEqual(unrouted['DOGE'], 5.0)
+
+    def test_route_without_tickers(self):
+        trades, unrouted = self.tr.route({'BNB': 10.0, 'USDT': -10.0}, {'ETH/USDT': tickers['ETH/USDT']})
+        self.assertListEqual(trades, list())
+        self.assertDictEqual(unrouted, {'BNB': 10.0, 'USDT': -10.0})
+
+    def test_route_tree(self):
+        # Markets quoted in USDT only have one route between assets, the flow is summed without a solver
+        random_state = numpy.random.RandomState(0)
+        assets = [f'A{i}' for i in range(20)]
+        tr = TradeRouter([f'{x}/USDT' for x in assets])
+        spreads = {m: {'bid': 1.0, 'ask': 1 + random_state.uniform(1e-4, 1e-2)} for m in tr.markets}
+        values = {x: random_state.normal() for x in assets}
+        values['USDT'] = -sum(values.values())
+        with mock.patch('payload.router.linprog') as linprog:
+            trades, unrouted = tr.route(values, spreads)
+            linprog.assert_not_called()
+        self.assertDictEqual(unrouted, dict())
+        self.assertCountEqual([x[:2] for x in trades],
+                              [(f'{x}/USDT', 'BUY' if v > 0 else 'SELL') for x, v in values.items() if x != 'USDT'])
+        for market, side, value in trades:
+            self.assertAlmostEqual(value, abs(values[market.split('/')[0]]))
+        # A cycle leaves more than one route
+        self.assertIsNone(TradeRouter(tr.markets + ['A0/A1'])._tree_flow(numpy.zeros(21), numpy.ones(42, dtype=bool)))
+
+    def test_route_large_portfolio(self):
+        random_state = numpy.random.RandomState(0)
+        assets = [f'A{i}' for i in range(150)]
+        large = [f'{x}/BTC' for x in assets] + [f'{x}/USDT' for x in assets[:50]] + ['BTC/USDT']
+        tr = TradeRouter(large)
+        spreads = {m: {'bid': 1.0, 'ask': 1 + random_state.uniform(1e-4, 1e-2)} for m in large}
+        values = {x: random_state.normal() for x in assets}
+        values['USDT'] = -sum(values.values())
+        start = timer()
+        trades, unrouted = tr.route(values, spreads)
+        self.assertLess(timer() - start, 1)
+        self.assertTrue(tr.stats['success'])
+        self.assertDictEqual(unrouted, dict())
+        # Every asset ends with its target value
+        moved = {x: 0.0 for x in tr.assets}
+        for market, side, value in trades:
+            base, quote = market.split('/')
+            moved[base] += value if side == 'BUY' else -value
+            moved[quote] -= value if side == 'BUY' else -value
+        for x, y in values.items():
+            self.assertAlmostEqual(moved[x], y, places=6)
@@ -0,0 +1,43 @@
+import unittest
+
+from payload.routes import RouteIndex
+
+markets = ['ETH/BTC', 'BTC/USDT', 'XRP/BTC', 'XRP/ETH', 'BNB/ETH', 'USDT/TRY']
+prices = {'ETH/BTC': 0.02, 'BTC/USDT': 10000.0, 'XRP/BTC': 0.00003, 'XRP/ETH': 0.0015, 'BNB/ETH': 0.1,
+          'USDT/TRY': 6.0}
+
+
+class TestRouteIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ri = RouteIndex(markets)
+
+
+class Test_route(TestRouteIndex):
+    def test_route_direct(self):
+        self.assertTupleEqual(self.ri.route('BTC', 'USDT'), (('BTC/USDT', 1), ))
+        self.assertTupleEqual(self.ri.route('USDT', 'BTC'), (('BTC/USDT', -1), ))
+        self.assertTupleEqual(self.ri.route('USDT', 'USDT'), tuple())
+
+    def test_route_prefers_transit(self):
+        # XRP/ETH/BTC and XRP/BTC/ETH routes to USDT and TRY have the same length
+        self.assertTupleEqual(self.ri.route('XRP', 'USDT'), (('XRP/BTC', 1), ('BTC/USDT', 1)))
+
+    def test_route_multi_hop(self):
+        self.assertTupleEqual(self.ri.route('BNB', 'TRY'),
+                              (('BNB/ETH', 1), ('ETH/BTC', 1), ('BTC/USDT', 1), ('USDT/TRY', 1)))
+        self.assertRaises(KeyError, RouteIndex(markets, max_legs=3).route, 'BNB', 'TRY')
+
+    def test_route_missing(self):
+        self.assertRaises(KeyError, self.ri.route, 'DOGE', 'USDT')
+
+
+class Test_convert(TestRouteIndex):
+    def test_convert(self):
+        self.assertAlmostEqual(self.ri.convert(2, 'ETH', 'USDT', prices.get), 400.0)
+        self.assertAlmostEqual(self.ri.convert(400, 'USDT', 'ETH', prices.get), 2.0)
+        self.assertAlmostEqual(self.ri.convert(10, 'BNB', 'TRY', prices.get), 1200.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
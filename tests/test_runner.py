@@ -0,0 +1,113 @@
+import logging
+import unittest
+from unittest import mock
+
+from payload.frontier import Frontier
+from payload.runner import Runner
+
+settings = {'DRY_RUN':               True,
+            'LOOP_INTERVAL':         (40, 60),
+            'MARKET_ONLY':           False,
+            'REBALANCING_PRECISION': 0.01,
+            'TARGET_RETURN':         None,
+            'TARGET_RISK':           0.5,
+            'TIME_FRAMES':           ['1h'],
+            'PORTFOLIO_BASE_ASSET':  'USDT',
+            'PORTFOLIO_WHITE_LIST':  ['BTC', 'ETH', 'USDT'],
+            'PORTFOLIO_BLACK_LIST':  [],
+            'WEIGHT_BOUNDS':         (0, 0.6),
+            'OPTIMIZER_CACHE_SIZE':  0,
+            'OPTIMIZER_CACHE_PATH':  None,
+            'OPTIMIZER_ENGINE':      'scipy',
+            'OPTIMIZER_WORKERS':     1,
+            'BUILD_DATE':            '190710'}
+
+
+class TestRunner(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # Runner without ui, exchange connection and main loop
+        self.runner = Runner.__new__(Runner)
+        self.runner.logger = logging.getLogger(__name__)
+        self.runner.exchange = mock.MagicMock()
+        self.runner.settings = dict(settings)
+        self.runner._set_attributes(settings)
+        self.runner._init_optimizers(settings)
+        self.runner.last_fetch_time = 100
+        self.runner._init_portfolio = mock.MagicMock()
+
+
+class Test_apply_settings(TestRunner):
+    def test_apply_settings_unchanged(self):
+        portfolio_opt = self.runner.portfolio_opt
+        self.assertSetEqual(self.runner._apply_settings(dict(settings)), set())
+        self.assertIs(self.runner.portfolio_opt, portfolio_opt)
+        self.assertEqual(self.runner.last_fetch_time, 100)
+
+    def test_apply_settings_changed_only(self):
+        portfolio_opt = self.runner.portfolio_opt
+        changed = self.runner._apply_settings(dict(settings, TARGET_RISK=0.3, TIME_FRAMES=['4h']))
+        self.assertSetEqual(changed, {'TARGET_RISK', 'TIME_FRAMES'})
+        self.assertEqual(self.runner.portfolio_target_risk, 0.3)
+        self.assertListEqual(self.runner.portfolio_time_frames, ['4h'])
+        self.assertIs(self.runner.portfolio_opt, portfolio_opt)
+        self.runner._init_portfolio.assert_not_called()
+        self.assertEqual(self.runner.last_fetch_time, 0)
+
+    def test_apply_settings_portfolio(self):
+        new = dict(settings, WEIGHT_BOUNDS=(0, 0.5))
+        self.runner._apply_settings(new)
+        self.runner._init_portfolio.assert_called_once_with(new)
+
+    def test_apply_settings_optimizers(self):
+        parallel_opt = self.runner.parallel_opt
+        parallel_opt.close = mock.MagicMock()
+        self.runner._apply_settings(dict(settings, OPTIMIZER_ENGINE='qp', OPTIMIZER_WORKERS=2))
+        parallel_opt.close.assert_called_once()
+        self.assertEqual(self.runner.portfolio_opt.engine, 'qp')
+        self.assertEqual(self.runner.parallel_opt.engine, 'qp')
+        self.assertEqual(self.runner.parallel_opt.workers, 2)
+        self.runner._init_portfolio.assert_not_called()
+
+    def test_apply_settings_weight_limit(self):
+        self.runner._apply_settings(dict(settings, API_WEIGHT_LIMIT=600))
+        self.runner.exchange.rate_limiter.resize.assert_called_once_with(600)
+
+    def test_apply_settings_restart_only(self):
+        with self.assertLogs(__name__, level='WARNING') as logs:
+            changed = self.runner._apply_settings(dict(settings, BUILD_DATE='200101'))
+        self.assertSetEqual(changed, {'BUILD_DATE'})
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('BUILD_DATE', logs.records[0].getMessage())
+
+
+class Test_log_pricing_gaps(TestRunner):
+    def test_log_pricing_gaps_limit(self):
+        with self.assertLogs(__name__, level='DEBUG') as logs:
+            self.runner._log_pricing_gaps({'1h': 3, '4h': 0, '1d': 11})
+        self.assertListEqual([x.levelname for x in logs.records], ['DEBUG', 'WARNING'])
+        self.assertIn('1d', logs.records[1].getMessage())
+
+    def test_log_pricing_gaps_setting(self):
+        self.runner.settings['PRICING_GAPS_LIMIT'] = 2
+        with self.assertLogs(__name__, level='WARNING') as logs:
+            self.runner._log_pricing_gaps({'1h': 3})
+        self.assertIn('limit 2', logs.records[0].getMessage())
+
+
+class Test_frontier_what_if(TestRunner):
+    def test_frontier_what_if(self):
+        self.runner.portfolio_opt.frontier = Frontier(['BTC', 'USDT'], [0.0, 0.2], [0.0, 0.4], [[0, 1], [1, 0]])
+        self.runner.settings['FRONTIER_WHAT_IF'] = [('return', 0.1), ('risk', 0.1), ('return', 0.5)]
+        lines = self.runner._frontier_what_if()
+        self.assertEqual(lines[0], "What if return 0.1: Expected return: 10.00% Volatility: 20.00% BTC 0.50 USDT 0.50")
+        self.assertIn("Volatility: 10.00% USDT 0.75 BTC 0.25", lines[1])
+        self.assertEqual(lines[2], "What if return 0.5: out of frontier")
+
+    def test_frontier_what_if_without_frontier(self):
+        self.runner.settings['FRONTIER_WHAT_IF'] = [('return', 0.1)]
+        self.assertListEqual(self.runner._frontier_what_if(), list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,12 @@
+import os
+import sys
+import tempfile
 import unittest
+import importlib
+
+# settings.py is created by users from _settings.py, tests use the template
+sys.modules.setdefault('settings', importlib.import_module('_settings'))
+
 from yat.settingsWatcher import settingsWatcher
 
 
@@ -6,10 +14,17 @@ class TestSettingsWatcher(unittest.TestCase):
 
     def setUp(self):
         self.sw = settingsWatcher()
-        self.sw.filename = '../settings.py'
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sw.filename = os.path.join(self.tmp.name, 'settings.py')
+        with open(self.sw.filename, 'w') as f:
+            f.write("BUILD_DATE = '190710'\n")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
 
     def test_look(self):
         self.assertEqual(self.sw.look(), True)
+        self.assertEqual(self.sw.look(), False)
 
     def test_import_or_reload(self):
         self.sw.import_or_reload('settings')
@@ -0,0 +1,80 @@
+import os
+import unittest
+import tempfile
+
+from payload.sweep import Sweep, grid, random_search, combination_key
+from yat.candlestore import CandleStore
+from tests.test_backtest import candles, settings
+
+space = {'WEIGHT_BOUNDS': [(0, 0.6), (0, 1)],
+         'REBALANCING_PRECISION': [0.01, 0.05],
+         'LOOP_INTERVAL': [(3600, 3600)]}
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        store = CandleStore(self.tmp.name, window=1000)
+        for i, x in enumerate('ABC'):
+            store.append(f'{x}/USDT', '1h', candles(160, 0.001 * i))
+        self.results_path = os.path.join(self.tmp.name, 'results.csv')
+        self.sweep = Sweep(self.tmp.name, ['A/USDT', 'B/USDT', 'C/USDT'], {'USDT': 10000.0}, settings,
+                           self.results_path, workers=1, window=100)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+
+class Test_combinations(unittest.TestCase):
+    def test_grid(self):
+        combinations = grid(space)
+        self.assertEqual(len(combinations), 4)
+        self.assertEqual(len({combination_key(x) for x in combinations}), 4)
+        self.assertDictEqual(combinations[0], {'LOOP_INTERVAL': (3600, 3600), 'REBALANCING_PRECISION': 0.01,
+                                               'WEIGHT_BOUNDS': (0, 0.6)})
+
+    def test_random_search(self):
+        self.assertListEqual(random_search(space, 3, seed=1), random_search(space, 3, seed=1))
+        self.assertEqual(len(random_search(space, 3)), 3)
+        self.assertEqual(len(random_search(space, 10)), 4)
+
+    def test_combination_key(self):
+        self.assertEqual(combination_key({'WEIGHT_BOUNDS': (0, 1), 'TARGET_RISK': 0.5}),
+                         combination_key({'TARGET_RISK': 0.5, 'WEIGHT_BOUNDS': [0, 1]}))
+
+
+class Test_run(TestSweep):
+    def test_run_and_resume(self):
+        combinations = grid(space)
+        results = self.sweep.run(combinations[:2])
+        self.assertEqual(len(results), 2)
+        self.assertTrue((results['error'] == '').all())
+        self.assertTrue((results['cycles'] == 61).all())
+        # Finished combinations are not backtested again
+        results = self.sweep.run(combinations)
+        self.assertEqual(len(results), 4)
+        with open(self.results_path) as f:
+            self.assertEqual(len(f.readlines()), 1 + 4)
+
+    def test_run_in_workers(self):
+        self.sweep.workers = 2
+        results = self.sweep.run(grid(space))
+        self.assertEqual(len(results), 4)
+        self.assertTrue((results['error'] == '').all())
+
+    def test_run_errors(self):
+        results = self.sweep.run([{'OPTIMIZER_ENGINE': 'cvxopt'}])
+        self.assertEqual(len(results), 1)
+        self.assertNotEqual(results['error'].iloc[0], '')
+
+    def test_run_retries_errors(self):
+        combination = grid(space)[0]
+        self.sweep._append({'key': combination_key(combination), 'params': '{}', 'error': 'MemoryError()'})
+        results = self.sweep.run([combination])
+        # Failed combination is backtested again and its last result is kept
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results['error'].iloc[0], '')
+        self.assertEqual(results['cycles'].iloc[0], 61)
+        with open(self.results_path) as f:
+            self.assertEqual(len(f.readlines()), 1 + 2)
@@ -0,0 +1,52 @@
+import unittest
+
+from yat.tickertable import TickerTable
+from yat.calcus import rounded_to_precision
+
+tickers = {'BTC/USDT': {'symbol': 'BTC/USDT', 'bid': 9220.49, 'ask': 9221.73},
+           'ETH/USDT': {'symbol': 'ETH/USDT', 'bid': 268.21, 'ask': 268.33},
+           'ETH/BTC':  {'symbol': 'ETH/BTC', 'bid': 0.029083, 'ask': 0.029101},
+           'XXX/BTC':  {'symbol': 'XXX/BTC', 'bid': 0.0, 'ask': 0.0},
+           'YYY/BTC':  {'symbol': 'YYY/BTC', 'bid': None, 'ask': 1e-6}, }
+
+
+class TestTickerTable(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tt = TickerTable(tickers)
+
+
+class Test_update(TestTickerTable):
+    def test_update_skips_empty(self):
+        self.assertListEqual(list(self.tt.keys()), ['BTC/USDT', 'ETH/USDT', 'ETH/BTC'])
+        self.assertNotIn('XXX/BTC', self.tt)
+        self.assertEqual(len(self.tt), 3)
+
+    def test_update_same_as_scalar_calc(self):
+        for s in self.tt:
+            bid, ask = tickers[s]['bid'], tickers[s]['ask']
+            mid_price = rounded_to_precision((bid + ask) / 2, 8)
+            spread = rounded_to_precision(ask - bid, 8)
+            self.assertEqual(self.tt[s]['mid_price'], mid_price)
+            self.assertEqual(self.tt[s]['spread'], spread)
+            self.assertEqual(self.tt[s]['spread_p'], rounded_to_precision(100 * spread / mid_price, 4))
+
+
+class Test_set(TestTickerTable):
+    def test_set_updates_and_adds(self):
+        self.tt.set({'ETH/BTC': {'bid': 0.03, 'ask': 0.031}, 'BNB/BTC': {'bid': 0.004, 'ask': 0.0041}})
+        self.assertEqual(len(self.tt), 4)
+        self.assertEqual(self.tt['ETH/BTC']['bid'], 0.03)
+        self.assertEqual(self.tt['BNB/BTC']['mid_price'], 0.00405)
+        self.assertEqual(self.tt['BTC/USDT']['ask'], 9221.73)
+
+
+class Test_column(TestTickerTable):
+    def test_column(self):
+        asks = self.tt.column('ask', ['ETH/USDT', 'ZZZ/BTC'])
+        self.assertEqual(asks[0], 268.33)
+        self.assertTrue(asks[1] != asks[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from payload.routes import RouteIndex
+from payload.valuation import Valuation
+
+markets = ['ETH/BTC', 'BTC/USDT', 'XRP/BTC', 'BNB/ETH']
+prices = {'ETH/BTC': 0.02, 'BTC/USDT': 10000.0, 'XRP/BTC': 0.00003, 'BNB/ETH': 0.1}
+balances = {'BTC': {'all': 0.5}, 'ETH': {'all': 10.0}, 'USDT': {'all': 1000.0}, 'BNB': {'all': 20.0},
+            'XRP': {'all': 0.0}}
+
+
+class TestValuation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.routes = RouteIndex(markets)
+        self.v = Valuation(self.routes, ['BTC', 'ETH', 'USDT', 'BNB', 'XRP', 'DOGE'], 'USDT')
+        self.prices = np.array([prices[m] for m in markets])
+
+
+class Test_update(TestValuation):
+    def test_update_matches_routes(self):
+        self.v.update(balances, self.prices)
+        for a, y in balances.items():
+            expected = self.routes.convert(y['all'], a, 'USDT', prices.get)
+            self.assertAlmostEqual(self.v.base_value(a), expected, places=6)
+        self.assertEqual(self.v.base_value('DOGE'), 0)
+        self.assertAlmostEqual(self.v.total, 5000 + 2000 + 1000 + 400)
+        self.assertAlmostEqual(sum(self.v.weights_dict().values()), 1.0)
+
+    def test_update_missing_price(self):
+        self.prices[markets.index('ETH/BTC')] = np.nan
+        self.v.update(balances, self.prices)
+        # ETH and BNB are priced through ETH/BTC
+        self.assertEqual(self.v.base_value('ETH'), 0)
+        self.assertEqual(self.v.base_value('BNB'), 0)
+        self.assertAlmostEqual(self.v.total, 6000)
+
+    def test_update_empty_balances(self):
+        self.v.update(dict(), self.prices)
+        self.assertEqual(self.v.total, 0)
+        self.assertFalse(self.v.weights.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -133,3 +133,15 @@ class AssetList(ABC):
         pa_list.add(portfolio_base_asset)
 
         return list(pbm_list), list(pa_list)
+
+    def build_watched_markets(self, transit_assets: Tuple[str, ...] = ('BTC', )) -> List[str]:
+        """
+        Build markets which tickers are read by portfolio: markets between any two
+        portfolio assets and markets of transit assets used for 2-leg conversions.
+        Call after build_portfolio_assets_markets, so whitelist is already validated.
+
+        :param transit_assets: assets used as the middle leg of conversions
+        :return: Markets list
+        """
+        assets = set(self.whitelist) | set(transit_assets)
+        return [x for x, y in self._exchange.markets.items() if y['base'] in assets and y['quote'] in assets]
@@ -0,0 +1,142 @@
+"""
+On-disk candle store
+
+Keeps ohlcv candles in one binary file per market and timeframe.
+Each row is 6 float64 values: timestamp, open, high, low, close, volume.
+Files are read through numpy memmap, new candles are appended in place and
+files are compacted to a fixed window of last candles.
+
+ """
+import os
+import numpy as np
+
+ROW_SIZE = 6
+ROW_BYTES = ROW_SIZE * np.dtype(np.float64).itemsize
+
+
+class CandleStore:
+
+    def __init__(self, path: str, window: int = 1000, logger: object = None) -> None:
+        """
+        :param path: directory for candle files
+        :param window: how many last candles to keep on compaction
+        :param logger: logger
+        """
+        self.logger = logger
+        self.path = path
+        self.window = window
+        self._checked = set()
+        os.makedirs(self.path, exist_ok=True)
+
+    def filename(self, market: str, timeframe: str) -> str:
+        """
+        File path for market and timeframe, i.e. BTC/USDT 1h -> path/BTC-USDT_1h.ohlcv
+        """
+        return os.path.join(self.path, '{}_{}.ohlcv'.format(market.replace('/', '-'), timeframe))
+
+    def read(self, market: str, timeframe: str, check: bool = True) -> np.ndarray:
+        """
+        Read-only memmap of all stored candles, checked for corruption on the first read.
+
+        :param check: False to skip the check of files already checked by another process
+        :return: array with (rows, 6) shape, empty if nothing stored
+        :rtype: np.ndarray
+        """
+        fn = self.filename(market, timeframe)
+        if check and fn not in self._checked:
+            self.check(market, timeframe)
+        rows = os.path.getsize(fn) // ROW_BYTES if os.path.exists(fn) else 0
+        if rows == 0:
+            return np.empty((0, ROW_SIZE))
+        return np.memmap(fn, dtype=np.float64, mode='r', shape=(rows, ROW_SIZE))
+
+    def tail(self, market: str, timeframe: str, limit: int) -> list:
+        """
+        Last limit candles in ccxt ohlcv format
+
+        :rtype: list
+        """
+        data = self.read(market, timeframe)[-limit:]
+        return [[int(r[0])] + r[1:] for r in data.tolist()]
+
+    def last_timestamp(self, market: str, timeframe: str):
+        """
+        :return: timestamp of the last stored candle or None
+        """
+        data = self.read(market, timeframe)
+        return int(data[-1, 0]) if len(data) > 0 else None
+
+    def append(self, market: str, timeframe: str, candles: list) -> int:
+        """
+        Append candles newer than the last stored one.
+        Candle with the same timestamp as the last stored one replaces it,
+        as it was still forming when it was stored. Older candles are ignored.
+        Compact the file when it grows over twice the window.
+
+        :param candles: ccxt ohlcv list ordered by time
+        :return: number of appended rows
+        :rtype: int
+        """
+        if len(candles) == 0:
+            return 0
+        fn = self.filename(market, timeframe)
+        new = np.asarray(candles, dtype=np.float64).reshape(-1, ROW_SIZE)
+        stored = self.read(market, timeframe)
+        rows = len(stored)
+        if rows > 0:
+            last_ts = stored[-1, 0]
+            del stored
+            same = new[new[:, 0] == last_ts]
+            if len(same) > 0:
+                replace = np.memmap(fn, dtype=np.float64, mode='r+', shape=(rows, ROW_SIZE))
+                replace[-1] = same[-1]
+                replace.flush()
+                del replace
+            new = new[new[:, 0] > last_ts]
+        if len(new) > 0:
+            with open(fn, 'ab') as f:
+                f.write(new.tobytes())
+        if rows + len(new) > 2 * self.window:
+            self.compact(market, timeframe)
+        return len(new)
+
+    def compact(self, market: str, timeframe: str) -> None:
+        """
+        Rewrite file with last window candles only.
+        New file is written aside and replaces the old one atomically.
+        """
+        fn = self.filename(market, timeframe)
+        data = np.array(self.read(market, timeframe)[-self.window:])
+        tmp = fn + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data.tobytes())
+        os.replace(tmp, fn)
+
+    def check(self, market: str, timeframe: str) -> bool:
+        """
+        Check file for corruption and cut it to the longest valid part.
+        Valid file holds whole rows of finite values with strictly increasing timestamps.
+
+        :return: True if file was valid or missing, False if it had to be repaired
+        :rtype: bool
+        """
+        fn = self.filename(market, timeframe)
+        self._checked.add(fn)
+        if not os.path.exists(fn):
+            return True
+        size = os.path.getsize(fn)
+        rows = size // ROW_BYTES
+        valid = rows
+        if rows > 0:
+            data = np.fromfile(fn, dtype=np.float64, count=rows * ROW_SIZE).reshape(rows, ROW_SIZE)
+            bad = ~np.isfinite(data).all(axis=1)
+            bad[1:] |= np.diff(data[:, 0]) <= 0
+            if bad.any():
+                valid = int(np.argmax(bad))
+        if valid * ROW_BYTES == size:
+            return True
+        if self.logger is not None:
+            self.logger.warning(f"Candle file {fn} is corrupted, keeping first {valid} of {rows} candles")
+        with open(fn, 'r+b') as f:
+            f.truncate(valid * ROW_BYTES)
+        return False
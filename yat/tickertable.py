@@ -0,0 +1,138 @@
+"""
+Columnar ticker table
+
+Keeps top of book prices of many symbols in numpy columns
+with a symbol to row index. Derived columns (mid price, spread, spread percent)
+are calculated for all rows at once.
+Reading by symbol returns a ticker dict, so the table can be used as
+a read only dict of tickers.
+
+ """
+from collections.abc import Mapping
+from time import time_ns
+import numpy as np
+
+
+def _truncated(values: np.ndarray, precision: int) -> np.ndarray:
+    """
+    Vectorized yat.calcus.rounded_to_precision for positive precision
+    """
+    decimal_precision = 10.0 ** precision
+    return np.trunc(values * decimal_precision) / decimal_precision
+
+
+class TickerTable(Mapping):
+
+    columns = ('bid', 'ask', 'mid_price', 'spread', 'spread_p', 'timestamp')
+
+    def __init__(self, tickers: dict = None) -> None:
+        """
+        :param tickers: ccxt tickers dict to fill the table with
+        """
+        self.symbols = list()
+        self.index = dict()
+        self.bid = np.empty(0)
+        self.ask = np.empty(0)
+        self.mid_price = np.empty(0)
+        self.spread = np.empty(0)
+        self.spread_p = np.empty(0)
+        self.timestamp = np.empty(0, dtype=np.int64)
+        if tickers is not None:
+            self.update(tickers)
+
+    # region Mapping
+
+    def __getitem__(self, symbol: str) -> dict:
+        i = self.index[symbol]
+        return {'symbol':    symbol,
+                'bid':       float(self.bid[i]),
+                'ask':       float(self.ask[i]),
+                'mid_price': float(self.mid_price[i]),
+                'spread':    float(self.spread[i]),
+                'spread_p':  float(self.spread_p[i]),
+                'timestamp': int(self.timestamp[i])}
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self.index
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    # endregion
+
+    @staticmethod
+    def _quotes(tickers: dict):
+        """
+        Extract bid and ask columns from ccxt tickers, missing quotes become 0
+        """
+        n = len(tickers)
+        bid = np.fromiter((t['bid'] or 0 for t in tickers.values()), dtype=np.float64, count=n)
+        ask = np.fromiter((t['ask'] or 0 for t in tickers.values()), dtype=np.float64, count=n)
+        return bid, ask
+
+    def update(self, tickers: dict) -> None:
+        """
+        Replace the table with ccxt tickers dict.
+        Tickers without quotes are skipped, derived columns are calculated.
+
+        :param tickers: ccxt tickers dict {symbol: ticker}
+        """
+        bid, ask = self._quotes(tickers)
+        keep = (bid > 0) & (ask > 0)
+        self.symbols = [s for s, k in zip(tickers.keys(), keep) if k]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.bid = bid[keep]
+        self.ask = ask[keep]
+        self.calc()
+
+    def set(self, tickers: dict) -> None:
+        """
+        Update or add rows for ccxt tickers dict and recalculate them.
+        Tickers without quotes are skipped.
+
+        :param tickers: ccxt tickers dict {symbol: ticker}
+        """
+        bid, ask = self._quotes(tickers)
+        keep = (bid > 0) & (ask > 0)
+        symbols = [s for s, k in zip(tickers.keys(), keep) if k]
+        bid, ask = bid[keep], ask[keep]
+        new = [s for s in symbols if s not in self.index]
+        if len(new) > 0:
+            self.index.update({s: i for i, s in enumerate(new, len(self.symbols))})
+            self.symbols.extend(new)
+            self.bid = np.concatenate((self.bid, np.zeros(len(new))))
+            self.ask = np.concatenate((self.ask, np.zeros(len(new))))
+        rows = np.fromiter((self.index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+        self.bid[rows] = bid
+        self.ask[rows] = ask
+        self.calc()
+
+    def calc(self) -> None:
+        """
+        Calculate mid price, spread and spread percent for all rows
+        with the same precision as yat.calcus.rounded_to_precision gives
+        and set calculation timestamp.
+        """
+        self.mid_price = _truncated((self.bid + self.ask) / 2, 8)
+        self.spread = _truncated(self.ask - self.bid, 8)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_p = _truncated(100 * self.spread / self.mid_price, 4)
+        self.spread_p = np.where(self.mid_price > 0, spread_p, 0)
+        self.timestamp = np.full(len(self.symbols), time_ns(), dtype=np.int64)
+
+    def column(self, name: str, symbols: list) -> np.ndarray:
+        """
+        Column values for a list of symbols, NaN for unknown symbols
+
+        :param name: one of TickerTable.columns
+        :param symbols: symbols list
+        :rtype: np.ndarray
+        """
+        rows = np.fromiter((self.index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+        found = rows >= 0
+        result = np.full(len(rows), np.nan)
+        result[found] = getattr(self, name)[rows[found]]
+        return result